@@ -0,0 +1,70 @@
+"""
+Compares the float sqrt price conversion with the fixed-point CLMM math.
+
+    python -m benchmarks.clmm_price_math
+"""
+import random
+from fractions import Fraction
+import timeit
+
+from sol_arbitrage_bot.raydium.clmm.fixed_point_math import (
+    MIN_SQRT_PRICE_X64,
+    compute_swap_step,
+    get_sqrt_price_at_tick,
+    get_tick_at_sqrt_price,
+    sqrt_price_x64_to_price,
+)
+
+
+def float_price(sqrt_price_x64, decimals_a, decimals_b):
+    decimals_adjustment = 10 ** (decimals_a - decimals_b)
+    sqrt_price = sqrt_price_x64 / (2 ** 64)
+    return sqrt_price ** 2 * decimals_adjustment
+
+
+def run(samples: int = 10_000, number: int = 5):
+    rng = random.Random(0)
+    # Ticks within +-200000 cover every price we have seen on mainnet pools.
+    sqrt_prices = [get_sqrt_price_at_tick(rng.randint(-200_000, 200_000)) + rng.randint(0, 1 << 32) for _ in range(samples)]
+    decimals = [(rng.choice([6, 9]), rng.choice([6, 9])) for _ in range(samples)]
+
+    def _float_path():
+        for sqrt_price_x64, (a, b) in zip(sqrt_prices, decimals):
+            float_price(sqrt_price_x64, a, b)
+
+    def _fixed_path():
+        for sqrt_price_x64, (a, b) in zip(sqrt_prices, decimals):
+            sqrt_price_x64_to_price(sqrt_price_x64, a, b)
+
+    def _tick_round_trip():
+        for sqrt_price_x64 in sqrt_prices:
+            get_sqrt_price_at_tick(get_tick_at_sqrt_price(sqrt_price_x64))
+
+    def _swap_step():
+        for sqrt_price_x64 in sqrt_prices:
+            compute_swap_step(sqrt_price_x64, MIN_SQRT_PRICE_X64, 10 ** 12, 10 ** 9, 2500, True, True)
+
+    results = {}
+    for name, fn in (
+        ("float_price", _float_path),
+        ("fixed_price", _fixed_path),
+        ("tick_round_trip", _tick_round_trip),
+        ("compute_swap_step", _swap_step),
+    ):
+        elapsed = min(timeit.repeat(fn, number=1, repeat=number))
+        results[name] = elapsed / samples * 1e6
+
+    max_relative_error = 0.0
+    for sqrt_price_x64, (a, b) in zip(sqrt_prices, decimals):
+        exact = Fraction(sqrt_price_x64 * sqrt_price_x64 * 10 ** a, (1 << 128) * 10 ** b)
+        approx = Fraction(float_price(sqrt_price_x64, a, b))
+        max_relative_error = max(max_relative_error, abs(float((approx - exact) / exact)))
+
+    return results, max_relative_error
+
+
+if __name__ == "__main__":
+    results, max_relative_error = run()
+    for name, micros in results.items():
+        print(f"{name:>20}: {micros:8.3f} us/op")
+    print(f"{'float max rel error':>20}: {max_relative_error:.3e}")
@@ -0,0 +1,418 @@
+"""
+Account fixtures and a local stand-in for SolanaClient, so the hot paths
+can be measured without a network.
+
+Synthetic fixtures are built from the real layouts with a fixed seed.
+Recorded mainnet accounts (see benchmarks.record_fixtures) are loaded from
+the same JSON format.
+"""
+import json
+import base64
+import base58
+import random
+import struct
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from solders.pubkey import Pubkey
+from solders.account import Account
+from solders.account_decoder import UiTokenAmount
+from solders.hash import Hash
+from solders.rent import Rent
+from solders.epoch_schedule import EpochSchedule
+from solders.sysvar import RENT, EPOCH_SCHEDULE
+from solders.rpc.responses import RpcBlockhash, RpcKeyedAccount
+
+from sol_arbitrage_bot.constants import (
+    SOL_MINT,
+    SOL_DECIMALS,
+    TOKEN_PROGRAM_ID,
+    ACCOUNT_LAYOUT_LEN,
+    LAMPORTS_PER_SIGNATURE,
+    TOKEN_ACCOUNT_MINT_OFFSET,
+    TOKEN_ACCOUNT_AMOUNT_OFFSET,
+)
+from sol_arbitrage_bot.raydium.amm_v4 import (
+    AMM_V4_LAYOUT,
+    AMM_V4_PROGRAM_ID,
+    MARKET_STATE_LAYOUT_V3,
+    OPEN_BOOK_PROGRAM_ID,
+    bytes_of,
+)
+from sol_arbitrage_bot.raydium.clmm import (
+    AMM_CONFIG_LAYOUT,
+    CLMM_LAYOUT,
+    CLMM_PROGRAM_ID,
+    TICK_ARRAY_BITMAP_EXTENSION,
+    TICK_ARRAY_LAYOUT,
+    get_array_start_index,
+    get_pda_tick_array_address,
+    get_pda_tick_array_bitmap_extension,
+    get_sqrt_price_at_tick,
+    tick_count,
+)
+
+
+TOKEN_OWNER_OFFSET = 32
+FIXTURE_SLOT = 300_000_000
+FIXTURE_BLOCKHASH = Hash.default()
+
+
+@dataclass
+class FixtureSet:
+    accounts: Dict[Pubkey, Account] = field(default_factory=dict)
+    # "amm_v4" and "clmm" pair addresses, in the order they were added.
+    pools: Dict[str, List[Pubkey]] = field(default_factory=dict)
+    mint_decimals: Dict[Pubkey, int] = field(default_factory=dict)
+
+    def add_account(self, address: Pubkey, owner: Pubkey, data: bytes, lamports: int = 1_000_000_000):
+        self.accounts[address] = Account(lamports, data, owner, False, 0)
+
+    def add_token_account(self, address: Pubkey, mint: Pubkey, owner: Pubkey, amount: int):
+        data = bytearray(ACCOUNT_LAYOUT_LEN)
+        data[TOKEN_ACCOUNT_MINT_OFFSET:TOKEN_ACCOUNT_MINT_OFFSET + 32] = bytes(mint)
+        data[TOKEN_OWNER_OFFSET:TOKEN_OWNER_OFFSET + 32] = bytes(owner)
+        struct.pack_into('<Q', data, TOKEN_ACCOUNT_AMOUNT_OFFSET, amount)
+        # Account state: initialized.
+        data[108] = 1
+        self.add_account(address, TOKEN_PROGRAM_ID, bytes(data), 2_039_280)
+
+    def to_json(self) -> dict:
+        return {
+            "accounts": {
+                str(address): {
+                    "owner": str(account.owner),
+                    "lamports": account.lamports,
+                    "data": base64.b64encode(account.data).decode("ascii"),
+                }
+                for address, account in self.accounts.items()
+            },
+            "pools": {kind: [str(address) for address in addresses] for kind, addresses in self.pools.items()},
+            "mint_decimals": {str(mint): decimals for mint, decimals in self.mint_decimals.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "FixtureSet":
+        fixtures = cls()
+        for address, account in data["accounts"].items():
+            fixtures.add_account(
+                Pubkey.from_string(address),
+                Pubkey.from_string(account["owner"]),
+                base64.b64decode(account["data"]),
+                account["lamports"],
+            )
+        fixtures.pools = {
+            kind: [Pubkey.from_string(address) for address in addresses]
+            for kind, addresses in data["pools"].items()
+        }
+        fixtures.mint_decimals = {Pubkey.from_string(mint): decimals for mint, decimals in data["mint_decimals"].items()}
+        return fixtures
+
+
+def save_fixtures(fixtures: FixtureSet, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures.to_json(), f, indent=1)
+
+
+def load_fixtures(path: str) -> FixtureSet:
+    with open(path, "r", encoding="utf-8") as f:
+        return FixtureSet.from_json(json.load(f))
+
+
+def __zeroed(layout):
+    # Parsing zeroed bytes yields a container with every field present.
+    return layout.parse(bytes(layout.sizeof()))
+
+
+def __random_pubkey(rng: random.Random) -> Pubkey:
+    return Pubkey.from_bytes(rng.randbytes(32))
+
+
+def __add_amm_v4_pool(
+    fixtures: FixtureSet,
+    rng: random.Random,
+    token_mint: Pubkey,
+    token_decimals: int,
+    sol_reserve: int,
+    token_reserve: int,
+) -> Pubkey:
+    pair_address = __random_pubkey(rng)
+    market_id = __random_pubkey(rng)
+    base_vault = __random_pubkey(rng)
+    quote_vault = __random_pubkey(rng)
+
+    # The market authority is a program address, so only some nonces work.
+    for nonce in range(256):
+        try:
+            Pubkey.create_program_address([bytes(market_id), bytes_of(nonce)], OPEN_BOOK_PROGRAM_ID)
+            break
+        except Exception:
+            continue
+
+    market = __zeroed(MARKET_STATE_LAYOUT_V3)
+    market.account_flags.initialized = True
+    market.account_flags.market = True
+    market.own_address = bytes(market_id)
+    market.vault_signer_nonce = nonce
+    market.base_mint = bytes(token_mint)
+    market.quote_mint = bytes(SOL_MINT)
+    for name in ("base_vault", "quote_vault", "request_queue", "event_queue", "bids", "asks"):
+        market[name] = bytes(__random_pubkey(rng))
+    market.base_lot_size = 1
+    market.quote_lot_size = 1
+    fixtures.add_account(market_id, OPEN_BOOK_PROGRAM_ID, MARKET_STATE_LAYOUT_V3.build(market))
+
+    amm = __zeroed(AMM_V4_LAYOUT)
+    amm.status = 6
+    amm.baseDecimals = token_decimals
+    amm.quoteDecimals = SOL_DECIMALS
+    amm.tradeFeeNumerator = 25
+    amm.tradeFeeDenominator = 10_000
+    amm.swapFeeNumerator = 25
+    amm.swapFeeDenominator = 10_000
+    amm.baseVault = bytes(base_vault)
+    amm.quoteVault = bytes(quote_vault)
+    amm.baseMint = bytes(token_mint)
+    amm.quoteMint = bytes(SOL_MINT)
+    amm.marketId = bytes(market_id)
+    amm.marketProgramId = bytes(OPEN_BOOK_PROGRAM_ID)
+    for name in ("lpMint", "openOrders", "targetOrders", "withdrawQueue", "lpVault", "owner"):
+        amm[name] = bytes(__random_pubkey(rng))
+    fixtures.add_account(pair_address, AMM_V4_PROGRAM_ID, AMM_V4_LAYOUT.build(amm))
+
+    fixtures.add_token_account(base_vault, token_mint, pair_address, token_reserve)
+    fixtures.add_token_account(quote_vault, SOL_MINT, pair_address, sol_reserve)
+    fixtures.pools.setdefault("amm_v4", []).append(pair_address)
+    return pair_address
+
+
+def __build_tick_array(pair_address: Pubkey, start_index: int, tick_spacing: int, liquidity: int) -> bytes:
+    tick_array = __zeroed(TICK_ARRAY_LAYOUT)
+    tick_array.pool_id = bytes(pair_address)
+    tick_array.start_tick_index = start_index
+    initialized = 0
+    for i, tick in enumerate(tick_array.ticks):
+        tick.tick = start_index + i * tick_spacing
+        # Every sixth tick is initialized; crossing it moves liquidity by
+        # a few percent either way, so the ladder has real steps.
+        if i % 6 == 0:
+            tick.liquidity_net = liquidity // 50 if (i // 6) % 2 == 0 else -liquidity // 50
+            tick.liquidity_gross = liquidity // 50
+            initialized += 1
+    tick_array.initialized_tick_count = initialized
+    return TICK_ARRAY_LAYOUT.build(tick_array)
+
+
+def __add_clmm_pool(
+    fixtures: FixtureSet,
+    rng: random.Random,
+    token_mint: Pubkey,
+    token_decimals: int,
+    tick_current: int,
+    tick_spacing: int = 10,
+    liquidity: int = 10 ** 13,
+    tick_arrays_per_side: int = 3,
+    sol_reserve: int = 1_000 * 10 ** 9,
+    token_reserve: int = 150_000 * 10 ** 6,
+) -> Pubkey:
+    pair_address = __random_pubkey(rng)
+    amm_config = __random_pubkey(rng)
+
+    config = __zeroed(AMM_CONFIG_LAYOUT)
+    config.tickSpacing = tick_spacing
+    config.tradeFeeRate = 2500
+    config.owner = bytes(__random_pubkey(rng))
+    config.fundOwner = bytes(__random_pubkey(rng))
+    fixtures.add_account(amm_config, CLMM_PROGRAM_ID, AMM_CONFIG_LAYOUT.build(config))
+
+    multiplier = tick_count(tick_spacing)
+    current_start_index = get_array_start_index(tick_current, tick_spacing)
+    start_indexes = [
+        current_start_index + offset * multiplier
+        for offset in range(-tick_arrays_per_side, tick_arrays_per_side + 1)
+    ]
+    bitmap = 0
+    for start_index in start_indexes:
+        bitmap |= 1 << (start_index // multiplier + 512)
+        fixtures.add_account(
+            get_pda_tick_array_address(pair_address, start_index),
+            CLMM_PROGRAM_ID,
+            __build_tick_array(pair_address, start_index, tick_spacing, liquidity),
+        )
+
+    bitmap_extension = __zeroed(TICK_ARRAY_BITMAP_EXTENSION)
+    bitmap_extension.pool_id = bytes(pair_address)
+    fixtures.add_account(
+        get_pda_tick_array_bitmap_extension(pair_address),
+        CLMM_PROGRAM_ID,
+        TICK_ARRAY_BITMAP_EXTENSION.build(bitmap_extension),
+    )
+
+    pool = __zeroed(CLMM_LAYOUT)
+    pool.ammConfig = bytes(amm_config)
+    pool.creator = bytes(__random_pubkey(rng))
+    pool.mintA = bytes(SOL_MINT)
+    pool.mintB = bytes(token_mint)
+    pool.vaultA = bytes(__random_pubkey(rng))
+    pool.vaultB = bytes(__random_pubkey(rng))
+    pool.observationId = bytes(__random_pubkey(rng))
+    pool.mintDecimalsA = SOL_DECIMALS
+    pool.mintDecimalsB = token_decimals
+    pool.tickSpacing = tick_spacing
+    pool.liquidity = liquidity
+    pool.sqrtPriceX64 = get_sqrt_price_at_tick(tick_current) + 1
+    pool.tickCurrent = tick_current
+    pool.tickArrayBitmap = [(bitmap >> (64 * i)) & ((1 << 64) - 1) for i in range(16)]
+    fixtures.add_account(pair_address, CLMM_PROGRAM_ID, CLMM_LAYOUT.build(pool))
+    # The price comes from the pool, but on-chain discovery ranks pools
+    # by their vault balances.
+    fixtures.add_token_account(Pubkey.from_bytes(pool.vaultA), SOL_MINT, pair_address, sol_reserve)
+    fixtures.add_token_account(Pubkey.from_bytes(pool.vaultB), token_mint, pair_address, token_reserve)
+    fixtures.pools.setdefault("clmm", []).append(pair_address)
+    return pair_address
+
+
+def make_synthetic_fixtures(seed: int = 0) -> FixtureSet:
+    """
+    Two AMM v4 pools and one CLMM pool between SOL and one token, priced
+    close enough to each other for a round trip.
+    """
+    rng = random.Random(seed)
+    fixtures = FixtureSet()
+    token_mint = __random_pubkey(rng)
+    token_decimals = 6
+    fixtures.mint_decimals = {SOL_MINT: SOL_DECIMALS, token_mint: token_decimals}
+
+    # ~150 tokens per SOL, the second pool slightly cheaper.
+    __add_amm_v4_pool(fixtures, rng, token_mint, token_decimals, 5_000 * 10 ** 9, 750_000 * 10 ** 6)
+    __add_amm_v4_pool(fixtures, rng, token_mint, token_decimals, 2_000 * 10 ** 9, 303_000 * 10 ** 6)
+    # price(B per A) = 1.0001^tick scaled by decimals: 150 tokens per SOL.
+    __add_clmm_pool(fixtures, rng, token_mint, token_decimals, tick_current=-18_970)
+
+    fixtures.add_account(RENT, Pubkey.default(), bytes(Rent.default()))
+    fixtures.add_account(EPOCH_SCHEDULE, Pubkey.default(), bytes(EpochSchedule(432_000)))
+    return fixtures
+
+
+class FixtureClient:
+    """
+    Answers the SolanaClient calls used on the hot paths from a FixtureSet.
+    Sent transactions are recorded instead of sent. latency, in seconds,
+    is slept before every call to model a round trip.
+    """
+
+    def __init__(self, fixtures: FixtureSet, latency: float = 0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.sent: List[Any] = []
+        self.calls = 0
+
+    async def __aenter__(self) -> "FixtureClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __round_trip(self):
+        self.calls += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    async def get_account_info_json_parsed(self, address: Pubkey) -> Optional[Account]:
+        await self.__round_trip()
+        return self.fixtures.accounts.get(address)
+
+    async def get_multiple_accounts(self, pubkeys: List[Pubkey]) -> Optional[List[Optional[Account]]]:
+        await self.__round_trip()
+        return [self.fixtures.accounts.get(pubkey) for pubkey in pubkeys]
+
+    async def get_multiple_accounts_json_parsed(self, pubkeys: List[Pubkey]) -> Optional[List[Optional[Account]]]:
+        return await self.get_multiple_accounts(pubkeys)
+
+    def __token_accounts(self, owner: Pubkey, mint: Optional[Pubkey] = None) -> List[RpcKeyedAccount]:
+        keyed_accounts = []
+        for address, account in self.fixtures.accounts.items():
+            if account.owner != TOKEN_PROGRAM_ID or len(account.data) != ACCOUNT_LAYOUT_LEN:
+                continue
+            if Pubkey.from_bytes(account.data[TOKEN_OWNER_OFFSET:TOKEN_OWNER_OFFSET + 32]) != owner:
+                continue
+            account_mint = Pubkey.from_bytes(account.data[TOKEN_ACCOUNT_MINT_OFFSET:TOKEN_ACCOUNT_MINT_OFFSET + 32])
+            if mint is not None and account_mint != mint:
+                continue
+            keyed_accounts.append(RpcKeyedAccount(address, account))
+        return keyed_accounts
+
+    async def get_token_accounts_by_owner(self, owner: Pubkey, token_mint: Pubkey) -> Optional[List[RpcKeyedAccount]]:
+        await self.__round_trip()
+        return self.__token_accounts(owner, token_mint)
+
+    async def get_token_accounts_by_program(self, owner: Pubkey, program_id: Pubkey) -> Optional[List[RpcKeyedAccount]]:
+        await self.__round_trip()
+        if program_id != TOKEN_PROGRAM_ID:
+            return []
+        return self.__token_accounts(owner)
+
+    async def get_token_account_balance(self, address: Pubkey) -> Optional[UiTokenAmount]:
+        await self.__round_trip()
+        account = self.fixtures.accounts.get(address)
+        if account is None:
+            return None
+        mint = Pubkey.from_bytes(account.data[TOKEN_ACCOUNT_MINT_OFFSET:TOKEN_ACCOUNT_MINT_OFFSET + 32])
+        amount, = struct.unpack_from('<Q', account.data, TOKEN_ACCOUNT_AMOUNT_OFFSET)
+        decimals = self.fixtures.mint_decimals.get(mint, 0)
+        ui_amount = amount / (10 ** decimals)
+        return UiTokenAmount(ui_amount, decimals, str(amount), str(ui_amount))
+
+    async def get_slot(self) -> Optional[int]:
+        await self.__round_trip()
+        return FIXTURE_SLOT
+
+    async def get_latest_blockhash(self) -> Optional[RpcBlockhash]:
+        await self.__round_trip()
+        return RpcBlockhash(FIXTURE_BLOCKHASH, FIXTURE_SLOT + 150)
+
+    async def get_fee_for_message(self, message) -> Optional[int]:
+        await self.__round_trip()
+        return LAMPORTS_PER_SIGNATURE
+
+    async def get_program_accounts(self, program_id: Pubkey, filters: List[dict], data_slice=None) -> Optional[List[dict]]:
+        """
+        Applies dataSize and memcmp filters and dataSlice like the RPC
+        does, returning the raw base64 JSON result.
+        """
+        await self.__round_trip()
+        result = []
+        for address, account in self.fixtures.accounts.items():
+            if account.owner != program_id:
+                continue
+            data = account.data
+            if not all(self.__matches(data, f) for f in filters):
+                continue
+            if data_slice is not None:
+                offset, length = data_slice
+                data = data[offset:offset + length]
+            result.append({
+                "pubkey": str(address),
+                "account": {
+                    "data": [base64.b64encode(data).decode("ascii"), "base64"],
+                    "owner": str(account.owner),
+                    "lamports": account.lamports,
+                    "executable": False,
+                    "rentEpoch": 0,
+                },
+            })
+        return result
+
+    @staticmethod
+    def __matches(data: bytes, account_filter: dict) -> bool:
+        if "dataSize" in account_filter:
+            return len(data) == account_filter["dataSize"]
+        memcmp = account_filter["memcmp"]
+        expected = base58.b58decode(memcmp["bytes"])
+        return data[memcmp["offset"]:memcmp["offset"] + len(expected)] == expected
+
+    async def send_transaction(self, txn, opts=None):
+        await self.__round_trip()
+        self.sent.append(txn)
+        return txn.signatures[0]
@@ -0,0 +1,248 @@
+"""
+Times the decode, quote, route and build hot paths against account
+fixtures served by a local stand-in for the RPC, and compares the result
+with a stored baseline.
+
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --fixtures benchmarks/fixtures/mainnet.json
+    python -m benchmarks.hot_paths --update-baseline
+
+Exits with status 1 if any benchmark is slower than the baseline by more
+than the tolerance. Baselines are machine specific: regenerate the stored
+one with --update-baseline on the machine doing the comparison.
+"""
+import io
+import sys
+import json
+import asyncio
+import argparse
+import platform
+import timeit
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from spl.token.instructions import get_associated_token_address
+from solders.keypair import Keypair
+
+from sol_arbitrage_bot.constants import SOL_MINT
+from sol_arbitrage_bot.liquidity_pool import fetch_liquidity_pool
+from sol_arbitrage_bot.sysvar_cache import SysvarCache
+from sol_arbitrage_bot.token_accounts import TokenAccountRegistry
+from sol_arbitrage_bot.arbitrage import arbitrage, compile_transaction, make_transaction_fee_instructions
+from sol_arbitrage_bot.sizing import TradeSize
+from sol_arbitrage_bot.raydium.amm_v4 import AMM_V4_LAYOUT, MARKET_STATE_LAYOUT_V3, AmmV4PoolKeys, MarketStateV3
+from sol_arbitrage_bot.raydium.clmm import (
+    CLMM_LAYOUT,
+    TICK_ARRAY_BITMAP_EXTENSION,
+    TICK_ARRAY_LAYOUT,
+    ClmmPoolKeys,
+    load_tick_arrays_for_both_directions,
+)
+
+from .fixtures import FixtureClient, FixtureSet, load_fixtures, make_synthetic_fixtures
+
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# Relative slowdown tolerated before a benchmark counts as a regression.
+REGRESSION_TOLERANCE = 0.3
+WALLET_SEED = bytes(range(32))
+
+
+class HotPaths:
+    """
+    Pools loaded from a fixture set through the normal fetch path, plus
+    the wallet state a full arbitrage call needs.
+    """
+
+    def __init__(self, fixtures: FixtureSet, loop: asyncio.AbstractEventLoop):
+        self.fixtures = fixtures
+        self.loop = loop
+        self.client = FixtureClient(fixtures)
+        self.payer_keypair = Keypair.from_seed(WALLET_SEED)
+        self.amm_v4_pools = [self.__load_pool(address) for address in fixtures.pools.get("amm_v4", [])]
+        self.clmm_pools = [self.__load_pool(address) for address in fixtures.pools.get("clmm", [])]
+
+        self.sysvar_cache = SysvarCache()
+        self.token_account_registry = TokenAccountRegistry(self.payer_keypair.pubkey())
+        if len(self.amm_v4_pools) > 0:
+            token_mint = self.amm_v4_pools[0].get_quote_mint(SOL_MINT)
+            self.fixtures.add_token_account(
+                get_associated_token_address(self.payer_keypair.pubkey(), token_mint),
+                token_mint,
+                self.payer_keypair.pubkey(),
+                0,
+            )
+        self.loop.run_until_complete(self.sysvar_cache.refresh(self.client))
+        self.loop.run_until_complete(self.token_account_registry.load(self.client))
+
+    def __load_pool(self, address):
+        pool = self.loop.run_until_complete(fetch_liquidity_pool(self.client, address))
+        if pool is None:
+            raise ValueError(f"Could not load fixture pool {address}")
+        return pool
+
+    def cases(self) -> List[Tuple[str, Callable[[], object]]]:
+        cases = []
+        accounts = self.fixtures.accounts
+        payer = self.payer_keypair.pubkey()
+
+        if len(self.amm_v4_pools) > 0:
+            amm_pool = self.amm_v4_pools[0]
+            amm_data = accounts[amm_pool.pair_address].data
+            market_data = accounts[amm_pool.pool_keys.market_id].data
+            quote = self.loop.run_until_complete(amm_pool.load_quote_function(self.client, SOL_MINT))
+            swap_instruction = amm_pool.make_swap_instruction(10 ** 9, 0, payer, payer, payer, SOL_MINT)
+            instructions = make_transaction_fee_instructions() + [swap_instruction]
+            latest_blockhash = self.loop.run_until_complete(self.client.get_latest_blockhash())
+            sell_pool = self.amm_v4_pools[-1]
+            trade_size = TradeSize(
+                amount_in=10 ** 9, quote_amount=quote(10 ** 9), amount_out=0, expected_profit=0, costs=0
+            )
+
+            cases += [
+                ("decode_amm_v4", lambda: AmmV4PoolKeys.from_decoded(AMM_V4_LAYOUT.parse(amm_data))),
+                ("decode_market_v3", lambda: MarketStateV3.from_decoded(MARKET_STATE_LAYOUT_V3.parse(market_data))),
+                ("quote_amm_v4", lambda: quote(10 ** 9)),
+                ("swap_instruction_amm_v4", lambda: amm_pool.make_swap_instruction(
+                    10 ** 9, 0, payer, payer, payer, SOL_MINT
+                )),
+                ("compile_transaction", lambda: compile_transaction(
+                    self.payer_keypair, instructions, latest_blockhash
+                )),
+                ("arbitrage_simulated", lambda: self.loop.run_until_complete(arbitrage(
+                    self.client,
+                    None,
+                    amm_pool,
+                    sell_pool,
+                    self.payer_keypair,
+                    trade_size,
+                    token_account_registry=self.token_account_registry,
+                    sysvar_cache=self.sysvar_cache,
+                ))),
+            ]
+
+        if len(self.clmm_pools) > 0:
+            clmm_pool = self.clmm_pools[0]
+            clmm_data = accounts[clmm_pool.pair_address].data
+            self.loop.run_until_complete(clmm_pool.refresh_tick_arrays(self.client))
+            tick_array_data = next(iter(
+                accounts[address].data for address in clmm_pool.tick_arrays if address in accounts
+            ))
+            pool_keys = clmm_pool.pool_keys
+            bitmap_extension_data = accounts[clmm_pool.tick_array_info.bitmap_extension].data
+            parsed_extension = TICK_ARRAY_BITMAP_EXTENSION.parse(bitmap_extension_data)
+            bitmap_extension = [
+                [list(container) for container in parsed_extension.positive_tick_array_bitmap],
+                [list(container) for container in parsed_extension.negative_tick_array_bitmap],
+            ]
+            tick_array_bitmap = list(pool_keys.tick_array_bitmap)
+            clmm_input_mint = pool_keys.mint_a
+            # Large enough to cross a few initialized ticks.
+            clmm_amount_in = 50 * 10 ** pool_keys.mint_decimals_a
+
+            cases += [
+                ("decode_clmm", lambda: ClmmPoolKeys.from_decoded(CLMM_LAYOUT.parse(clmm_data))),
+                ("decode_tick_array", lambda: TICK_ARRAY_LAYOUT.parse(tick_array_data)),
+                ("tick_array_search", lambda: load_tick_arrays_for_both_directions(
+                    clmm_pool.pair_address,
+                    pool_keys.tick_current,
+                    pool_keys.tick_spacing,
+                    tick_array_bitmap,
+                    bitmap_extension,
+                )),
+                ("quote_clmm", lambda: clmm_pool.get_amount_out(clmm_amount_in, clmm_input_mint)),
+                ("swap_instruction_clmm", lambda: clmm_pool.make_swap_instruction(
+                    10 ** 9, 0, payer, payer, payer, clmm_input_mint
+                )),
+            ]
+        return cases
+
+
+def run(fixtures: Optional[FixtureSet] = None, number: int = 200, repeat: int = 5) -> Dict[str, float]:
+    """
+    Best of repeat runs for every hot path, in microseconds per call.
+    """
+    if fixtures is None:
+        fixtures = make_synthetic_fixtures()
+
+    loop = asyncio.new_event_loop()
+    try:
+        hot_paths = HotPaths(fixtures, loop)
+        results = {}
+        # arbitrage() prints its amounts and signatures.
+        with redirect_stdout(io.StringIO()):
+            for name, fn in hot_paths.cases():
+                elapsed = min(timeit.repeat(fn, number=number, repeat=repeat))
+                results[name] = elapsed / number * 1e6
+        return results
+    finally:
+        loop.close()
+
+
+def compare(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerance: float = REGRESSION_TOLERANCE,
+) -> List[Tuple[str, float, float]]:
+    """
+    (name, baseline, current) for every benchmark slower than its baseline
+    by more than tolerance.
+    """
+    regressions = []
+    for name, micros in results.items():
+        baseline_micros = baseline.get(name)
+        if baseline_micros is not None and micros > baseline_micros * (1 + tolerance):
+            regressions.append((name, baseline_micros, micros))
+    return regressions
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, float]]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_results(results: Dict[str, float], path: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "unit": "us/op",
+            "results": {name: round(micros, 3) for name, micros in results.items()},
+        }, f, indent=2)
+        f.write("\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline hot path benchmarks")
+    parser.add_argument("--fixtures", help="Recorded fixture file, synthetic fixtures if omitted")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="Allowed relative slowdown")
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing run")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    results = run(fixtures, number=args.number)
+
+    if args.output is not None:
+        save_results(results, args.output)
+    if args.update_baseline:
+        save_results(results, args.baseline)
+
+    baseline = load_baseline(args.baseline) or {}
+    regressions = compare(results, baseline, args.tolerance)
+    for name, micros in results.items():
+        baseline_micros = baseline.get(name)
+        change = f"{micros / baseline_micros - 1:+7.1%}" if baseline_micros else "    new"
+        print(f"{name:>24}: {micros:10.3f} us/op {change}")
+
+    for name, baseline_micros, micros in regressions:
+        print(f"REGRESSION {name}: {baseline_micros:.3f} -> {micros:.3f} us/op", file=sys.stderr)
+    sys.exit(1 if len(regressions) > 0 else 0)
@@ -0,0 +1,92 @@
+"""
+Records the accounts behind real pools into a fixture file for
+benchmarks.hot_paths.
+
+    python -m benchmarks.record_fixtures --rpc-url <url> --output benchmarks/fixtures/mainnet.json <pair address>...
+"""
+import asyncio
+import argparse
+from typing import List
+
+from solders.pubkey import Pubkey
+from solders.sysvar import RENT, EPOCH_SCHEDULE
+
+from sol_arbitrage_bot.constants import SOL_RPC_URL
+from sol_arbitrage_bot.solana_client import SolanaClient
+from sol_arbitrage_bot.liquidity_pool import fetch_liquidity_pool
+from sol_arbitrage_bot.raydium.amm_v4 import AmmV4Pool
+from sol_arbitrage_bot.raydium.clmm import ClmmPool
+
+from .fixtures import FixtureSet, save_fixtures
+
+
+class RecordingClient:
+    """
+    Forwards account reads to a SolanaClient and keeps every account it
+    returned.
+    """
+
+    def __init__(self, solana_client: SolanaClient, fixtures: FixtureSet):
+        self.solana_client = solana_client
+        self.fixtures = fixtures
+
+    def __record(self, address: Pubkey, account):
+        if account is not None:
+            self.fixtures.add_account(address, account.owner, bytes(account.data), account.lamports)
+
+    async def get_account_info_json_parsed(self, address: Pubkey):
+        account = await self.solana_client.get_account_info_json_parsed(address)
+        self.__record(address, account)
+        return account
+
+    async def get_multiple_accounts(self, pubkeys: List[Pubkey]):
+        accounts = await self.solana_client.get_multiple_accounts(pubkeys)
+        for address, account in zip(pubkeys, accounts or []):
+            self.__record(address, account)
+        return accounts
+
+    async def get_multiple_accounts_json_parsed(self, pubkeys: List[Pubkey]):
+        accounts = await self.solana_client.get_multiple_accounts_json_parsed(pubkeys)
+        for address, account in zip(pubkeys, accounts or []):
+            self.__record(address, account)
+        return accounts
+
+
+async def record(rpc_url: str, pair_addresses: List[Pubkey]) -> FixtureSet:
+    fixtures = FixtureSet()
+    async with SolanaClient(rpc_url) as solana_client:
+        recording_client = RecordingClient(solana_client, fixtures)
+        await recording_client.get_multiple_accounts([RENT, EPOCH_SCHEDULE])
+        for pair_address in pair_addresses:
+            pool = await fetch_liquidity_pool(recording_client, pair_address)
+            if pool is None:
+                print(f"skipping {pair_address}")
+                continue
+
+            if isinstance(pool, ClmmPool):
+                await pool.refresh_tick_arrays(recording_client)
+                fixtures.pools.setdefault("clmm", []).append(pair_address)
+            elif isinstance(pool, AmmV4Pool):
+                fixtures.pools.setdefault("amm_v4", []).append(pair_address)
+            await recording_client.get_multiple_accounts(pool.get_state_accounts())
+
+            for mint in pool.get_mints():
+                decimals = pool.get_base_quote_decimals(mint)
+                if decimals is not None:
+                    fixtures.mint_decimals[mint] = decimals[0]
+            print(f"recorded {pair_address}: {type(pool).__name__}")
+    return fixtures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Record pool accounts as benchmark fixtures")
+    parser.add_argument("pair_addresses", nargs="+", help="Pool addresses paired with SOL")
+    parser.add_argument("--rpc-url", default=SOL_RPC_URL)
+    parser.add_argument("--output", required=True)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    fixtures = asyncio.run(record(args.rpc_url, [Pubkey.from_string(address) for address in args.pair_addresses]))
+    save_fixtures(fixtures, args.output)
@@ -1,18 +1,38 @@
 import json
 import asyncio
 import argparse
+from typing import List, Optional
 
 from solders.pubkey import Pubkey
 from solders.keypair import Keypair
 
-from jito_async import JitoJsonRpcSDK
-
 from sol_arbitrage_bot.solana_client import SolanaClient
 from sol_arbitrage_bot.raydium.raydium_fetcher import RaydiumFetcher
+from sol_arbitrage_bot.raydium.pool_discovery import fetch_pool_addresses_for_mint
 from sol_arbitrage_bot.liquidity_pool import fetch_liquidity_pool
 from sol_arbitrage_bot.arbitrage import *
 from sol_arbitrage_bot.accounts import *
-from sol_arbitrage_bot.constants import SOL_RPC_URL
+from sol_arbitrage_bot.sizing import find_optimal_trade_size
+from sol_arbitrage_bot.token_accounts import TokenAccountRegistry
+from sol_arbitrage_bot.sysvar_cache import SysvarCache
+from sol_arbitrage_bot.wsol import WsolAccountPool
+from sol_arbitrage_bot.arbitrage_program import atomic_arbitrage
+from sol_arbitrage_bot.lookup_tables import LookupTableManager
+from sol_arbitrage_bot.compute_budget import ComputeBudgetPlanner
+from sol_arbitrage_bot.scheduler import (
+    OPPORTUNITY_TTL_SLOTS,
+    ExecutionScheduler,
+    ScheduledOpportunity,
+    get_route_writable_accounts,
+)
+from sol_arbitrage_bot.block_engines import BundleSubmitter
+from sol_arbitrage_bot.bundle_tracker import BundleTracker
+from sol_arbitrage_bot.tracing import JsonlExporter, tracer
+from sol_arbitrage_bot.profiling import PROFILE_MODES, Profiler
+from sol_arbitrage_bot.pool_index import PoolIndex
+from sol_arbitrage_bot.scanner import POOLS_PER_MINT
+from sol_arbitrage_bot.tips import MAX_TIP_AMOUNT, MIN_TIP_AMOUNT, TIP_PROFIT_SHARE, TipAccountCache, TipPolicy
+from sol_arbitrage_bot.constants import SOL_RPC_URL, SOL_DECIMALS, JITO_BLOCK_ENGINE_URLS
 
 
 def argmin(a):
@@ -23,113 +43,6 @@ def argmax(a):
     return max(range(len(a)), key=lambda x : a[x])
 
 
-async def confirm_landed_bundle(sdk: JitoJsonRpcSDK, bundle_id: str, max_attempts: int = 60, delay: float = 2.0):
-    for attempt in range(max_attempts):
-        response = await sdk.get_bundle_statuses([bundle_id])
-        if response is None:
-            return
-
-        if not response['success']:
-            print(f"Error confirming bundle status: {response.get('error', 'Unknown error')}")
-            await asyncio.sleep(delay)
-
-        print(f"Confirmation attempt {attempt + 1}/{max_attempts}:")
-        print(json.dumps(response, indent=2))
-
-        if 'result' not in response['data']:
-            print(f"Unexpected response structure. 'result' not found in response data.")
-            await asyncio.sleep(delay)
-
-        result = response['data']['result']
-        if 'value' not in result or not result['value']:
-            print(f"Bundle {bundle_id} not found in confirmation response")
-            await asyncio.sleep(delay)
-
-        bundle_status = result['value'][0]
-        if bundle_status['bundle_id'] != bundle_id:
-            print(f"Unexpected bundle ID in response: {bundle_status['bundle_id']}")
-            await asyncio.sleep(delay)
-
-        status = bundle_status.get('confirmation_status')
-
-        if status == 'finalized':
-            print(f"Bundle {bundle_id} has been finalized on-chain!")
-            # Extract transaction ID and construct Solscan link
-            if 'transactions' in bundle_status and bundle_status['transactions']:
-                tx_id = bundle_status['transactions'][0]
-                solscan_link = f"https://solscan.io/tx/{tx_id}"
-                print(f"Transaction details: {solscan_link}")
-            else:
-                print("Transaction ID not found in the response.")
-            return 'Finalized'
-        elif status == 'confirmed':
-            print(f"Bundle {bundle_id} is confirmed but not yet finalized. Checking again...")
-        elif status == 'processed':
-            print(f"Bundle {bundle_id} is processed but not yet confirmed. Checking again...")
-        else:
-            print(f"Unexpected status '{status}' during confirmation for bundle {bundle_id}")
-
-        # Check for errors
-        err = bundle_status.get('err', {}).get('Ok')
-        if err is not None:
-            print(f"Error in bundle {bundle_id}: {err}")
-            return 'Failed'
-
-        await asyncio.sleep(delay)
-
-    print(f"Max confirmation attempts reached. Unable to confirm finalization of bundle {bundle_id}")
-    return 'Landed'
-
-async def check_bundle_status(sdk: JitoJsonRpcSDK, bundle_id: str, max_attempts: int = 30, delay: float = 2.0):
-    for attempt in range(max_attempts):
-        response = await sdk.get_inflight_bundle_statuses([bundle_id])
-        if response is None:
-            return
-
-        if not response['success']:
-            print(f"Error checking bundle status: {response.get('error', 'Unknown error')}")
-            await asyncio.sleep(delay)
-            continue
-
-        print(f"Raw response (Attempt {attempt + 1}/{max_attempts}):")
-        print(json.dumps(response, indent=2))
-
-        if 'result' not in response['data']:
-            print(f"Unexpected response structure. 'result' not found in response data.")
-            await asyncio.sleep(delay)
-            continue
-
-        result = response['data']['result']
-        if 'value' not in result or not result['value']:
-            print(f"Bundle {bundle_id} not found in response")
-            await asyncio.sleep(delay)
-            continue
-
-        bundle_status = result['value'][0]
-        status = bundle_status.get('status')
-        print(f"Attempt {attempt + 1}/{max_attempts}: Bundle status - {status}")
-
-        if status == 'Landed':
-            print(f"Bundle {bundle_id} has landed on-chain! Performing additional confirmation...")
-            final_status = await confirm_landed_bundle(sdk, bundle_id)
-            return final_status
-        elif status == 'Failed':
-            print(f"Bundle {bundle_id} has failed.")
-            return status
-        elif status == 'Invalid':
-            if attempt < 5:  # Check a few more times before giving up on Invalid(usually on start)
-                print(f"Bundle {bundle_id} is currently invalid. Checking again...")
-            else:
-                print(f"Bundle {bundle_id} is invalid (not in system or outside 5-minute window).")
-                return status
-        elif status == 'Pending':
-            print(f"Bundle {bundle_id} is still pending. Checking again in {delay} seconds...")
-        else:
-            print(f"Unknown status '{status}' for bundle {bundle_id}")
-
-        await asyncio.sleep(delay)
-
-
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Arbitrage bot")
     parser.add_argument(
@@ -147,10 +60,118 @@ def parse_args() -> argparse.Namespace:
         default=SOL_RPC_URL,
         help="Solana RPC"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--max-sol-in",
+        type=float,
+        required=False,
+        default=0.01,
+        help="Upper bound for the SOL amount put into one arbitrage"
+    )
+    parser.add_argument(
+        "--tip",
+        type=int,
+        required=False,
+        default=MIN_TIP_AMOUNT,
+        help="Minimum Jito tip in lamports"
+    )
+    parser.add_argument(
+        "--tip-share",
+        type=float,
+        required=False,
+        default=TIP_PROFIT_SHARE,
+        help="Share of the expected profit paid as Jito tip"
+    )
+    parser.add_argument(
+        "--max-tip",
+        type=int,
+        required=False,
+        default=MAX_TIP_AMOUNT,
+        help="Maximum Jito tip in lamports"
+    )
+    parser.add_argument(
+        "--reuse-wsol",
+        action="store_true",
+        help="Trade through persistent WSOL accounts instead of creating one per trade"
+    )
+    parser.add_argument(
+        "--atomic",
+        action="store_true",
+        help="Run both legs in one transaction through the arbitrage program"
+    )
+    parser.add_argument(
+        "--lookup-tables",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Address lookup tables owned by the wallet; missing pool accounts are added to them"
+    )
+    parser.add_argument(
+        "--create-lookup-table",
+        action="store_true",
+        help="Create a new lookup table for the pool accounts when the given ones are full or none are given"
+    )
+    parser.add_argument(
+        "--dynamic-fees",
+        action="store_true",
+        help="Size compute unit limits by simulation and unit prices by recent prioritization fees"
+    )
+    parser.add_argument(
+        "--block-engines",
+        type=str,
+        nargs="+",
+        choices=list(JITO_BLOCK_ENGINE_URLS),
+        default=list(JITO_BLOCK_ENGINE_URLS),
+        help="Jito block engine regions every bundle is sent to"
+    )
+    parser.add_argument(
+        "--fanout",
+        type=int,
+        required=False,
+        default=None,
+        help="Send each bundle only to this many lowest-latency regions"
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        required=False,
+        default=None,
+        help="Append pipeline spans to this JSONL file"
+    )
+    parser.add_argument(
+        "--discovery",
+        type=str,
+        choices=["api", "onchain"],
+        default="api",
+        help="Find pools through the Raydium API or with getProgramAccounts"
+    )
+    parser.add_argument(
+        "--pool-index",
+        type=str,
+        required=False,
+        default=None,
+        help="SQLite file caching discovered pools between runs"
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile the run: cpu (cProfile), tasks (event loop time per task) or memory (tracemalloc)"
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        required=False,
+        default=None,
+        help="File the profile is written to"
+    )
+    args = parser.parse_args()
+    if args.pool_index is not None and args.discovery == "onchain":
+        parser.error("--pool-index caches API discovery and cannot be used with --discovery onchain")
+    return args
 
 
-async def main(wallet: str, rpc_url: str):
+async def main(wallet: str, rpc_url: str, max_sol_in: float, min_tip: int, tip_share: float, max_tip: int, reuse_wsol: bool, atomic: bool, lookup_tables: List[str], create_lookup_table: bool, dynamic_fees: bool, block_engines: List[str], fanout: Optional[int], trace_path: Optional[str], pool_index_path: Optional[str], discovery: str):
     with open(wallet, 'r') as file:
         wallet_keypair_data = json.load(file)
     payer_keypair = Keypair.from_bytes(bytes(wallet_keypair_data))
@@ -171,13 +192,49 @@ async def main(wallet: str, rpc_url: str):
     """     print(txn_sig) """
 
     async with SolanaClient(rpc_url=rpc_url) as solana_client:
-        async with RaydiumFetcher() as raydium_fetcher:
-            pools = await raydium_fetcher.fetch_top_lp_for_mint(
-                token_mint,
-                5, 1
+        if trace_path is not None:
+            tracer.add_exporter(JsonlExporter(trace_path))
+        current_slot = await solana_client.get_slot()
+        if current_slot is not None:
+            tracer.set_slot(current_slot)
+
+        token_account_registry = TokenAccountRegistry(payer_keypair.pubkey())
+        token_account_registry.derive_associated_addresses([Pubkey.from_string(token_mint)])
+        if not await token_account_registry.load(solana_client):
+            print("could not load wallet token accounts")
+            return
+
+        sysvar_cache = SysvarCache()
+        if not await sysvar_cache.refresh(solana_client):
+            print("could not load sysvars")
+            return
+
+        wsol_account_pool = None
+        if reuse_wsol:
+            wsol_account_pool = WsolAccountPool(payer_keypair.pubkey())
+            if not await wsol_account_pool.load(solana_client):
+                print("could not load wsol accounts")
+                return
+            await create_wsol_accounts(solana_client, payer_keypair, wsol_account_pool, sysvar_cache)
+
+        if discovery == "onchain":
+            pair_addresses = await fetch_pool_addresses_for_mint(
+                solana_client, Pubkey.from_string(token_mint), limit=POOLS_PER_MINT
             )
-            if not pools or len(pools) == 0:
-                raise Exception()
+            pools = [{"id": str(pair_address)} for pair_address in pair_addresses]
+        else:
+            pool_index = PoolIndex(pool_index_path) if pool_index_path is not None else None
+            try:
+                async with RaydiumFetcher(pool_index=pool_index) as raydium_fetcher:
+                    pools = await raydium_fetcher.fetch_top_lp_for_mint(
+                        token_mint,
+                        POOLS_PER_MINT, 1
+                    )
+            finally:
+                if pool_index is not None:
+                    pool_index.close()
+        if not pools or len(pools) == 0:
+            raise Exception()
 
         print("token mint", token_mint)
         liquidity_pools = []
@@ -192,7 +249,8 @@ async def main(wallet: str, rpc_url: str):
             print(f"fetched liquidity pool {pair_address}")
             liquidity_pools.append(liquidity_pool)
 
-            price = await liquidity_pool.get_token_price(solana_client)
+            with tracer.span("pricing"):
+                price = await liquidity_pool.get_token_price(solana_client)
             if price is None:
                 print(f"could not fetch price for liquidity pool {pair_address}")
             liquidity_pools_prices.append(price)
@@ -201,32 +259,113 @@ async def main(wallet: str, rpc_url: str):
             print("could not arbitrage")
             return
 
-        sol_in = 0.01
         bundle = True
         buy_pool = liquidity_pools[argmin(liquidity_pools_prices)]
         sell_pool = liquidity_pools[argmax(liquidity_pools_prices)]
         print("buy pool", buy_pool.pair_address)
         print("sell pool", sell_pool.pair_address)
 
-        async with JitoJsonRpcSDK(url="https://frankfurt.mainnet.block-engine.jito.wtf") as jito_client:
-            arbitrage_result = await arbitrage(
-                solana_client,
-                jito_client,
-                buy_pool,
-                sell_pool,
-                payer_keypair,
-                sol_in,
-                bundle=bundle,
+        trade_size = await find_optimal_trade_size(
+            solana_client,
+            buy_pool,
+            sell_pool,
+            max_sol_in,
+            lamports_per_signature=sysvar_cache.lamports_per_signature,
+        )
+        if trade_size is None or not trade_size.is_profitable:
+            print("no profitable trade size", trade_size)
+            return
+
+        # A tip proportional to the profit does not move the best size, so
+        # the size is searched without it and the tip taken from the rest.
+        tip_amount = 0
+        if bundle:
+            tip_amount = TipPolicy(tip_share, min_tip, max_tip).get_tip(trade_size.net_profit)
+            if tip_amount is None:
+                print("profit does not cover the minimum tip", trade_size)
+                return
+
+        sol_in = trade_size.amount_in / (10 ** SOL_DECIMALS)
+        print("trade size", sol_in, "expected net profit", trade_size.net_profit - tip_amount, "tip", tip_amount)
+
+        lookup_table_manager = None
+        if len(lookup_tables) > 0 or create_lookup_table:
+            lookup_table_manager = LookupTableManager(payer_keypair.pubkey())
+            await lookup_table_manager.load(solana_client, [Pubkey.from_string(t) for t in lookup_tables])
+            # New entries are usable from the next run, once they are loaded.
+            extended_tables = await extend_lookup_tables(
+                solana_client, payer_keypair, lookup_table_manager, [buy_pool, sell_pool], create_lookup_table
             )
-            if arbitrage_result is None:
-                print("error")
+            for table_address in extended_tables:
+                print("extended lookup table", table_address)
+
+        compute_budget_planner = ComputeBudgetPlanner() if dynamic_fees else None
+
+        block_engine_urls = {region: JITO_BLOCK_ENGINE_URLS[region] for region in block_engines}
+        async with BundleSubmitter(block_engine_urls, fanout) as jito_client:
+            await jito_client.warm_up()
+            tip_account_cache = TipAccountCache()
+            await tip_account_cache.refresh(jito_client)
+            arbitrage_function = atomic_arbitrage if atomic else arbitrage
+
+            async def execute(opportunity):
+                buy_pool, sell_pool, trade_size = opportunity
+                return await arbitrage_function(
+                    solana_client,
+                    jito_client,
+                    buy_pool,
+                    sell_pool,
+                    payer_keypair,
+                    trade_size,
+                    bundle=bundle,
+                    tip_amount=tip_amount,
+                    token_account_registry=token_account_registry,
+                    sysvar_cache=sysvar_cache,
+                    wsol_account_pool=wsol_account_pool,
+                    lookup_table_manager=lookup_table_manager,
+                    compute_budget_planner=compute_budget_planner,
+                    tip_account_cache=tip_account_cache,
+                )
+
+            async def confirm(scheduled, arbitrage_result):
+                if bundle:
+                    bundle_status = await bundle_tracker.track(arbitrage_result['data']['result'])
+                    print(bundle_status)
+                if wsol_account_pool is not None:
+                    await wsol_account_pool.load(solana_client)
+
+            current_slot = await solana_client.get_slot()
+            if current_slot is None:
+                print("could not fetch slot")
                 return
 
-            if bundle:
-                await check_bundle_status(jito_client, arbitrage_result['data']['result'])
+            bundle_tracker = BundleTracker(jito_client)
+            bundle_tracker.start()
+            scheduler = ExecutionScheduler(execute, confirm)
+            scheduler.set_slot(current_slot)
+            scheduler.start(solana_client)
+            await scheduler.submit(ScheduledOpportunity(
+                opportunity=(buy_pool, sell_pool, trade_size),
+                expected_profit=trade_size.net_profit - tip_amount,
+                expiry_slot=current_slot + OPPORTUNITY_TTL_SLOTS,
+                route_key=(buy_pool.pair_address, sell_pool.pair_address),
+                writable_accounts=get_route_writable_accounts([buy_pool, sell_pool]),
+            ))
+            await scheduler.drain()
+            await scheduler.stop()
+            await bundle_tracker.stop()
+            if scheduler.stats["executed"] == 0:
+                print("error", scheduler.stats)
+
+        for name, stats in tracer.summarize().items():
+            print("trace", name, stats)
+        tracer.flush()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    asyncio.run(main(args.wallet, args.rpc_url))
+    run = main(args.wallet, args.rpc_url, args.max_sol_in, args.tip, args.tip_share, args.max_tip, args.reuse_wsol, args.atomic, args.lookup_tables, args.create_lookup_table, args.dynamic_fees, args.block_engines, args.fanout, args.trace, args.pool_index, args.discovery)
+    if args.profile is not None:
+        run = Profiler(args.profile, args.profile_output).run(run)
+    asyncio.run(run)
 
@@ -0,0 +1,125 @@
+import asyncio
+import argparse
+from typing import Optional
+
+from sol_arbitrage_bot.solana_client import SolanaClient
+from sol_arbitrage_bot.raydium.raydium_fetcher import RaydiumFetcher
+from sol_arbitrage_bot.scanner import Scanner, SCAN_INTERVAL, POOLS_PER_MINT
+from sol_arbitrage_bot.profiling import PROFILE_MODES, Profiler
+from sol_arbitrage_bot.pool_index import PoolIndex
+from sol_arbitrage_bot.constants import SOL_RPC_URL
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Arbitrage opportunity scanner")
+    parser.add_argument(
+        "--watchlist",
+        "-m",
+        type=str,
+        required=True,
+        help="Path to a file with one token mint per line"
+    )
+    parser.add_argument(
+        "--rpc-url",
+        "-r",
+        type=str,
+        required=False,
+        default=SOL_RPC_URL,
+        help="Solana RPC"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        required=False,
+        default=SCAN_INTERVAL,
+        help="Seconds between snapshots"
+    )
+    parser.add_argument(
+        "--pools-per-mint",
+        type=int,
+        required=False,
+        default=POOLS_PER_MINT,
+        help="Number of top pools loaded for each mint"
+    )
+    parser.add_argument(
+        "--min-spread",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Only report opportunities above this relative spread"
+    )
+    parser.add_argument(
+        "--pool-index",
+        type=str,
+        required=False,
+        default=None,
+        help="SQLite file caching discovered pools between runs"
+    )
+    parser.add_argument(
+        "--cycles",
+        type=int,
+        required=False,
+        default=None,
+        help="Stop after this many snapshots"
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile the scan: cpu (cProfile), tasks (event loop time per task) or memory (tracemalloc)"
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        required=False,
+        default=None,
+        help="File the profile is written to"
+    )
+    return parser.parse_args()
+
+
+def read_watchlist(path: str):
+    with open(path, 'r') as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+
+async def scan(watchlist: str, rpc_url: str, interval: float, pools_per_mint: int, min_spread: float, cycles: Optional[int] = None, pool_index_path: Optional[str] = None):
+    token_mints = read_watchlist(watchlist)
+    print(f"scanning {len(token_mints)} mints")
+
+    async with SolanaClient(rpc_url=rpc_url) as solana_client:
+        pool_index = PoolIndex(pool_index_path) if pool_index_path is not None else None
+        try:
+            async with RaydiumFetcher(pool_index=pool_index) as raydium_fetcher:
+                refresh_task = None
+                if pool_index is not None:
+                    refresh_task = asyncio.create_task(raydium_fetcher.run_pool_index_refresh(token_mints, pools_per_mint))
+
+                scanner = Scanner(solana_client, raydium_fetcher, pools_per_mint=pools_per_mint)
+                cycle = 0
+                async for opportunities in scanner.run(token_mints, interval, min_spread):
+                    for opportunity in opportunities:
+                        print(
+                            f"{opportunity.token_mint} spread {opportunity.spread:.4%} "
+                            f"buy {opportunity.buy_pool.pair_address} "
+                            f"sell {opportunity.sell_pool.pair_address}"
+                        )
+                    cycle += 1
+                    if cycles is not None and cycle >= cycles:
+                        break
+
+                if refresh_task is not None:
+                    refresh_task.cancel()
+                    await asyncio.gather(refresh_task, return_exceptions=True)
+        finally:
+            if pool_index is not None:
+                pool_index.close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run = scan(args.watchlist, args.rpc_url, args.interval, args.pools_per_mint, args.min_spread, args.cycles, args.pool_index)
+    if args.profile is not None:
+        run = Profiler(args.profile, args.profile_output).run(run)
+    asyncio.run(run)
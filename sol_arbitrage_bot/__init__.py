@@ -1,7 +1,25 @@
 from .constants import *
 from .solana_client import *
+from .token_accounts import *
+from .sysvar_cache import *
 from .accounts import *
+from .wsol import *
+from .lookup_tables import *
+from .compute_budget import *
+from .tips import *
+from .tracing import *
+from .profiling import *
+from .pool_index import *
 from .arbitrage import *
+from .arbitrage_program import *
 from .pool_base import *
 from .liquidity_pool import *
+from .sizing import *
+from .scanner import *
+from .graph import *
+from .evaluator import *
+from .scheduler import *
+from .block_engines import *
+from .bundle_tracker import *
+from .templates import *
 from . import raydium
@@ -23,13 +23,19 @@ from solders.system_program import (
 
 from .solana_client import SolanaClient
 from .constants import SOL_MINT, TOKEN_PROGRAM_ID, ACCOUNT_LAYOUT_LEN
+from .token_accounts import TokenAccountRegistry
+from .sysvar_cache import SysvarCache
 
 
 async def get_or_create_token_account(
     solana_client: SolanaClient,
     payer_keypair: Keypair,
-    mint: Pubkey
+    mint: Pubkey,
+    token_account_registry: Optional[TokenAccountRegistry] = None,
 ) -> Tuple[Pubkey, Optional[Instruction]]:
+    if token_account_registry is not None and token_account_registry.loaded:
+        return token_account_registry.get_or_create_token_account(payer_keypair.pubkey(), mint)
+
     token_account_check = await solana_client.get_token_accounts_by_owner(
         payer_keypair.pubkey(), mint,
     )
@@ -46,27 +52,19 @@ async def get_or_create_token_account(
     return token_account, create_instruction
 
 
-async def create_and_init_wsol_account_instructions(
-    solana_client: SolanaClient,
-    payer_keypair: Keypair,
-    amount_in: int
-) -> Optional[Tuple[Pubkey, List[Instruction]]]:
-    seed = base64.urlsafe_b64encode(os.urandom(24)).decode("utf-8")
-    wsol_token_account = Pubkey.create_with_seed(
-        payer_keypair.pubkey(), seed, TOKEN_PROGRAM_ID
-    )
-    balance_needed = await AsyncToken.get_min_balance_rent_for_exempt_for_account(solana_client.client)
-    if balance_needed is None:
-        logging.error(f"Could not get get_min_balance_rent_for_exempt_for_account")
-        return None
-
+def make_wsol_account_instructions(
+    payer: Pubkey,
+    seed: str,
+    lamports: int,
+) -> Tuple[Pubkey, List[Instruction]]:
+    wsol_token_account = Pubkey.create_with_seed(payer, seed, TOKEN_PROGRAM_ID)
     create_wsol_instruction = create_account_with_seed(
         CreateAccountWithSeedParams(
-            from_pubkey=payer_keypair.pubkey(),
+            from_pubkey=payer,
             to_pubkey=wsol_token_account,
-            base=payer_keypair.pubkey(),
+            base=payer,
             seed=seed,
-            lamports=int(balance_needed + amount_in),
+            lamports=lamports,
             space=ACCOUNT_LAYOUT_LEN,
             owner=TOKEN_PROGRAM_ID,
         )
@@ -76,12 +74,41 @@ async def create_and_init_wsol_account_instructions(
             program_id=TOKEN_PROGRAM_ID,
             account=wsol_token_account,
             mint=SOL_MINT,
-            owner=payer_keypair.pubkey(),
+            owner=payer,
         )
     )
     return wsol_token_account, [create_wsol_instruction, init_wsol_instruction]
 
 
+async def get_token_account_rent(
+    solana_client: SolanaClient,
+    sysvar_cache: Optional[SysvarCache] = None,
+) -> Optional[int]:
+    if sysvar_cache is not None and sysvar_cache.loaded:
+        return sysvar_cache.get_rent_exempt_minimum(ACCOUNT_LAYOUT_LEN)
+    return await AsyncToken.get_min_balance_rent_for_exempt_for_account(solana_client.client)
+
+
+def make_wsol_seed() -> str:
+    return base64.urlsafe_b64encode(os.urandom(24)).decode("utf-8")
+
+
+async def create_and_init_wsol_account_instructions(
+    solana_client: SolanaClient,
+    payer_keypair: Keypair,
+    amount_in: int,
+    sysvar_cache: Optional[SysvarCache] = None,
+) -> Optional[Tuple[Pubkey, List[Instruction]]]:
+    balance_needed = await get_token_account_rent(solana_client, sysvar_cache)
+    if balance_needed is None:
+        logging.error(f"Could not get get_min_balance_rent_for_exempt_for_account")
+        return None
+
+    return make_wsol_account_instructions(
+        payer_keypair.pubkey(), make_wsol_seed(), int(balance_needed + amount_in)
+    )
+
+
 def close_account_instruction(wsol_token_account: Pubkey, payer_keypair: Keypair) -> Instruction:
     return close_account(
         CloseAccountParams(
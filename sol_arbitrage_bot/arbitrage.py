@@ -1,38 +1,45 @@
 import base58
 from solana.rpc.types import TxOpts
+from solana.rpc.commitment import Finalized
 
-from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
 from solders.system_program import transfer, TransferParams
 from solders.keypair import Keypair
 from solders.transaction import VersionedTransaction
 from solders.message import MessageV0
+from solders.address_lookup_table_account import AddressLookupTableAccount
 
 from jito_async import JitoJsonRpcSDK
 
 from sol_arbitrage_bot.constants import UNIT_BUDGET, UNIT_PRICE
 from sol_arbitrage_bot.accounts import *
 from sol_arbitrage_bot.pool_base import LiquidityPool
+from sol_arbitrage_bot.token_accounts import TokenAccountRegistry
+from sol_arbitrage_bot.sysvar_cache import SysvarCache
+from sol_arbitrage_bot.wsol import WsolAccountPool
+from sol_arbitrage_bot.lookup_tables import LookupTableManager
+from sol_arbitrage_bot.compute_budget import ComputeBudgetPlanner, make_compute_budget_instructions
+from sol_arbitrage_bot.tips import TipAccountCache
+from sol_arbitrage_bot.sizing import TradeSize
+from sol_arbitrage_bot.tracing import traced, tracer
 
 from .solana_client import SolanaClient
 
 
-def make_transaction_fee_instructions():
-    return [
-        set_compute_unit_limit(UNIT_BUDGET),
-        set_compute_unit_price(UNIT_PRICE),
-    ]
+def make_transaction_fee_instructions(unit_budget: int = UNIT_BUDGET, unit_price: int = UNIT_PRICE):
+    return make_compute_budget_instructions(unit_budget, unit_price)
 
 
 def compile_transaction(
     payer_keypair: Keypair,
     instructions: List[Instruction],
     latest_blockhash,
+    address_lookup_tables: Optional[List[AddressLookupTableAccount]] = None,
 ) -> VersionedTransaction:
 
     compiled_message = MessageV0.try_compile(
         payer_keypair.pubkey(),
         instructions,
-        [],
+        address_lookup_tables or [],
         latest_blockhash.blockhash,
     )
 
@@ -43,12 +50,15 @@ async def create_tip_instruction(
     jito_client: JitoJsonRpcSDK,
     payer_keypair: Keypair,
     tip_amount: int,
+    tip_account_cache: Optional[TipAccountCache] = None,
 ) -> Optional[Instruction]:
-    tip_account_str = await jito_client.get_random_tip_account()
-    if tip_account_str is None:
-        return None
-
-    tip_account = Pubkey.from_string(tip_account_str)
+    if tip_account_cache is not None and tip_account_cache.loaded:
+        tip_account = tip_account_cache.get_random_tip_account()
+    else:
+        tip_account_str = await jito_client.get_random_tip_account()
+        if tip_account_str is None:
+            return None
+        tip_account = Pubkey.from_string(tip_account_str)
 
     transfer_ix = transfer(
         TransferParams(
@@ -85,10 +95,11 @@ async def create_token_account(
     solana_client: SolanaClient,
     payer_keypair: Keypair,
     mint: Pubkey,
+    token_account_registry: Optional[TokenAccountRegistry] = None,
 ):
     instructions = make_transaction_fee_instructions()
-    _, create_token_account_instruction = await get_or_create_token_account(
-        solana_client, payer_keypair, mint
+    token_account, create_token_account_instruction = await get_or_create_token_account(
+        solana_client, payer_keypair, mint, token_account_registry
     )
     if create_token_account_instruction is None:
         print("token account already created")
@@ -99,129 +110,259 @@ async def create_token_account(
         logging.error("error. no latest blockhash")
         return
 
+    instructions.append(create_token_account_instruction)
     txn = compile_transaction(payer_keypair, instructions, latest_blockhash)
+    txn_sig = await solana_client.send_transaction(txn, TxOpts(skip_preflight=True))
+    if txn_sig is not None and token_account_registry is not None:
+        token_account_registry.record_created(token_account, mint)
+    return txn_sig
 
-    instructions.append(create_token_account_instruction)
+
+async def create_wsol_accounts(
+    solana_client: SolanaClient,
+    payer_keypair: Keypair,
+    wsol_account_pool: WsolAccountPool,
+    sysvar_cache: SysvarCache,
+):
+    create_instructions = wsol_account_pool.make_create_instructions(sysvar_cache)
+    if create_instructions is None:
+        return
+    if len(create_instructions) == 0:
+        print("wsol accounts already created")
+        return
+
+    latest_blockhash = await solana_client.get_latest_blockhash()
+    if latest_blockhash is None:
+        logging.error("error. no latest blockhash")
+        return
+
+    instructions = make_transaction_fee_instructions() + create_instructions
+    txn = compile_transaction(payer_keypair, instructions, latest_blockhash)
     txn_sig = await solana_client.send_transaction(txn, TxOpts(skip_preflight=True))
+    if txn_sig is not None:
+        wsol_account_pool.record_created()
     return txn_sig
 
 
+async def extend_lookup_tables(
+    solana_client: SolanaClient,
+    payer_keypair: Keypair,
+    lookup_table_manager: LookupTableManager,
+    liquidity_pools: List[LiquidityPool],
+    allow_create: bool = False,
+) -> List[Pubkey]:
+    """
+    Sends the transactions adding the pools' static accounts to the
+    wallet's lookup tables and returns the tables written to. With
+    allow_create a new table is created when the known ones are full; the
+    extends after its creation wait for it to be confirmed.
+    """
+    missing = lookup_table_manager.get_missing_addresses(liquidity_pools)
+    if len(missing) == 0:
+        return []
+
+    # CreateLookupTable needs a slot from the executing bank's SlotHashes;
+    # a processed slot may sit on a fork that gets abandoned.
+    recent_slot = await solana_client.get_slot(Finalized)
+    latest_blockhash = await solana_client.get_latest_blockhash()
+    if recent_slot is None or latest_blockhash is None:
+        logging.error("error. no slot or latest blockhash")
+        return []
+
+    touched = []
+    for table_address, creates, count, table_instructions in lookup_table_manager.plan_extensions(
+        payer_keypair.pubkey(), missing, recent_slot, allow_create
+    ):
+        instructions = make_transaction_fee_instructions() + table_instructions
+        txn = compile_transaction(payer_keypair, instructions, latest_blockhash)
+        txn_sig = await solana_client.send_transaction(txn, TxOpts(skip_preflight=True))
+        if txn_sig is not None and creates:
+            if not await solana_client.confirm_transaction(txn_sig, latest_blockhash.last_valid_block_height):
+                txn_sig = None
+        if txn_sig is None:
+            logging.error(f"Could not extend address lookup table {table_address}")
+            if creates:
+                # The table does not exist and every later transaction extends it.
+                lookup_table_manager.pending.pop(table_address, None)
+                break
+            lookup_table_manager.release(table_address, count)
+            continue
+        if table_address not in touched:
+            touched.append(table_address)
+    return touched
+
+
+@traced("arbitrage")
 async def arbitrage(
     solana_client: SolanaClient,
     jito_client: JitoJsonRpcSDK,
     buy_liquidity_pool: LiquidityPool,
     sell_liquidity_pool: LiquidityPool,
     payer_keypair: Keypair,
-    base_in: float,
+    trade_size: TradeSize,
     base_mint: Pubkey = SOL_MINT,
     bundle: bool = False,
+    tip_amount: int = 1000,
+    token_account_registry: Optional[TokenAccountRegistry] = None,
+    sysvar_cache: Optional[SysvarCache] = None,
+    wsol_account_pool: Optional[WsolAccountPool] = None,
+    lookup_table_manager: Optional[LookupTableManager] = None,
+    compute_budget_planner: Optional[ComputeBudgetPlanner] = None,
+    tip_account_cache: Optional[TipAccountCache] = None,
 ):
+    """
+    Buys and sells exactly the amounts trade_size was priced at. The sell
+    leg fails unless it returns the input plus fees and tip.
+
+    With a wsol_account_pool the trade runs through one of the pool's
+    persistent WSOL accounts instead of creating and closing one. With a
+    compute_budget_planner each leg gets its own CU limit and unit price.
+    """
+    build_span = tracer.start_span("build")
     buy_arb_instructions = make_transaction_fee_instructions()
 
     quote_mint = buy_liquidity_pool.get_quote_mint(base_mint)
     if quote_mint is None:
         logging.error("invalid base mint")
+        tracer.finish_span(build_span)
         return
 
-    base_quote_decimals = buy_liquidity_pool.get_base_quote_decimals(base_mint)
-    if base_quote_decimals is None:
-        logging.error("invalid base mint")
-        return
-
-    base_decimals, _ = base_quote_decimals
-    base_in_count = int(base_in * (10 ** base_decimals))
+    base_in_count = trade_size.amount_in
+    quote_in_count = trade_size.quote_amount
 
-    account_and_wsol_account_instructions = await create_and_init_wsol_account_instructions(
-        solana_client, payer_keypair, base_in_count
-    )
+    if wsol_account_pool is not None:
+        account_and_wsol_account_instructions = wsol_account_pool.acquire(base_in_count)
+    else:
+        account_and_wsol_account_instructions = await create_and_init_wsol_account_instructions(
+            solana_client, payer_keypair, base_in_count, sysvar_cache
+        )
     if account_and_wsol_account_instructions is None:
         logging.error("Could not create and init wsol account while making buy instructions")
+        tracer.finish_span(build_span)
         return None
 
     wsol_token_account, wsol_account_instructions = account_and_wsol_account_instructions
-    buy_arb_instructions.extend(wsol_account_instructions)
+    sent = False
+    try:
+        buy_arb_instructions.extend(wsol_account_instructions)
 
-    token_account, create_token_account_instruction = await get_or_create_token_account(
-        solana_client, payer_keypair, quote_mint
-    )
-    if create_token_account_instruction is not None:
-        logging.error("Create quote token account")
-        return
-
-    min_quote_out_buy_instructions = await buy_liquidity_pool.make_buy_instructions(
-        solana_client=solana_client,
-        payer_keypair=payer_keypair,
-        slippage=0,
-        base_in=base_in,
-        quote_token_account=token_account,
-        base_token_account=wsol_token_account,
-        base_mint=base_mint,
-    )
-    if min_quote_out_buy_instructions is None:
-        logging.error("could not create buy instruction")
-        return
-
-    min_quote_out, buy_instructions = min_quote_out_buy_instructions
-    buy_arb_instructions.extend(buy_instructions)
-
-    print(base_in, min_quote_out)
+        token_account, create_token_account_instruction = await get_or_create_token_account(
+            solana_client, payer_keypair, quote_mint, token_account_registry
+        )
+        if create_token_account_instruction is not None:
+            logging.error("Create quote token account")
+            return
 
-    """ # sell transaction """
-    sell_arb_instructions = make_transaction_fee_instructions()
+        buy_instruction = buy_liquidity_pool.make_swap_instruction(
+            amount_in=base_in_count,
+            minimum_amount_out=quote_in_count,
+            token_account_in=wsol_token_account,
+            token_account_out=token_account,
+            owner=payer_keypair.pubkey(),
+            input_mint=base_mint,
+        )
+        if buy_instruction is None:
+            logging.error("could not create buy instruction")
+            return
+        buy_arb_instructions.append(buy_instruction)
 
-    sell_instructions = await sell_liquidity_pool.make_sell_instructions(
-        solana_client=solana_client,
-        payer_keypair=payer_keypair,
-        slippage=0,
-        quote_in=min_quote_out * 0.95,
-        quote_token_account=token_account,
-        base_token_account=wsol_token_account,
-        base_mint=SOL_MINT,
-    )
-    if sell_instructions is None:
-        logging.error("could not create sell instruction")
-        return
+        print(base_in_count, quote_in_count)
 
-    sell_arb_instructions.extend(sell_instructions)
-    sell_arb_instructions.append(close_account_instruction(wsol_token_account, payer_keypair))
+        """ # sell transaction """
+        sell_arb_instructions = make_transaction_fee_instructions()
 
-    if bundle:
-        tip_instruction = await create_tip_instruction(jito_client, payer_keypair, 1000)
-        if tip_instruction is None:
+        sell_instruction = sell_liquidity_pool.make_swap_instruction(
+            amount_in=quote_in_count,
+            minimum_amount_out=trade_size.get_minimum_amount_out(tip_amount if bundle else 0),
+            token_account_in=token_account,
+            token_account_out=wsol_token_account,
+            owner=payer_keypair.pubkey(),
+            input_mint=quote_mint,
+        )
+        if sell_instruction is None:
+            logging.error("could not create sell instruction")
             return
-        sell_arb_instructions.append(tip_instruction)
 
-    latest_blockhash = await solana_client.get_latest_blockhash()
-    if latest_blockhash is None:
-        logging.error("error. no latest blockhash")
-        return
-
-    buy_arb_txn = compile_transaction(
-        payer_keypair,
-        buy_arb_instructions,
-        latest_blockhash
-    )
-    sell_arb_txn = compile_transaction(
-        payer_keypair,
-        sell_arb_instructions,
-        latest_blockhash
-    )
-    arb_txns = [buy_arb_txn, sell_arb_txn]
+        sell_arb_instructions.append(sell_instruction)
+        if wsol_account_pool is None:
+            sell_arb_instructions.append(close_account_instruction(wsol_token_account, payer_keypair))
 
-    if bundle:
-        encoded_txns = [
-            base58.b58encode(bytes(arb_txn)).decode("ascii")
-            for arb_txn in arb_txns
-        ]
+        if bundle:
+            tip_instruction = await create_tip_instruction(jito_client, payer_keypair, tip_amount, tip_account_cache)
+            if tip_instruction is None:
+                return
+            sell_arb_instructions.append(tip_instruction)
 
-        bundle_id = await jito_client.send_bundle(encoded_txns)
-        return bundle_id
+        latest_blockhash = await solana_client.get_latest_blockhash()
+        if latest_blockhash is None:
+            logging.error("error. no latest blockhash")
+            return
 
-    for txn in arb_txns:
-        txn_sig = await solana_client.send_transaction(
-            txn,
-            TxOpts(skip_preflight=True)
-        )
-        print(txn_sig)
+        buy_lookup_tables = sell_lookup_tables = None
+        if lookup_table_manager is not None:
+            buy_lookup_tables = lookup_table_manager.select_tables(buy_arb_instructions)
+            sell_lookup_tables = lookup_table_manager.select_tables(sell_arb_instructions)
+
+        if compute_budget_planner is not None:
+            buy_profile_key = ("buy",) + buy_liquidity_pool.get_compute_profile_key(base_in_count, base_mint)
+            sell_profile_key = ("sell",) + sell_liquidity_pool.get_compute_profile_key(quote_in_count, quote_mint)
+            buy_arb_instructions = await compute_budget_planner.plan(
+                solana_client, payer_keypair, buy_profile_key, buy_arb_instructions, latest_blockhash, buy_lookup_tables
+            )
+            # The sell leg spends tokens the buy leg has not delivered yet,
+            # so it is profiled behind the buy leg.
+            sell_arb_instructions = await compute_budget_planner.plan_after(
+                solana_client,
+                payer_keypair,
+                sell_profile_key,
+                sell_arb_instructions,
+                buy_profile_key,
+                buy_arb_instructions,
+                latest_blockhash,
+                sell_lookup_tables,
+                buy_lookup_tables,
+            )
+
+        tracer.finish_span(build_span)
+
+        with tracer.span("sign"):
+            buy_arb_txn = compile_transaction(
+                payer_keypair,
+                buy_arb_instructions,
+                latest_blockhash,
+                buy_lookup_tables,
+            )
+            sell_arb_txn = compile_transaction(
+                payer_keypair,
+                sell_arb_instructions,
+                latest_blockhash,
+                sell_lookup_tables,
+            )
+        arb_txns = [buy_arb_txn, sell_arb_txn]
+
+        with tracer.span("send", bundle=bundle):
+            if bundle:
+                encoded_txns = [
+                    base58.b58encode(bytes(arb_txn)).decode("ascii")
+                    for arb_txn in arb_txns
+                ]
+
+                bundle_id = await jito_client.send_bundle(encoded_txns)
+                sent = bundle_id is not None
+                return bundle_id
+
+            for txn in arb_txns:
+                txn_sig = await solana_client.send_transaction(
+                    txn,
+                    TxOpts(skip_preflight=True)
+                )
+                sent = sent or txn_sig is not None
+                print(txn_sig)
+    finally:
+        # Ends the build span when building gave up early.
+        tracer.finish_span(build_span)
+        if wsol_account_pool is not None:
+            # Nothing left the account unless a transaction went out.
+            wsol_account_pool.release(wsol_token_account, base_in_count if sent else 0)
 
 
@@ -0,0 +1,292 @@
+import struct
+import hashlib
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import base58
+from solana.rpc.types import TxOpts
+
+from solders.pubkey import Pubkey
+from solders.keypair import Keypair
+from solders.instruction import AccountMeta, Instruction
+from solders.system_program import ID as SYSTEM_PROGRAM_ID
+
+from jito_async import JitoJsonRpcSDK
+
+from .solana_client import SolanaClient
+from .constants import SOL_MINT, ARBITRAGE_PROGRAM_ID
+from .accounts import (
+    close_account_instruction,
+    create_and_init_wsol_account_instructions,
+    get_or_create_token_account,
+)
+from .pool_base import LiquidityPool
+from .token_accounts import TokenAccountRegistry
+from .sysvar_cache import SysvarCache
+from .wsol import WsolAccountPool
+from .lookup_tables import LookupTableManager
+from .compute_budget import ComputeBudgetPlanner
+from .tips import TipAccountCache
+from .sizing import TradeSize
+from .tracing import traced, tracer
+from .arbitrage import compile_transaction, create_tip_instruction, make_transaction_fee_instructions
+from .raydium.amm_v4 import AmmV4Pool
+from .raydium.clmm import ClmmPool
+
+
+SWAP_STATE_SEED = b"swap_state"
+ATOMIC_UNIT_BUDGET = 400_000
+# RaydiumClmmSwap always takes the current tick array plus two more.
+CLMM_SWAP_TICK_ARRAYS = 3
+
+
+@lru_cache(maxsize=None)
+def anchor_discriminator(instruction_name: str) -> bytes:
+    return hashlib.sha256(f"global:{instruction_name}".encode("utf-8")).digest()[:8]
+
+
+@lru_cache(maxsize=None)
+def get_swap_state_address(program_id: Pubkey = ARBITRAGE_PROGRAM_ID) -> Pubkey:
+    swap_state, _ = Pubkey.find_program_address([SWAP_STATE_SEED], program_id)
+    return swap_state
+
+
+def make_init_program_instruction(payer: Pubkey, program_id: Pubkey = ARBITRAGE_PROGRAM_ID) -> Instruction:
+    keys = [
+        AccountMeta(pubkey=get_swap_state_address(program_id), is_signer=False, is_writable=True),
+        AccountMeta(pubkey=payer, is_signer=True, is_writable=True),
+        AccountMeta(pubkey=SYSTEM_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+    return Instruction(program_id, anchor_discriminator("init_program"), keys)
+
+
+def make_start_swap_instruction(
+    token_account: Pubkey,
+    swap_input: int,
+    program_id: Pubkey = ARBITRAGE_PROGRAM_ID,
+) -> Instruction:
+    """
+    Records the balance of token_account and the input of the first swap.
+    """
+    keys = [
+        AccountMeta(pubkey=token_account, is_signer=False, is_writable=False),
+        AccountMeta(pubkey=get_swap_state_address(program_id), is_signer=False, is_writable=True),
+    ]
+    data = anchor_discriminator("start_swap") + struct.pack('<Q', swap_input)
+    return Instruction(program_id, data, keys)
+
+
+def make_profit_or_revert_instruction(
+    token_account: Pubkey,
+    program_id: Pubkey = ARBITRAGE_PROGRAM_ID,
+) -> Instruction:
+    """
+    Fails the transaction unless token_account ends above the balance
+    recorded by start_swap.
+    """
+    keys = [
+        AccountMeta(pubkey=token_account, is_signer=False, is_writable=False),
+        AccountMeta(pubkey=get_swap_state_address(program_id), is_signer=False, is_writable=True),
+    ]
+    return Instruction(program_id, anchor_discriminator("profit_or_revert"), keys)
+
+
+def make_program_swap_instruction(
+    liquidity_pool: LiquidityPool,
+    token_account_in: Pubkey,
+    token_account_out: Pubkey,
+    owner: Pubkey,
+    input_mint: Pubkey,
+    program_id: Pubkey = ARBITRAGE_PROGRAM_ID,
+) -> Optional[Instruction]:
+    """
+    Swap through the arbitrage program. The amount in is the output of the
+    previous swap, kept in the swap_state account.
+
+    RaydiumAmmV4Swap and RaydiumClmmSwap list the accounts in the same
+    order as the Raydium swap instructions, followed by swap_state, so the
+    pool's own instruction supplies them.
+    """
+    if isinstance(liquidity_pool, AmmV4Pool):
+        instruction_name = "raydium_amm_v4_swap"
+    elif isinstance(liquidity_pool, ClmmPool):
+        instruction_name = "raydium_clmm_swap"
+    else:
+        logging.error(f"Arbitrage program does not support pool {liquidity_pool.pair_address}")
+        return None
+
+    swap_instruction = liquidity_pool.make_swap_instruction(
+        amount_in=0,
+        minimum_amount_out=0,
+        token_account_in=token_account_in,
+        token_account_out=token_account_out,
+        owner=owner,
+        input_mint=input_mint,
+    )
+    if swap_instruction is None:
+        return None
+
+    keys = list(swap_instruction.accounts)
+    if isinstance(liquidity_pool, ClmmPool):
+        # get_swap_route_key is the bitmap extension followed by the tick
+        # arrays. Repeating a tick array would make Raydium borrow it twice.
+        tick_array_count = len(liquidity_pool.get_swap_route_key(input_mint)) - 1
+        if tick_array_count < CLMM_SWAP_TICK_ARRAYS:
+            logging.error(
+                f"Arbitrage program needs {CLMM_SWAP_TICK_ARRAYS} tick arrays, "
+                f"pool {liquidity_pool.pair_address} has {tick_array_count}"
+            )
+            return None
+    keys.append(AccountMeta(pubkey=get_swap_state_address(program_id), is_signer=False, is_writable=True))
+    return Instruction(program_id, anchor_discriminator(instruction_name), keys)
+
+
+def make_atomic_swap_instructions(
+    route: List[Tuple[LiquidityPool, Pubkey, Pubkey, Pubkey]],
+    owner: Pubkey,
+    amount_in: int,
+    program_id: Pubkey = ARBITRAGE_PROGRAM_ID,
+) -> Optional[List[Instruction]]:
+    """
+    route is a list of (pool, input_mint, token_account_in,
+    token_account_out) hops starting and ending in the same token account.
+    Returns start_swap, one program swap per hop and profit_or_revert.
+    """
+    if len(route) == 0:
+        return None
+
+    src_token_account = route[0][2]
+    if route[-1][3] != src_token_account:
+        logging.error("Atomic route has to end in its source token account")
+        return None
+
+    instructions = [make_start_swap_instruction(src_token_account, amount_in, program_id)]
+    for liquidity_pool, input_mint, token_account_in, token_account_out in route:
+        swap_instruction = make_program_swap_instruction(
+            liquidity_pool, token_account_in, token_account_out, owner, input_mint, program_id
+        )
+        if swap_instruction is None:
+            return None
+        instructions.append(swap_instruction)
+    instructions.append(make_profit_or_revert_instruction(src_token_account, program_id))
+    return instructions
+
+
+@traced("arbitrage")
+async def atomic_arbitrage(
+    solana_client: SolanaClient,
+    jito_client: JitoJsonRpcSDK,
+    buy_liquidity_pool: LiquidityPool,
+    sell_liquidity_pool: LiquidityPool,
+    payer_keypair: Keypair,
+    trade_size: TradeSize,
+    base_mint: Pubkey = SOL_MINT,
+    bundle: bool = False,
+    tip_amount: int = 1000,
+    token_account_registry: Optional[TokenAccountRegistry] = None,
+    sysvar_cache: Optional[SysvarCache] = None,
+    wsol_account_pool: Optional[WsolAccountPool] = None,
+    lookup_table_manager: Optional[LookupTableManager] = None,
+    compute_budget_planner: Optional[ComputeBudgetPlanner] = None,
+    tip_account_cache: Optional[TipAccountCache] = None,
+):
+    """
+    Same round trip as arbitrage(), but both legs run in one transaction
+    through the arbitrage program, which reverts unless the WSOL balance
+    grows.
+    """
+    build_span = tracer.start_span("build")
+    payer = payer_keypair.pubkey()
+    quote_mint = buy_liquidity_pool.get_quote_mint(base_mint)
+    if quote_mint is None:
+        logging.error("invalid base mint")
+        tracer.finish_span(build_span)
+        return
+
+    base_in_count = trade_size.amount_in
+
+    quote_token_account, create_token_account_instruction = await get_or_create_token_account(
+        solana_client, payer_keypair, quote_mint, token_account_registry
+    )
+    if create_token_account_instruction is not None:
+        logging.error("Create quote token account")
+        tracer.finish_span(build_span)
+        return
+
+    if wsol_account_pool is not None:
+        account_and_wsol_account_instructions = wsol_account_pool.acquire(base_in_count)
+    else:
+        account_and_wsol_account_instructions = await create_and_init_wsol_account_instructions(
+            solana_client, payer_keypair, base_in_count, sysvar_cache
+        )
+    if account_and_wsol_account_instructions is None:
+        logging.error("Could not create and init wsol account")
+        tracer.finish_span(build_span)
+        return
+
+    wsol_token_account, wsol_account_instructions = account_and_wsol_account_instructions
+    sent = False
+    try:
+        swap_instructions = make_atomic_swap_instructions(
+            [
+                (buy_liquidity_pool, base_mint, wsol_token_account, quote_token_account),
+                (sell_liquidity_pool, quote_mint, quote_token_account, wsol_token_account),
+            ],
+            payer,
+            base_in_count,
+        )
+        if swap_instructions is None:
+            logging.error("could not create atomic swap instructions")
+            return
+
+        instructions = make_transaction_fee_instructions(ATOMIC_UNIT_BUDGET)
+        instructions.extend(wsol_account_instructions)
+        instructions.extend(swap_instructions)
+        if wsol_account_pool is None:
+            instructions.append(close_account_instruction(wsol_token_account, payer_keypair))
+
+        if bundle:
+            tip_instruction = await create_tip_instruction(jito_client, payer_keypair, tip_amount, tip_account_cache)
+            if tip_instruction is None:
+                return
+            instructions.append(tip_instruction)
+
+        latest_blockhash = await solana_client.get_latest_blockhash()
+        if latest_blockhash is None:
+            logging.error("error. no latest blockhash")
+            return
+
+        lookup_tables = None
+        if lookup_table_manager is not None:
+            lookup_tables = lookup_table_manager.select_tables(instructions)
+
+        if compute_budget_planner is not None:
+            profile_key = (
+                ("atomic",)
+                + buy_liquidity_pool.get_compute_profile_key(base_in_count, base_mint)
+                + sell_liquidity_pool.get_compute_profile_key(0, quote_mint)
+            )
+            instructions = await compute_budget_planner.plan(
+                solana_client, payer_keypair, profile_key, instructions, latest_blockhash, lookup_tables
+            )
+
+        tracer.finish_span(build_span)
+
+        with tracer.span("sign"):
+            txn = compile_transaction(payer_keypair, instructions, latest_blockhash, lookup_tables)
+        with tracer.span("send", bundle=bundle):
+            if bundle:
+                bundle_id = await jito_client.send_bundle([base58.b58encode(bytes(txn)).decode("ascii")])
+                sent = bundle_id is not None
+                return bundle_id
+
+            txn_sig = await solana_client.send_transaction(txn, TxOpts(skip_preflight=True))
+            sent = txn_sig is not None
+            print(txn_sig)
+            return txn_sig
+    finally:
+        # Ends the build span when building gave up early.
+        tracer.finish_span(build_span)
+        if wsol_account_pool is not None:
+            wsol_account_pool.release(wsol_token_account, base_in_count if sent else 0)
@@ -0,0 +1,164 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Union
+
+from jito_async import JitoJsonRpcSDK, JitoError
+
+from .constants import JITO_BLOCK_ENGINE_URLS
+
+
+LATENCY_SMOOTHING = 0.2
+
+
+@dataclass
+class RegionStats:
+    latency: Optional[float] = None
+    accepted: int = 0
+    rejected: int = 0
+
+    def record(self, latency: float, accepted: bool):
+        """
+        Only acceptances update the latency; a fast rejection says nothing
+        about how quickly the region forwards bundles.
+        """
+        if not accepted:
+            self.rejected += 1
+            return
+        self.accepted += 1
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+    @property
+    def rank(self) -> float:
+        if self.latency is not None:
+            return self.latency
+        # Unmeasured regions go first so they get measured, regions that
+        # only ever rejected go last.
+        return -1.0 if self.rejected == 0 else float("inf")
+
+
+class BundleSubmitter:
+    """
+    One warm JitoJsonRpcSDK session per block engine region. A bundle goes
+    to every region, or to the fanout regions with the lowest acceptance
+    latency, concurrently; the first acceptance is returned and the
+    remaining requests finish in the background, recording their latency.
+
+    Exposes the JitoJsonRpcSDK methods the executors use, so it can be
+    passed wherever a jito_client is expected.
+    """
+
+    def __init__(
+        self,
+        urls: Optional[Dict[str, str]] = None,
+        fanout: Optional[int] = None,
+        uuid_var: Optional[str] = None,
+    ):
+        urls = urls if urls is not None else JITO_BLOCK_ENGINE_URLS
+        self.clients = {region: JitoJsonRpcSDK(url=url, uuid_var=uuid_var) for region, url in urls.items()}
+        self.stats = {region: RegionStats() for region in urls}
+        self.fanout = fanout
+        # Regions that accepted each bundle, in order of acceptance.
+        self.bundle_regions: Dict[str, List[str]] = {}
+        self.pending: Set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "BundleSubmitter":
+        await asyncio.gather(*[client.__aenter__() for client in self.clients.values()])
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if len(self.pending) > 0:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        await asyncio.gather(*[client.__aexit__(exc_type, exc_val, exc_tb) for client in self.clients.values()])
+
+    def get_regions(self, fanout: Optional[int] = None) -> List[str]:
+        """
+        Regions ordered by smoothed acceptance latency.
+        """
+        regions = sorted(self.clients, key=lambda region: self.stats[region].rank)
+        fanout = fanout if fanout is not None else self.fanout
+        return regions if fanout is None else regions[:fanout]
+
+    async def warm_up(self):
+        """
+        Opens the connections and seeds the latency of every region with a
+        getTipAccounts round trip.
+        """
+        async def ping(region: str):
+            started = time.perf_counter()
+            try:
+                await self.clients[region].get_tip_accounts()
+            except JitoError as e:
+                logging.warning(f"Block engine {region} is unreachable: {e}")
+                return
+            self.stats[region].record(time.perf_counter() - started, True)
+
+        await asyncio.gather(*[ping(region) for region in self.clients])
+
+    async def __send(self, region: str, params: Any) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            response = await self.clients[region].send_bundle(params)
+        except JitoError as e:
+            self.stats[region].record(time.perf_counter() - started, False)
+            logging.warning(f"Block engine {region} rejected bundle: {e}")
+            return None
+
+        latency = time.perf_counter() - started
+        bundle_id = response.get("data", {}).get("result")
+        if bundle_id is None:
+            self.stats[region].record(latency, False)
+            logging.warning(f"Block engine {region} rejected bundle: {response.get('data', {}).get('error')}")
+            return None
+
+        self.stats[region].record(latency, True)
+        regions = self.bundle_regions.setdefault(bundle_id, [])
+        if region not in regions:
+            regions.append(region)
+        return bundle_id
+
+    async def send_bundle(self, params: Any = None, fanout: Optional[int] = None) -> Optional[Dict]:
+        """
+        Returns the first acceptance in the shape of JitoJsonRpcSDK's
+        response, or None if every region rejected the bundle.
+        """
+        tasks = [asyncio.create_task(self.__send(region, params)) for region in self.get_regions(fanout)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                bundle_id = await next_done
+                if bundle_id is not None:
+                    return {"success": True, "data": {"jsonrpc": "2.0", "id": 1, "result": bundle_id}}
+            logging.error("Every block engine rejected the bundle")
+            return None
+        finally:
+            remaining = [task for task in tasks if not task.done()]
+            for task in remaining:
+                self.pending.add(task)
+                task.add_done_callback(self.pending.discard)
+
+    def __client_for(self, bundle_uuids: Union[str, List[str]]) -> JitoJsonRpcSDK:
+        # Routed by the first id; BundleTracker batches ids by region.
+        bundle_id = bundle_uuids if isinstance(bundle_uuids, str) else (bundle_uuids[0] if bundle_uuids else None)
+        regions = self.bundle_regions.get(bundle_id)
+        region = regions[0] if regions else self.get_regions()[0]
+        return self.clients[region]
+
+    async def get_tip_accounts(self) -> Dict:
+        return await self.clients[self.get_regions()[0]].get_tip_accounts()
+
+    async def get_random_tip_account(self) -> Optional[str]:
+        return await self.clients[self.get_regions()[0]].get_random_tip_account()
+
+    async def get_bundle_statuses(self, bundle_uuids: Union[str, List[str]]) -> Dict:
+        return await self.__client_for(bundle_uuids).get_bundle_statuses(bundle_uuids)
+
+    async def get_inflight_bundle_statuses(self, bundle_uuids: Union[str, List[str]]) -> Dict:
+        """
+        In-flight status is only known to the regions that received the
+        bundle, so the query goes to the first region that accepted it.
+        """
+        return await self.__client_for(bundle_uuids).get_inflight_bundle_statuses(bundle_uuids)
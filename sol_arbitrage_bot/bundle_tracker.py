@@ -0,0 +1,239 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from jito_async import JitoJsonRpcSDK, JitoError
+
+from .tracing import Span, tracer
+from .block_engines import BundleSubmitter
+
+
+# getInflightBundleStatuses and getBundleStatuses take at most 5 ids.
+MAX_BUNDLES_PER_STATUS_REQUEST = 5
+STATUS_REQUESTS_PER_SECOND = 4
+INITIAL_STATUS_INTERVAL = 0.5
+MAX_STATUS_INTERVAL = 4.0
+STATUS_BACKOFF = 1.5
+# A freshly sent bundle can be reported Invalid until it reaches the
+# block engine's in-flight set.
+INVALID_GRACE_CHECKS = 5
+# Block engines forget bundles after five minutes.
+BUNDLE_TRACKING_TIMEOUT = 300.0
+
+INFLIGHT = "inflight"
+LANDED = "landed"
+COMMITMENT_LEVELS = {"processed": 0, "confirmed": 1, "finalized": 2}
+
+
+@dataclass
+class BundleStatus:
+    bundle_id: str
+    # Finalized, Confirmed, Failed, Invalid, Landed or Expired.
+    status: str
+    slot: Optional[int] = None
+    transactions: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TrackedBundle:
+    bundle_id: str
+    future: asyncio.Future
+    submitted_at: float
+    next_check: float
+    interval: float = INITIAL_STATUS_INTERVAL
+    stage: str = INFLIGHT
+    # First block engine region that accepted the bundle, when known.
+    region: Optional[str] = None
+    invalid_checks: int = 0
+    slot: Optional[int] = None
+    callbacks: List[Callable[[BundleStatus], None]] = field(default_factory=list)
+    span: Optional[Span] = None
+
+    def back_off(self, now: float):
+        self.interval = min(self.interval * STATUS_BACKOFF, MAX_STATUS_INTERVAL)
+        self.next_check = now + self.interval
+
+
+class BundleTracker:
+    """
+    Tracks every outstanding bundle from one background task. Each tick
+    sends a single status request for up to five due bundles of the same
+    stage and accepting region: getInflightBundleStatuses until a bundle lands, then
+    getBundleStatuses until it reaches the target commitment. Bundles
+    still pending are checked less and less often, so a few requests per
+    second cover hundreds of bundles.
+    """
+
+    def __init__(
+        self,
+        jito_client: JitoJsonRpcSDK,
+        commitment: str = "confirmed",
+        requests_per_second: float = STATUS_REQUESTS_PER_SECOND,
+        timeout: float = BUNDLE_TRACKING_TIMEOUT,
+    ):
+        self.jito_client = jito_client
+        self.commitment_level = COMMITMENT_LEVELS[commitment]
+        self.request_interval = 1.0 / requests_per_second
+        self.timeout = timeout
+        self.bundles: Dict[str, TrackedBundle] = {}
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def track(
+        self,
+        bundle_id: str,
+        callback: Optional[Callable[[BundleStatus], None]] = None,
+    ) -> asyncio.Future:
+        """
+        Returns a future resolved with the bundle's final BundleStatus.
+        """
+        tracked = self.bundles.get(bundle_id)
+        if tracked is None:
+            now = time.monotonic()
+            tracked = TrackedBundle(
+                bundle_id=bundle_id,
+                future=asyncio.get_running_loop().create_future(),
+                submitted_at=now,
+                next_check=now + INITIAL_STATUS_INTERVAL,
+                region=self.__region_of(bundle_id),
+                span=tracer.start_span("landing", bundle_id=bundle_id),
+            )
+            self.bundles[bundle_id] = tracked
+            self.wake.set()
+        if callback is not None:
+            tracked.callbacks.append(callback)
+        return tracked.future
+
+    def __region_of(self, bundle_id: str) -> Optional[str]:
+        """
+        Only the regions that received a bundle know its in-flight status.
+        """
+        if not isinstance(self.jito_client, BundleSubmitter):
+            return None
+        regions = self.jito_client.bundle_regions.get(bundle_id)
+        return regions[0] if regions else None
+
+    def __resolve(self, tracked: TrackedBundle, status: BundleStatus):
+        self.bundles.pop(tracked.bundle_id, None)
+        tracer.finish_span(tracked.span, status=status.status, landed_slot=status.slot)
+        if not tracked.future.done():
+            tracked.future.set_result(status)
+        for callback in tracked.callbacks:
+            try:
+                callback(status)
+            except Exception as e:
+                logging.error(f"Bundle {tracked.bundle_id} callback failed: {e}")
+
+    def __due_batch(self, now: float) -> List[TrackedBundle]:
+        due = [tracked for tracked in self.bundles.values() if tracked.next_check <= now]
+        if len(due) == 0:
+            return []
+        due.sort(key=lambda tracked: tracked.next_check)
+        stage = due[0].stage
+        region = due[0].region
+        return [
+            tracked for tracked in due if tracked.stage == stage and tracked.region == region
+        ][:MAX_BUNDLES_PER_STATUS_REQUEST]
+
+    async def __fetch(self, batch: List[TrackedBundle]) -> Optional[Dict[str, dict]]:
+        bundle_ids = [tracked.bundle_id for tracked in batch]
+        try:
+            if batch[0].stage == INFLIGHT:
+                response = await self.jito_client.get_inflight_bundle_statuses(bundle_ids)
+            else:
+                response = await self.jito_client.get_bundle_statuses(bundle_ids)
+        except JitoError as e:
+            logging.warning(f"Bundle status request failed: {e}")
+            return None
+
+        if response is None or not response.get("success"):
+            return None
+        result = response["data"].get("result")
+        if result is None:
+            logging.warning(f"Bundle status error: {response['data'].get('error')}")
+            return None
+        return {status["bundle_id"]: status for status in result.get("value") or [] if status is not None}
+
+    def __apply_inflight(self, tracked: TrackedBundle, status: Optional[dict], now: float):
+        state = None if status is None else status.get("status")
+        if state == "Landed":
+            tracked.stage = LANDED
+            tracked.slot = status.get("landed_slot")
+            tracked.interval = INITIAL_STATUS_INTERVAL
+            tracked.next_check = now
+        elif state == "Failed":
+            self.__resolve(tracked, BundleStatus(tracked.bundle_id, "Failed"))
+        elif state == "Invalid" or state is None:
+            tracked.invalid_checks += 1
+            if tracked.invalid_checks > INVALID_GRACE_CHECKS:
+                self.__resolve(tracked, BundleStatus(tracked.bundle_id, "Invalid"))
+            else:
+                tracked.back_off(now)
+        else:
+            tracked.back_off(now)
+
+    def __apply_landed(self, tracked: TrackedBundle, status: Optional[dict], now: float):
+        if status is None:
+            tracked.back_off(now)
+            return
+
+        err = status.get("err")
+        transactions = status.get("transactions") or []
+        slot = status.get("slot", tracked.slot)
+        if err is not None and "Ok" not in err:
+            self.__resolve(tracked, BundleStatus(tracked.bundle_id, "Failed", slot, transactions))
+            return
+
+        confirmation_status = status.get("confirmation_status")
+        level = COMMITMENT_LEVELS.get(confirmation_status, -1)
+        if level >= self.commitment_level:
+            self.__resolve(tracked, BundleStatus(tracked.bundle_id, confirmation_status.capitalize(), slot, transactions))
+        else:
+            tracked.back_off(now)
+
+    async def poll(self) -> bool:
+        """
+        Sends one status request for the most overdue batch. False if
+        nothing was due.
+        """
+        now = time.monotonic()
+        for tracked in list(self.bundles.values()):
+            if now - tracked.submitted_at > self.timeout:
+                status = "Landed" if tracked.stage == LANDED else "Expired"
+                self.__resolve(tracked, BundleStatus(tracked.bundle_id, status, tracked.slot))
+
+        batch = self.__due_batch(now)
+        if len(batch) == 0:
+            return False
+
+        statuses = await self.__fetch(batch)
+        now = time.monotonic()
+        for tracked in batch:
+            if statuses is None:
+                tracked.back_off(now)
+            elif tracked.stage == INFLIGHT:
+                self.__apply_inflight(tracked, statuses.get(tracked.bundle_id), now)
+            else:
+                self.__apply_landed(tracked, statuses.get(tracked.bundle_id), now)
+        return True
+
+    async def run(self):
+        while True:
+            if len(self.bundles) == 0:
+                self.wake.clear()
+                await self.wake.wait()
+            await self.poll()
+            await asyncio.sleep(self.request_interval)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
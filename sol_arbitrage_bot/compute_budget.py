@@ -0,0 +1,278 @@
+import time
+import struct
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from solders.pubkey import Pubkey
+from solders.keypair import Keypair
+from solders.instruction import Instruction
+from solders.compute_budget import ID as COMPUTE_BUDGET_PROGRAM_ID, set_compute_unit_limit, set_compute_unit_price
+from solders.message import MessageV0
+from solders.transaction import VersionedTransaction
+from solders.address_lookup_table_account import AddressLookupTableAccount
+
+from .solana_client import SolanaClient
+from .constants import UNIT_BUDGET, UNIT_PRICE
+
+
+MAX_UNIT_BUDGET = 1_400_000
+SET_COMPUTE_UNIT_LIMIT = 2
+COMPUTE_UNIT_MARGIN = 1.1
+COMPUTE_PROFILE_SAMPLES = 16
+# getRecentPrioritizationFees accepts at most 128 accounts.
+MAX_FEE_ACCOUNTS = 128
+PRIORITY_FEE_PERCENTILE = 0.75
+PRIORITY_FEE_TTL = 2.0
+MIN_UNIT_PRICE = 1
+MAX_UNIT_PRICE = 5_000_000
+
+
+class ComputeProfileCache:
+    """
+    Compute units consumed by recent transactions of the same shape, e.g.
+    ("buy", "ClmmPool", True, 2) for a buy leg crossing two ticks. The
+    limit requested is the largest recent sample plus a margin.
+    """
+
+    def __init__(self, samples: int = COMPUTE_PROFILE_SAMPLES, margin: float = COMPUTE_UNIT_MARGIN):
+        self.samples = samples
+        self.margin = margin
+        self.profiles: Dict[tuple, Deque[int]] = {}
+
+    def record(self, profile_key: tuple, units_consumed: int):
+        profile = self.profiles.get(profile_key)
+        if profile is None:
+            profile = deque(maxlen=self.samples)
+            self.profiles[profile_key] = profile
+        profile.append(units_consumed)
+
+    def get_unit_limit(self, profile_key: tuple) -> Optional[int]:
+        profile = self.profiles.get(profile_key)
+        if not profile:
+            return None
+        return min(int(max(profile) * self.margin), MAX_UNIT_BUDGET)
+
+    def get_latest(self, profile_key: tuple) -> Optional[int]:
+        profile = self.profiles.get(profile_key)
+        if not profile:
+            return None
+        return profile[-1]
+
+
+class PriorityFeeEstimator:
+    """
+    Unit price from the recent prioritization fees paid for the writable
+    accounts a transaction locks, cached briefly per account set.
+    """
+
+    def __init__(
+        self,
+        percentile: float = PRIORITY_FEE_PERCENTILE,
+        ttl: float = PRIORITY_FEE_TTL,
+        min_unit_price: int = MIN_UNIT_PRICE,
+        max_unit_price: int = MAX_UNIT_PRICE,
+    ):
+        self.percentile = percentile
+        self.ttl = ttl
+        self.min_unit_price = min_unit_price
+        self.max_unit_price = max_unit_price
+        self.cache: Dict[frozenset, Tuple[float, int]] = {}
+
+    async def estimate(self, solana_client: SolanaClient, writable_accounts: List[Pubkey]) -> int:
+        accounts = frozenset(writable_accounts[:MAX_FEE_ACCOUNTS])
+        cached = self.cache.get(accounts)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < self.ttl:
+            return cached[1]
+
+        fees = await solana_client.get_recent_prioritization_fees(list(accounts))
+        if not fees:
+            logging.warning("No recent prioritization fees, using the default unit price")
+            return UNIT_PRICE
+
+        values = sorted(fee["prioritizationFee"] for fee in fees)
+        unit_price = values[min(int(len(values) * self.percentile), len(values) - 1)]
+        unit_price = min(max(unit_price, self.min_unit_price), self.max_unit_price)
+        self.cache[accounts] = (now, unit_price)
+        return unit_price
+
+
+def make_compute_budget_instructions(unit_limit: int = UNIT_BUDGET, unit_price: int = UNIT_PRICE) -> List[Instruction]:
+    return [
+        set_compute_unit_limit(unit_limit),
+        set_compute_unit_price(unit_price),
+    ]
+
+
+def get_writable_accounts(instructions: List[Instruction]) -> List[Pubkey]:
+    writable = {}
+    for instruction in instructions:
+        for account in instruction.accounts:
+            if account.is_writable and not account.is_signer:
+                writable[account.pubkey] = None
+    return list(writable)
+
+
+def get_requested_unit_limit(instructions: List[Instruction]) -> Optional[int]:
+    """
+    The limit set by the instructions' SetComputeUnitLimit, if any.
+    """
+    for instruction in instructions:
+        data = bytes(instruction.data)
+        if instruction.program_id == COMPUTE_BUDGET_PROGRAM_ID and len(data) == 5 and data[0] == SET_COMPUTE_UNIT_LIMIT:
+            return struct.unpack_from('<I', data, 1)[0]
+    return None
+
+
+def strip_compute_budget_instructions(instructions: List[Instruction]) -> List[Instruction]:
+    return [
+        instruction for instruction in instructions
+        if instruction.program_id != COMPUTE_BUDGET_PROGRAM_ID
+    ]
+
+
+async def simulate_compute_units(
+    solana_client: SolanaClient,
+    payer_keypair: Keypair,
+    instructions: List[Instruction],
+    latest_blockhash,
+    address_lookup_tables: Optional[List[AddressLookupTableAccount]] = None,
+) -> Optional[int]:
+    """
+    Compute units the instructions consume, simulated with the maximum
+    limit. None if the simulation fails.
+    """
+    simulated_instructions = make_compute_budget_instructions(MAX_UNIT_BUDGET) + strip_compute_budget_instructions(
+        instructions
+    )
+    compiled_message = MessageV0.try_compile(
+        payer_keypair.pubkey(),
+        simulated_instructions,
+        address_lookup_tables or [],
+        latest_blockhash.blockhash,
+    )
+    txn = VersionedTransaction(compiled_message, [payer_keypair])
+    result = await solana_client.simulate_transaction(txn)
+    if result is None:
+        return None
+    if result.err is not None:
+        logging.info(f"Simulation failed: {result.err}")
+        return None
+    return result.units_consumed
+
+
+class ComputeBudgetPlanner:
+    """
+    Replaces the static UNIT_BUDGET / UNIT_PRICE instructions with a limit
+    from the compute profile (simulating on a miss) and a unit price from
+    recent fees on the transaction's writable accounts.
+    """
+
+    def __init__(
+        self,
+        profile_cache: Optional[ComputeProfileCache] = None,
+        fee_estimator: Optional[PriorityFeeEstimator] = None,
+    ):
+        self.profile_cache = profile_cache or ComputeProfileCache()
+        self.fee_estimator = fee_estimator or PriorityFeeEstimator()
+
+    async def get_unit_limit(
+        self,
+        solana_client: SolanaClient,
+        payer_keypair: Keypair,
+        profile_key: tuple,
+        instructions: List[Instruction],
+        latest_blockhash,
+        address_lookup_tables: Optional[List[AddressLookupTableAccount]] = None,
+        fallback_unit_limit: int = UNIT_BUDGET,
+        simulate: bool = True,
+    ) -> int:
+        """
+        The profiled limit, else a simulated one, else fallback_unit_limit.
+        """
+        unit_limit = self.profile_cache.get_unit_limit(profile_key)
+        if unit_limit is not None or not simulate:
+            return unit_limit or fallback_unit_limit
+
+        units_consumed = await simulate_compute_units(
+            solana_client, payer_keypair, instructions, latest_blockhash, address_lookup_tables
+        )
+        if units_consumed is None:
+            return fallback_unit_limit
+        self.profile_cache.record(profile_key, units_consumed)
+        return self.profile_cache.get_unit_limit(profile_key)
+
+    async def plan(
+        self,
+        solana_client: SolanaClient,
+        payer_keypair: Keypair,
+        profile_key: tuple,
+        instructions: List[Instruction],
+        latest_blockhash,
+        address_lookup_tables: Optional[List[AddressLookupTableAccount]] = None,
+        simulate: bool = True,
+    ) -> List[Instruction]:
+        """
+        Returns instructions with their compute budget instructions replaced.
+        Without a profile, and when simulate is off or the simulation
+        fails, the limit the instructions asked for is kept. Transactions
+        that cannot succeed on their own go through plan_after instead.
+        """
+        body = strip_compute_budget_instructions(instructions)
+        unit_limit = await self.get_unit_limit(
+            solana_client,
+            payer_keypair,
+            profile_key,
+            body,
+            latest_blockhash,
+            address_lookup_tables,
+            get_requested_unit_limit(instructions) or UNIT_BUDGET,
+            simulate,
+        )
+        unit_price = await self.fee_estimator.estimate(solana_client, get_writable_accounts(body))
+        return make_compute_budget_instructions(unit_limit, unit_price) + body
+
+    async def plan_after(
+        self,
+        solana_client: SolanaClient,
+        payer_keypair: Keypair,
+        profile_key: tuple,
+        instructions: List[Instruction],
+        prior_profile_key: tuple,
+        prior_instructions: List[Instruction],
+        latest_blockhash,
+        address_lookup_tables: Optional[List[AddressLookupTableAccount]] = None,
+        prior_address_lookup_tables: Optional[List[AddressLookupTableAccount]] = None,
+    ) -> List[Instruction]:
+        """
+        plan() for a transaction that only succeeds after prior_instructions,
+        such as a sell leg spending what its buy leg delivers. On a profile
+        miss both are simulated as one transaction and the prior profile's
+        latest sample is taken off the units consumed.
+        """
+        body = strip_compute_budget_instructions(instructions)
+        prior_units = self.profile_cache.get_latest(prior_profile_key)
+        if self.profile_cache.get_unit_limit(profile_key) is None and prior_units is not None:
+            tables = {}
+            for table in (prior_address_lookup_tables or []) + (address_lookup_tables or []):
+                tables[table.key] = table
+            units_consumed = await simulate_compute_units(
+                solana_client,
+                payer_keypair,
+                strip_compute_budget_instructions(prior_instructions) + body,
+                latest_blockhash,
+                list(tables.values()),
+            )
+            if units_consumed is not None and units_consumed > prior_units:
+                self.profile_cache.record(profile_key, units_consumed - prior_units)
+
+        return await self.plan(
+            solana_client,
+            payer_keypair,
+            profile_key,
+            instructions,
+            latest_blockhash,
+            address_lookup_tables,
+            simulate=False,
+        )
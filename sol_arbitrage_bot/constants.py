@@ -6,7 +6,21 @@ SOL_MINT = Pubkey.from_string("So11111111111111111111111111111111111111112")
 SOL_RPC_URL = "https://api.mainnet-beta.solana.com"
 
 TOKEN_PROGRAM_ID = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+TOKEN_2022_PROGRAM_ID = Pubkey.from_string("TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb")
 ACCOUNT_LAYOUT_LEN = 165
+TOKEN_ACCOUNT_MINT_OFFSET = 0
+TOKEN_ACCOUNT_AMOUNT_OFFSET = 64
+
+ARBITRAGE_PROGRAM_ID = Pubkey.from_string("Fn52o2N4NS77kvXVyTeuDTSXRL1x9uCx6712sNonB62x")
 
 UNIT_BUDGET = 150_000
 UNIT_PRICE = 1_000_000
+LAMPORTS_PER_SIGNATURE = 5_000
+
+JITO_BLOCK_ENGINE_URLS = {
+    "amsterdam": "https://amsterdam.mainnet.block-engine.jito.wtf",
+    "frankfurt": "https://frankfurt.mainnet.block-engine.jito.wtf",
+    "ny": "https://ny.mainnet.block-engine.jito.wtf",
+    "tokyo": "https://tokyo.mainnet.block-engine.jito.wtf",
+    "slc": "https://slc.mainnet.block-engine.jito.wtf",
+}
@@ -0,0 +1,225 @@
+import math
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from solders.pubkey import Pubkey
+
+from .solana_client import SolanaClient
+from .constants import SOL_MINT
+from .pool_base import LiquidityPool
+from .graph import MIN_CYCLE_LENGTH, Cycle, TokenGraph
+from .tracing import traced
+
+
+# Two hops cover every pair of pools sharing a token, three add triangles.
+MAX_ROUTE_LENGTH = 3
+# A route is pushed again only if its weight moved by more than this.
+WEIGHT_EPSILON = 1e-6
+POLL_INTERVAL = 0.4
+
+
+class IncrementalEvaluator:
+    """
+    Keeps every candidate route (a cycle of pools from start_mint back to
+    itself) scored and re-scores only the routes touched by an account
+    update.
+
+    Two indexes drive it: account -> pools whose state depends on the
+    account (vaults, pool state, tick arrays) and pool -> routes through
+    the pool. An update is applied to its pools, their two graph edges are
+    recomputed, and the routes through them are summed again from the edge
+    weights. Routes whose weight changed and that are still profitable are
+    pushed to the queue.
+    """
+
+    def __init__(
+        self,
+        start_mint: Pubkey = SOL_MINT,
+        max_route_length: int = MAX_ROUTE_LENGTH,
+        min_profit: float = 0.0,
+        queue: Optional[asyncio.Queue] = None,
+    ):
+        self.start_mint = start_mint
+        self.max_route_length = max_route_length
+        # A route qualifies once its rate exceeds 1 + min_profit.
+        self.max_weight = -math.log1p(min_profit)
+        self.queue = queue if queue is not None else asyncio.Queue()
+
+        self.graph = TokenGraph()
+        self.pools: Dict[Pubkey, LiquidityPool] = {}
+        self.account_pools: Dict[Pubkey, List[LiquidityPool]] = {}
+        self.pool_accounts: Dict[Pubkey, List[Pubkey]] = {}
+        self.pool_routes: Dict[Pubkey, Set[Tuple[int, ...]]] = {}
+        self.route_weights: Dict[Tuple[int, ...], float] = {}
+        self.account_data: Dict[Pubkey, bytes] = {}
+
+    def __unindex_pool_accounts(self, liquidity_pool: LiquidityPool):
+        for address in self.pool_accounts.pop(liquidity_pool.pair_address, []):
+            dependents = self.account_pools.get(address, [])
+            if liquidity_pool in dependents:
+                dependents.remove(liquidity_pool)
+            if len(dependents) == 0:
+                self.account_pools.pop(address, None)
+                self.account_data.pop(address, None)
+
+    def __index_pool_accounts(self, liquidity_pool: LiquidityPool):
+        self.__unindex_pool_accounts(liquidity_pool)
+        pair_address = liquidity_pool.pair_address
+        accounts = list(liquidity_pool.get_state_accounts())
+        self.pool_accounts[pair_address] = accounts
+        for address in accounts:
+            self.account_pools.setdefault(address, []).append(liquidity_pool)
+
+    def add_pools(self, liquidity_pools: Iterable[LiquidityPool]):
+        for liquidity_pool in liquidity_pools:
+            self.pools[liquidity_pool.pair_address] = liquidity_pool
+            self.graph.add_pool(liquidity_pool)
+            self.__index_pool_accounts(liquidity_pool)
+        self.rebuild_routes()
+
+    def remove_pool(self, pair_address: Pubkey):
+        liquidity_pool = self.pools.pop(pair_address, None)
+        if liquidity_pool is None:
+            return
+        self.__unindex_pool_accounts(liquidity_pool)
+        for route in self.pool_routes.pop(pair_address, set()):
+            self.__drop_route(route)
+        self.graph.remove_pool(pair_address)
+
+    def __drop_route(self, route: Tuple[int, ...]):
+        self.route_weights.pop(route, None)
+        for edge in route:
+            liquidity_pool = self.graph.edge_pools[edge]
+            if liquidity_pool is not None:
+                self.pool_routes.get(liquidity_pool.pair_address, set()).discard(route)
+
+    def rebuild_routes(self):
+        """
+        Enumerates the simple cycles through start_mint of 2 to
+        max_route_length hops. Depends only on which pools exist, not on
+        their prices, so it runs when pools are added, not per update.
+        """
+        self.pool_routes = {pair_address: set() for pair_address in self.pools}
+        self.route_weights = {}
+
+        start = self.graph.node_index.get(self.start_mint)
+        if start is None:
+            return
+
+        graph = self.graph
+        stack = [(start, [], {start})]
+        while len(stack) > 0:
+            node, path, visited = stack.pop()
+            for edge in graph.out_edges[node]:
+                if graph.edge_pools[edge] is None:
+                    continue
+                dst = graph.edge_dst[edge]
+                if dst == start:
+                    if len(path) + 1 >= MIN_CYCLE_LENGTH:
+                        self.__add_route(tuple(path) + (edge,))
+                    continue
+                if dst in visited or len(path) + 1 >= self.max_route_length:
+                    continue
+                stack.append((dst, path + [edge], visited | {dst}))
+
+    def __add_route(self, route: Tuple[int, ...]):
+        pair_addresses = [self.graph.edge_pools[edge].pair_address for edge in route]
+        if len(set(pair_addresses)) != len(pair_addresses):
+            # Swapping back through the pool that was just used.
+            return
+        self.route_weights[route] = self.__route_weight(route)
+        for pair_address in pair_addresses:
+            self.pool_routes[pair_address].add(route)
+
+    def __route_weight(self, route: Tuple[int, ...]) -> float:
+        edge_weight = self.graph.edge_weight
+        return sum(edge_weight[edge] for edge in route)
+
+    def __to_cycle(self, route: Tuple[int, ...], weight: float) -> Cycle:
+        graph = self.graph
+        mints = [graph.node_mints[graph.edge_src[edge]] for edge in route] + [self.start_mint]
+        pools = [graph.edge_pools[edge] for edge in route]
+        return Cycle(mints, pools, weight)
+
+    def apply_account_update(self, address: Pubkey, data: bytes) -> List[Cycle]:
+        """
+        Applies one account update and returns the opportunities it
+        changed, which are also pushed to the queue.
+        """
+        liquidity_pools = self.account_pools.get(address)
+        if liquidity_pools is None:
+            return []
+        if self.account_data.get(address) == data:
+            return []
+        self.account_data[address] = data
+
+        dirty_routes: Set[Tuple[int, ...]] = set()
+        for liquidity_pool in list(liquidity_pools):
+            if not liquidity_pool.update_state(address, data):
+                continue
+            self.graph.update_pool(liquidity_pool)
+            # A CLMM pool moving across tick arrays changes its accounts.
+            if liquidity_pool.get_state_accounts() != self.pool_accounts[liquidity_pool.pair_address]:
+                self.__index_pool_accounts(liquidity_pool)
+            dirty_routes.update(self.pool_routes.get(liquidity_pool.pair_address, ()))
+
+        opportunities = []
+        for route in dirty_routes:
+            weight = self.__route_weight(route)
+            previous = self.route_weights.get(route, math.inf)
+            self.route_weights[route] = weight
+            if weight >= self.max_weight:
+                continue
+            if previous != math.inf and abs(weight - previous) <= WEIGHT_EPSILON:
+                continue
+            opportunity = self.__to_cycle(route, weight)
+            opportunities.append(opportunity)
+            self.queue.put_nowait(opportunity)
+        return opportunities
+
+    def get_opportunities(self, max_opportunities: int = 16) -> List[Cycle]:
+        """
+        Currently profitable routes, best first.
+        """
+        profitable = [
+            (weight, route) for route, weight in self.route_weights.items()
+            if weight < self.max_weight
+        ]
+        profitable.sort(key=lambda r: r[0])
+        return [self.__to_cycle(route, weight) for weight, route in profitable[:max_opportunities]]
+
+    @traced("snapshot")
+    async def poll(self, solana_client: SolanaClient) -> bool:
+        """
+        Fetches every tracked account in batched getMultipleAccounts calls
+        and feeds only the accounts whose data changed into the evaluator.
+        """
+        addresses = list(self.account_pools.keys())
+        if len(addresses) == 0:
+            return False
+
+        accounts = await solana_client.get_multiple_accounts(addresses)
+        if accounts is None:
+            logging.error("could not fetch evaluator accounts")
+            return False
+
+        for address, account in zip(addresses, accounts):
+            if account is not None:
+                self.apply_account_update(address, account.data)
+        return True
+
+    async def run(
+        self,
+        solana_client: SolanaClient,
+        interval: float = POLL_INTERVAL,
+    ) -> AsyncIterator[Cycle]:
+        """
+        Polls the tracked accounts and yields opportunities as updates
+        change them.
+        """
+        while True:
+            await self.poll(solana_client)
+            while not self.queue.empty():
+                yield self.queue.get_nowait()
+            await asyncio.sleep(interval)
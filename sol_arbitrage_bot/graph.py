@@ -0,0 +1,210 @@
+import math
+import logging
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from solders.pubkey import Pubkey
+
+from .constants import SOL_MINT
+from .pool_base import LiquidityPool
+
+
+MIN_CYCLE_LENGTH = 2
+MAX_CYCLE_LENGTH = 4
+
+
+@dataclass
+class Cycle:
+    mints: List[Pubkey]
+    pools: List[LiquidityPool]
+    weight: float
+
+    @property
+    def rate(self) -> float:
+        """
+        Fee-adjusted amount of the start mint received per unit put in.
+        """
+        return math.exp(-self.weight)
+
+
+class TokenGraph:
+    """
+    Mints are nodes and every loaded pool contributes two directed edges,
+    one per swap direction, weighted by -log(fee-adjusted rate).
+
+    Edges live in flat arrays indexed by edge id, and each node keeps
+    arrays of the ids of its outgoing and incoming edges, so updating a
+    pool rewrites two floats in place and the search only walks
+    contiguous arrays.
+    """
+
+    def __init__(self):
+        self.node_index: Dict[Pubkey, int] = {}
+        self.node_mints: List[Pubkey] = []
+        self.out_edges: List[array] = []
+        self.in_edges: List[array] = []
+
+        self.edge_src = array('l')
+        self.edge_dst = array('l')
+        self.edge_weight = array('d')
+        self.edge_pools: List[Optional[LiquidityPool]] = []
+        self.pool_edges: Dict[Pubkey, Tuple[int, int]] = {}
+
+    def __node(self, mint: Pubkey) -> int:
+        index = self.node_index.get(mint)
+        if index is None:
+            index = len(self.node_mints)
+            self.node_index[mint] = index
+            self.node_mints.append(mint)
+            self.out_edges.append(array('l'))
+            self.in_edges.append(array('l'))
+        return index
+
+    def __add_edge(self, src: int, dst: int, liquidity_pool: LiquidityPool) -> int:
+        edge = len(self.edge_pools)
+        self.edge_src.append(src)
+        self.edge_dst.append(dst)
+        self.edge_weight.append(math.inf)
+        self.edge_pools.append(liquidity_pool)
+        self.out_edges[src].append(edge)
+        self.in_edges[dst].append(edge)
+        return edge
+
+    def add_pool(self, liquidity_pool: LiquidityPool) -> bool:
+        if liquidity_pool.pair_address in self.pool_edges:
+            return self.update_pool(liquidity_pool)
+
+        mint_a, mint_b = liquidity_pool.get_mints()
+        node_a = self.__node(mint_a)
+        node_b = self.__node(mint_b)
+        self.pool_edges[liquidity_pool.pair_address] = (
+            self.__add_edge(node_a, node_b, liquidity_pool),
+            self.__add_edge(node_b, node_a, liquidity_pool),
+        )
+        return self.update_pool(liquidity_pool)
+
+    def remove_pool(self, pair_address: Pubkey):
+        """
+        Disables the pool's edges. Their slots stay in the arrays so edge
+        ids of other pools remain valid.
+        """
+        edges = self.pool_edges.pop(pair_address, None)
+        if edges is None:
+            return
+        for edge in edges:
+            self.edge_weight[edge] = math.inf
+            self.edge_pools[edge] = None
+
+    def update_pool(self, liquidity_pool: LiquidityPool) -> bool:
+        """
+        Recomputes both edge weights of a pool from its cached state.
+        """
+        edges = self.pool_edges.get(liquidity_pool.pair_address)
+        if edges is None:
+            return False
+
+        edge_a_to_b, edge_b_to_a = edges
+        mint_a, _ = liquidity_pool.get_mints()
+        # get_cached_price(mint_a) is the price of mint_b in units of mint_a.
+        price = liquidity_pool.get_cached_price(mint_a)
+        if price is None or price <= 0:
+            self.edge_weight[edge_a_to_b] = math.inf
+            self.edge_weight[edge_b_to_a] = math.inf
+            return False
+
+        fee_log = -math.log1p(-liquidity_pool.get_fee_rate())
+        self.edge_weight[edge_a_to_b] = math.log(price) + fee_log
+        self.edge_weight[edge_b_to_a] = -math.log(price) + fee_log
+        return True
+
+    def find_cycles(
+        self,
+        start_mint: Pubkey = SOL_MINT,
+        min_length: int = MIN_CYCLE_LENGTH,
+        max_length: int = MAX_CYCLE_LENGTH,
+        max_cycles: int = 16,
+    ) -> List[Cycle]:
+        """
+        Bounded Bellman-Ford from start_mint: layer k holds the lightest
+        k-hop walk to every node that does not pass through start_mint.
+        A cycle closes whenever a layer k - 1 walk plus an edge back into
+        start_mint has negative weight. Walks that revisit a mint are
+        dropped.
+        """
+        start = self.node_index.get(start_mint)
+        if start is None:
+            return []
+
+        num_nodes = len(self.node_mints)
+        out_edges = self.out_edges
+        edge_src = self.edge_src
+        edge_dst = self.edge_dst
+        edge_weight = self.edge_weight
+
+        distances = [[math.inf] * num_nodes]
+        predecessors = [[-1] * num_nodes]
+        distances[0][start] = 0.0
+        frontier = [start]
+
+        cycles: Dict[Tuple[int, ...], float] = {}
+        for length in range(1, max_length + 1):
+            previous = distances[-1]
+            current = [math.inf] * num_nodes
+            current_predecessors = [-1] * num_nodes
+            next_frontier = []
+            # The last layer only needs edges back into start_mint.
+            if length < max_length:
+                for src in frontier:
+                    base = previous[src]
+                    for edge in out_edges[src]:
+                        dst = edge_dst[edge]
+                        if dst == start:
+                            continue
+                        weight = base + edge_weight[edge]
+                        if weight < current[dst]:
+                            if current[dst] == math.inf:
+                                next_frontier.append(dst)
+                            current[dst] = weight
+                            current_predecessors[dst] = edge
+            distances.append(current)
+            predecessors.append(current_predecessors)
+            frontier = next_frontier
+
+            if length < min_length:
+                continue
+            for edge in self.in_edges[start]:
+                src = edge_src[edge]
+                weight = previous[src] + edge_weight[edge]
+                if weight >= 0:
+                    continue
+                path = self.__reconstruct(predecessors, length - 1, src)
+                if path is None:
+                    continue
+                path.append(edge)
+                nodes = [edge_src[e] for e in path]
+                if len(set(nodes)) != len(nodes):
+                    # A cheaper sub-cycle is already reported on its own.
+                    continue
+                key = tuple(path)
+                if key not in cycles:
+                    cycles[key] = weight
+
+        result = []
+        for path, weight in sorted(cycles.items(), key=lambda c: c[1])[:max_cycles]:
+            mints = [self.node_mints[edge_src[edge]] for edge in path] + [start_mint]
+            pools = [self.edge_pools[edge] for edge in path]
+            result.append(Cycle(mints, pools, weight))
+        return result
+
+    def __reconstruct(self, predecessors: List[List[int]], length: int, node: int) -> Optional[List[int]]:
+        path = []
+        for layer in range(length, 0, -1):
+            edge = predecessors[layer][node]
+            if edge < 0:
+                logging.error(f"broken predecessor chain at layer {layer}")
+                return None
+            path.append(edge)
+            node = self.edge_src[edge]
+        path.reverse()
+        return path
@@ -1,14 +1,23 @@
+import asyncio
 import logging
-from typing import Optional
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Deque, List, Optional
 
 from solders.pubkey import Pubkey
 
-from sol_arbitrage_bot.solana_client import SolanaClient
+from sol_arbitrage_bot.solana_client import SolanaClient, MAX_MULTIPLE_ACCOUNTS
 from sol_arbitrage_bot.raydium import raydium_liquidity_pool
+from sol_arbitrage_bot.raydium.raydium_fetcher import RaydiumFetcher
+from sol_arbitrage_bot.tracing import traced
 
 from .pool_base import LiquidityPool
 
 
+# Batches loaded concurrently while discovery keeps producing ids.
+MAX_PENDING_POOL_BATCHES = 2
+
+
+@traced("pool_load")
 async def fetch_liquidity_pool(solana_client: SolanaClient, pair_address: Pubkey) -> Optional[LiquidityPool]:
     """
     Fetches and decodes the pool keys from the Raydium pair address.
@@ -24,3 +33,84 @@ async def fetch_liquidity_pool(solana_client: SolanaClient, pair_address: Pubkey
         logging.error(f"Unknown pool type {pool_data.owner}")
         return None
     return pool
+
+
+@traced("pool_load")
+async def fetch_liquidity_pools(solana_client: SolanaClient, pair_addresses: List[Pubkey]) -> List[LiquidityPool]:
+    """
+    Fetches the pool accounts of many pairs in one batched call and
+    decodes them concurrently. Pools that fail to load are left out.
+    """
+    accounts = await solana_client.get_multiple_accounts(pair_addresses)
+    if accounts is None:
+        logging.error(f"Failed to fetch {len(pair_addresses)} pool accounts")
+        return []
+
+    async def decode(pair_address: Pubkey, pool_data) -> Optional[LiquidityPool]:
+        if pool_data is None:
+            logging.error(f"Failed to fetch AMM data for {pair_address}")
+            return None
+        if not raydium_liquidity_pool.is_raydium_pool(pool_data):
+            logging.error(f"Unknown pool type {pool_data.owner}")
+            return None
+        return await raydium_liquidity_pool.fetch_liquidity_pool(solana_client, pair_address, pool_data)
+
+    pools = await asyncio.gather(*[
+        decode(pair_address, pool_data) for pair_address, pool_data in zip(pair_addresses, accounts)
+    ])
+    return [pool for pool in pools if pool is not None]
+
+
+async def stream_liquidity_pools(
+    solana_client: SolanaClient,
+    pair_addresses: AsyncIterable[Pubkey],
+    batch_size: int = MAX_MULTIPLE_ACCOUNTS,
+    max_pending_batches: int = MAX_PENDING_POOL_BATCHES,
+) -> AsyncIterator[LiquidityPool]:
+    """
+    Loads pools as their addresses arrive: every full batch starts
+    loading at once while the source keeps producing, and loaded pools
+    are yielded in batch order.
+    """
+    pending: Deque[asyncio.Task] = deque()
+    batch: List[Pubkey] = []
+    try:
+        async for pair_address in pair_addresses:
+            batch.append(pair_address)
+            if len(batch) < batch_size:
+                continue
+            pending.append(asyncio.create_task(fetch_liquidity_pools(solana_client, batch)))
+            batch = []
+            while len(pending) > 0 and (pending[0].done() or len(pending) > max_pending_batches):
+                for pool in await pending.popleft():
+                    yield pool
+
+        if len(batch) > 0:
+            pending.append(asyncio.create_task(fetch_liquidity_pools(solana_client, batch)))
+        while len(pending) > 0:
+            for pool in await pending.popleft():
+                yield pool
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def __pair_addresses(pool_infos: AsyncIterable[dict]) -> AsyncIterator[Pubkey]:
+    async for pool_info in pool_infos:
+        yield Pubkey.from_string(pool_info["id"])
+
+
+def stream_mint_liquidity_pools(
+    solana_client: SolanaClient,
+    raydium_fetcher: RaydiumFetcher,
+    token_mint: str,
+    min_liquidity: float = 0.0,
+    batch_size: int = MAX_MULTIPLE_ACCOUNTS,
+) -> AsyncIterator[LiquidityPool]:
+    """
+    Every SOL pool of the mint above min_liquidity, discovered page by
+    page and loaded in batches while later pages are still coming in.
+    """
+    pool_infos = raydium_fetcher.stream_pools_for_mint(token_mint, min_liquidity=min_liquidity)
+    return stream_liquidity_pools(solana_client, __pair_addresses(pool_infos), batch_size)
@@ -0,0 +1,203 @@
+import struct
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from solders.pubkey import Pubkey
+from solders.instruction import AccountMeta, Instruction
+from solders.system_program import ID as SYSTEM_PROGRAM_ID
+from solders.address_lookup_table_account import (
+    ADDRESS_LOOKUP_TABLE_ID,
+    LOOKUP_TABLE_MAX_ADDRESSES,
+    AddressLookupTable,
+    AddressLookupTableAccount,
+    derive_lookup_table_address,
+)
+
+from .solana_client import SolanaClient
+from .pool_base import LiquidityPool
+
+
+CREATE_LOOKUP_TABLE = 0
+EXTEND_LOOKUP_TABLE = 2
+# Keeps an extend transaction well under the packet size limit.
+MAX_EXTEND_ADDRESSES = 20
+# A table costs its 32 byte key plus two length bytes in the message and
+# saves 31 bytes per key it replaces, so one key alone is not worth it.
+MIN_TABLE_HITS = 2
+
+
+def make_create_lookup_table_instruction(authority: Pubkey, payer: Pubkey, recent_slot: int) -> Instruction:
+    lookup_table, bump = derive_lookup_table_address(authority, recent_slot)
+    keys = [
+        AccountMeta(pubkey=lookup_table, is_signer=False, is_writable=True),
+        AccountMeta(pubkey=authority, is_signer=True, is_writable=False),
+        AccountMeta(pubkey=payer, is_signer=True, is_writable=True),
+        AccountMeta(pubkey=SYSTEM_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+    data = struct.pack('<IQB', CREATE_LOOKUP_TABLE, recent_slot, bump)
+    return Instruction(ADDRESS_LOOKUP_TABLE_ID, data, keys)
+
+
+def make_extend_lookup_table_instruction(
+    lookup_table: Pubkey,
+    authority: Pubkey,
+    payer: Pubkey,
+    addresses: List[Pubkey],
+) -> Instruction:
+    keys = [
+        AccountMeta(pubkey=lookup_table, is_signer=False, is_writable=True),
+        AccountMeta(pubkey=authority, is_signer=True, is_writable=False),
+        AccountMeta(pubkey=payer, is_signer=True, is_writable=True),
+        AccountMeta(pubkey=SYSTEM_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+    data = struct.pack('<IQ', EXTEND_LOOKUP_TABLE, len(addresses)) + b"".join(bytes(a) for a in addresses)
+    return Instruction(ADDRESS_LOOKUP_TABLE_ID, data, keys)
+
+
+class LookupTableManager:
+    """
+    Keeps the static accounts of every traded pool in address lookup tables
+    owned by the wallet, mirrors their contents locally and picks the
+    tables worth attaching to each message.
+
+    Addresses added by an extend become usable one slot after it lands, so
+    they are only indexed once load() has read them back from chain.
+    """
+
+    def __init__(self, authority: Pubkey):
+        self.authority = authority
+        self.tables: Dict[Pubkey, AddressLookupTableAccount] = {}
+        self.address_tables: Dict[Pubkey, Set[Pubkey]] = {}
+        # Slots taken by extends that were sent but not read back yet.
+        self.pending: Dict[Pubkey, int] = {}
+
+    async def load(self, solana_client: SolanaClient, table_addresses: Iterable[Pubkey]) -> bool:
+        table_addresses = list(table_addresses)
+        accounts = await solana_client.get_multiple_accounts(table_addresses)
+        if accounts is None:
+            logging.error("Could not fetch address lookup tables")
+            return False
+
+        for table_address, account in zip(table_addresses, accounts):
+            if account is None:
+                logging.warning(f"Address lookup table {table_address} does not exist")
+                self.remove_table(table_address)
+                self.pending.pop(table_address, None)
+                continue
+            self.update_table(table_address, account.data)
+        return True
+
+    def update_table(self, table_address: Pubkey, data: bytes) -> bool:
+        try:
+            table = AddressLookupTable.deserialize(data)
+        except Exception as e:
+            logging.error(f"Error parsing address lookup table {table_address}: {e}")
+            return False
+
+        self.remove_table(table_address)
+        self.pending.pop(table_address, None)
+        self.tables[table_address] = AddressLookupTableAccount(table_address, list(table.addresses))
+        for address in table.addresses:
+            self.address_tables.setdefault(address, set()).add(table_address)
+        return True
+
+    def remove_table(self, table_address: Pubkey):
+        table = self.tables.pop(table_address, None)
+        if table is None:
+            return
+        for address in table.addresses:
+            self.address_tables.get(address, set()).discard(table_address)
+            if len(self.address_tables.get(address, ())) == 0:
+                self.address_tables.pop(address, None)
+
+    def release(self, table_address: Pubkey, count: int):
+        """
+        Frees slots reserved for an extend that did not land.
+        """
+        pending = self.pending.get(table_address, 0) - count
+        if pending > 0:
+            self.pending[table_address] = pending
+        else:
+            self.pending.pop(table_address, None)
+
+    def get_missing_addresses(self, liquidity_pools: Iterable[LiquidityPool]) -> List[Pubkey]:
+        missing = {}
+        for liquidity_pool in liquidity_pools:
+            for address in liquidity_pool.get_lookup_table_accounts():
+                if address not in self.address_tables:
+                    missing[address] = None
+        return list(missing)
+
+    def __table_size(self, table_address: Pubkey) -> int:
+        table = self.tables.get(table_address)
+        size = 0 if table is None else len(table.addresses)
+        return size + self.pending.get(table_address, 0)
+
+    def __table_with_room(self) -> Optional[Pubkey]:
+        for table_address in list(self.tables) + list(self.pending):
+            if self.__table_size(table_address) < LOOKUP_TABLE_MAX_ADDRESSES:
+                return table_address
+        return None
+
+    def plan_extensions(
+        self,
+        payer: Pubkey,
+        addresses: List[Pubkey],
+        recent_slot: int,
+        allow_create: bool = False,
+    ) -> List[Tuple[Pubkey, bool, int, List[Instruction]]]:
+        """
+        Splits addresses into (table, creates, count, instructions) transactions
+        that extend tables with room and, with allow_create, create at most
+        one new table together with its first extend. Later transactions
+        to a new table must wait for the creating one to land. The slots
+        are reserved locally; load() the returned tables once the
+        transactions land to index the addresses, or release() the count
+        of a transaction that failed.
+        """
+        transactions = []
+        created = False
+        while len(addresses) > 0:
+            instructions = []
+            creates = False
+            table_address = self.__table_with_room()
+            if table_address is None:
+                if created or not allow_create:
+                    break
+                table_address, _ = derive_lookup_table_address(self.authority, recent_slot)
+                instructions.append(make_create_lookup_table_instruction(self.authority, payer, recent_slot))
+                created = creates = True
+
+            room = min(MAX_EXTEND_ADDRESSES, LOOKUP_TABLE_MAX_ADDRESSES - self.__table_size(table_address))
+            chunk, addresses = addresses[:room], addresses[room:]
+            instructions.append(make_extend_lookup_table_instruction(table_address, self.authority, payer, chunk))
+            self.pending[table_address] = self.pending.get(table_address, 0) + len(chunk)
+            transactions.append((table_address, creates, len(chunk), instructions))
+        return transactions
+
+    def select_tables(self, instructions: List[Instruction]) -> List[AddressLookupTableAccount]:
+        """
+        Greedy set cover: repeatedly takes the table holding the most of the
+        instructions' still uncovered non-signer accounts.
+        """
+        uncovered = set()
+        for instruction in instructions:
+            for account in instruction.accounts:
+                if not account.is_signer and account.pubkey in self.address_tables:
+                    uncovered.add(account.pubkey)
+
+        selected = []
+        while len(uncovered) > 0:
+            hits: Dict[Pubkey, int] = {}
+            for address in uncovered:
+                for table_address in self.address_tables[address]:
+                    hits[table_address] = hits.get(table_address, 0) + 1
+            if len(hits) == 0:
+                break
+            table_address, count = max(hits.items(), key=lambda h: h[1])
+            if count < MIN_TABLE_HITS:
+                break
+            table = self.tables[table_address]
+            selected.append(table)
+            uncovered.difference_update(table.addresses)
+        return selected
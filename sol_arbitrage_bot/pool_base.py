@@ -1,6 +1,6 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Tuple, List, Optional
+from typing import Callable, Tuple, List, Optional
 
 from solders.pubkey import Pubkey
 from solders.keypair import Keypair
@@ -20,6 +20,46 @@ class LiquidityPool(ABC):
     def get_quote_mint(self, base_mint: Pubkey) -> Optional[Pubkey]:
         pass
 
+    @abstractmethod
+    def get_mints(self) -> Tuple[Pubkey, Pubkey]:
+        pass
+
+    @abstractmethod
+    def get_fee_rate(self) -> float:
+        """
+        Swap fee as a fraction of the input amount.
+        """
+        pass
+
+    @abstractmethod
+    def get_state_accounts(self) -> List[Pubkey]:
+        """
+        Accounts whose data determines the pool's price and quotes.
+        """
+        pass
+
+    @abstractmethod
+    def get_lookup_table_accounts(self) -> List[Pubkey]:
+        """
+        Accounts of the pool's swap instruction that never change and do
+        not depend on the wallet, suitable for an address lookup table.
+        """
+        pass
+
+    @abstractmethod
+    def update_state(self, address: Pubkey, data: bytes) -> bool:
+        """
+        Applies fresh data of one of the state accounts to the cached state.
+        """
+        pass
+
+    @abstractmethod
+    def get_cached_price(self, base_mint: Pubkey = SOL_MINT) -> Optional[float]:
+        """
+        Token price computed from the cached state only, without RPC calls.
+        """
+        pass
+
     @abstractmethod
     def get_base_quote_decimals(self, base_mint: Pubkey) -> Optional[Tuple[int, int]]:
         pass
@@ -42,6 +82,18 @@ class LiquidityPool(ABC):
     ) -> Optional[float]:
         pass
 
+    @abstractmethod
+    async def load_quote_function(
+        self,
+        solana_client: SolanaClient,
+        input_mint: Pubkey,
+    ) -> Optional[Callable[[int], Optional[int]]]:
+        """
+        Fetches whatever state the pool needs and returns a local function
+        mapping a raw amount of input_mint to the raw amount out.
+        """
+        pass
+
     @abstractmethod
     def make_swap_instruction(
         self,
@@ -54,6 +106,20 @@ class LiquidityPool(ABC):
     ) -> Optional[Instruction]:
         pass
 
+    def get_swap_route_key(self, input_mint: Pubkey) -> tuple:
+        """
+        Identifies the accounts make_swap_instruction would use besides the
+        pool keys. An instruction built earlier stays valid while this is
+        unchanged.
+        """
+        return ()
+
+    def get_compute_profile_key(self, amount_in: int, input_mint: Pubkey) -> tuple:
+        """
+        Groups swaps expected to consume about the same compute units.
+        """
+        return (type(self).__name__,)
+
     async def make_buy_instructions(
         self,
         solana_client: SolanaClient,
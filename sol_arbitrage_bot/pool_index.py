@@ -0,0 +1,160 @@
+import json
+import time
+import sqlite3
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+POOL_INDEX_PATH = "pools.sqlite3"
+# Pool lists change slowly; liquidity ranks drift over hours.
+POOL_INDEX_TTL = 1800.0
+# Pools not seen by any refresh for this long are dropped.
+POOL_INDEX_MAX_AGE = 7 * 24 * 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    pool_id TEXT PRIMARY KEY,
+    mint_a TEXT NOT NULL,
+    mint_b TEXT NOT NULL,
+    pool_type TEXT NOT NULL,
+    program_id TEXT NOT NULL,
+    liquidity REAL NOT NULL,
+    fee_rate REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    info TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pools_by_pair ON pools (mint_a, mint_b, liquidity DESC);
+CREATE TABLE IF NOT EXISTS pairs (
+    mint_a TEXT NOT NULL,
+    mint_b TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    page_size INTEGER NOT NULL,
+    PRIMARY KEY (mint_a, mint_b)
+);
+"""
+
+
+def get_pair_key(mint_a: str, mint_b: str) -> Tuple[str, str]:
+    """
+    Order independent key of a mint pair.
+    """
+    mint_a, mint_b = str(mint_a), str(mint_b)
+    return (mint_a, mint_b) if mint_a <= mint_b else (mint_b, mint_a)
+
+
+@dataclass
+class PoolRecord:
+    pool_id: str
+    mint_a: str
+    mint_b: str
+    pool_type: str
+    program_id: str
+    liquidity: float
+    fee_rate: float
+    last_seen: float
+    info: Dict[str, Any]
+
+    @classmethod
+    def from_api(cls, info: Dict[str, Any], last_seen: float) -> "PoolRecord":
+        """
+        From a Raydium API v3 pool info object.
+        """
+        mint_a, mint_b = get_pair_key(info["mintA"]["address"], info["mintB"]["address"])
+        return cls(
+            pool_id=info["id"],
+            mint_a=mint_a,
+            mint_b=mint_b,
+            pool_type=info.get("type", ""),
+            program_id=info.get("programId", ""),
+            liquidity=float(info.get("tvl") or 0.0),
+            fee_rate=float(info.get("feeRate") or 0.0),
+            last_seen=last_seen,
+            info=info,
+        )
+
+
+class PoolIndex:
+    """
+    Pools known per mint pair, persisted in SQLite so a restart can load
+    a whole watchlist without waiting on the Raydium API. Each pair keeps
+    the time and page size of its last refresh; lookups return whatever
+    is stored and is_stale tells the caller when to refresh.
+    """
+
+    def __init__(self, path: str = POOL_INDEX_PATH, ttl: float = POOL_INDEX_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get_pools(self, mint_a: str, mint_b: str, limit: Optional[int] = None) -> List[PoolRecord]:
+        """
+        Stored pools of the pair, highest liquidity first.
+        """
+        rows = self.connection.execute(
+            "SELECT pool_id, mint_a, mint_b, pool_type, program_id, liquidity, fee_rate, last_seen, info "
+            "FROM pools WHERE mint_a = ? AND mint_b = ? ORDER BY liquidity DESC LIMIT ?",
+            (*get_pair_key(mint_a, mint_b), -1 if limit is None else limit),
+        ).fetchall()
+        return [PoolRecord(*row[:8], json.loads(row[8])) for row in rows]
+
+    def get_refresh(self, mint_a: str, mint_b: str) -> Optional[Tuple[float, int]]:
+        """
+        (refreshed_at, page_size) of the pair's last refresh.
+        """
+        return self.connection.execute(
+            "SELECT refreshed_at, page_size FROM pairs WHERE mint_a = ? AND mint_b = ?",
+            get_pair_key(mint_a, mint_b),
+        ).fetchone()
+
+    def covers(self, mint_a: str, mint_b: str, page_size: int) -> bool:
+        """
+        True if the last refresh fetched at least page_size pools, so the
+        stored list is a complete top page_size.
+        """
+        refresh = self.get_refresh(mint_a, mint_b)
+        return refresh is not None and refresh[1] >= page_size
+
+    def is_stale(self, mint_a: str, mint_b: str) -> bool:
+        refresh = self.get_refresh(mint_a, mint_b)
+        return refresh is None or time.time() - refresh[0] > self.ttl
+
+    def update(self, mint_a: str, mint_b: str, pools: List[Dict[str, Any]], page_size: int):
+        """
+        Stores the result of one API refresh of the pair, dropping its
+        pools the refresh no longer returned.
+        """
+        now = time.time()
+        records = []
+        for info in pools:
+            try:
+                records.append(PoolRecord.from_api(info, now))
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping malformed pool info {info.get('id')}: {e}")
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pools VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r.pool_id, r.mint_a, r.mint_b, r.pool_type, r.program_id, r.liquidity, r.fee_rate, r.last_seen, json.dumps(r.info))
+                    for r in records
+                ],
+            )
+            self.connection.execute(
+                "DELETE FROM pools WHERE mint_a = ? AND mint_b = ? AND last_seen < ?",
+                (*get_pair_key(mint_a, mint_b), now),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pairs VALUES (?, ?, ?, ?)",
+                (*get_pair_key(mint_a, mint_b), now, page_size),
+            )
+
+    def prune(self, max_age: float = POOL_INDEX_MAX_AGE) -> int:
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM pools WHERE last_seen < ?", (time.time() - max_age,))
+        return cursor.rowcount
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import asyncio
+import cProfile
+import tracemalloc
+import collections.abc
+from typing import Any, Awaitable, Dict, List, Optional
+
+
+PROFILE_MODES = ("cpu", "tasks", "memory")
+DEFAULT_PROFILE_OUTPUTS = {
+    "cpu": "profile.prof",
+    "tasks": "tasks.trace.json",
+    "memory": "memory.tracemalloc",
+}
+# Step events kept for the trace file; the per-task summary counts all.
+MAX_TASK_EVENTS = 200_000
+TRACEMALLOC_FRAMES = 16
+TOP_STATS = 15
+
+
+class TimedCoroutine(collections.abc.Coroutine):
+    """
+    Forwards to a coroutine and times every step the event loop runs it
+    for, i.e. the time between resuming it and its next await.
+    """
+
+    def __init__(self, coro, name: str, timer: "TaskTimer"):
+        self.coro = coro
+        self.name = name
+        self.timer = timer
+        self.task_id = 0
+
+    def send(self, value):
+        start_ns = time.perf_counter_ns()
+        try:
+            return self.coro.send(value)
+        finally:
+            self.timer.record_step(self, start_ns, time.perf_counter_ns())
+
+    def throw(self, typ, val=None, tb=None):
+        start_ns = time.perf_counter_ns()
+        try:
+            if val is None and tb is None:
+                return self.coro.throw(typ)
+            return self.coro.throw(typ, val, tb)
+        finally:
+            self.timer.record_step(self, start_ns, time.perf_counter_ns())
+
+    def close(self):
+        return self.coro.close()
+
+    def __await__(self):
+        return self.coro.__await__()
+
+
+class TaskTimer:
+    """
+    Task factory timing the steps of every task on the loop. Long steps
+    are what blocks the loop, so the per-task busy time and longest step
+    point at the coroutines that delay everything else.
+    """
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.next_task_id = 1
+        self.events: List[Dict[str, Any]] = []
+        self.summary: Dict[str, Dict[str, float]] = {}
+
+    def task_factory(self, loop: asyncio.AbstractEventLoop, coro, **kwargs) -> asyncio.Task:
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        timed = TimedCoroutine(coro, name, self)
+        timed.task_id = self.next_task_id
+        self.next_task_id += 1
+
+        created_ns = time.perf_counter_ns()
+        task = asyncio.Task(timed, loop=loop, **kwargs)
+        task.add_done_callback(lambda _: self.__record_task(name, created_ns))
+        return task
+
+    def record_step(self, timed: TimedCoroutine, start_ns: int, end_ns: int):
+        duration_ns = end_ns - start_ns
+        stats = self.__stats(timed.name)
+        stats["steps"] += 1
+        stats["busy_ms"] += duration_ns / 1e6
+        stats["max_step_ms"] = max(stats["max_step_ms"], duration_ns / 1e6)
+        if len(self.events) < MAX_TASK_EVENTS:
+            self.events.append({
+                "name": timed.name,
+                "ph": "X",
+                "ts": (start_ns - self.start_ns) / 1e3,
+                "dur": duration_ns / 1e3,
+                "pid": os.getpid(),
+                "tid": timed.task_id,
+            })
+
+    def __stats(self, name: str) -> Dict[str, float]:
+        return self.summary.setdefault(name, {"tasks": 0, "steps": 0, "busy_ms": 0.0, "max_step_ms": 0.0, "wall_ms": 0.0})
+
+    def __record_task(self, name: str, created_ns: int):
+        stats = self.__stats(name)
+        stats["tasks"] += 1
+        stats["wall_ms"] += (time.perf_counter_ns() - created_ns) / 1e6
+
+    def dump(self, path: str):
+        """
+        Writes the steps in the Chrome trace event format, which Perfetto
+        and chrome://tracing open, one row per task.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+class Profiler:
+    """
+    One of three profilers around a whole run:
+
+    cpu: cProfile, written as a pstats file (snakeviz, pstats, gprof2dot).
+    tasks: event loop step time per task, written as a Chrome trace.
+    memory: tracemalloc snapshot at the end, loadable with
+    tracemalloc.Snapshot.load, and the largest growth since the start.
+    """
+
+    def __init__(self, mode: str, output_path: Optional[str] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode}")
+        self.mode = mode
+        self.output_path = output_path or DEFAULT_PROFILE_OUTPUTS[mode]
+        self.cpu_profile: Optional[cProfile.Profile] = None
+        self.task_timer: Optional[TaskTimer] = None
+        self.start_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self):
+        if self.mode == "cpu":
+            self.cpu_profile = cProfile.Profile()
+            self.cpu_profile.enable()
+        elif self.mode == "tasks":
+            self.task_timer = TaskTimer()
+            asyncio.get_running_loop().set_task_factory(self.task_timer.task_factory)
+        elif self.mode == "memory":
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.start_snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        if self.mode == "cpu":
+            self.cpu_profile.disable()
+            self.cpu_profile.dump_stats(self.output_path)
+        elif self.mode == "tasks":
+            asyncio.get_running_loop().set_task_factory(None)
+            self.task_timer.dump(self.output_path)
+            ranked = sorted(self.task_timer.summary.items(), key=lambda item: -item[1]["busy_ms"])
+            for name, stats in ranked[:TOP_STATS]:
+                print("task", name, stats)
+        elif self.mode == "memory":
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot.dump(self.output_path)
+            for stat in snapshot.compare_to(self.start_snapshot, "lineno")[:TOP_STATS]:
+                print("memory", stat)
+        print(f"{self.mode} profile written to {self.output_path}")
+
+    async def run(self, coro: Awaitable) -> Any:
+        """
+        Runs coro in its own task so that, in tasks mode, it is timed
+        like every task it creates.
+        """
+        self.start()
+        try:
+            return await asyncio.get_running_loop().create_task(coro)
+        finally:
+            self.stop()
@@ -1,4 +1,5 @@
 from .raydium_fetcher import *
 from .raydium_liquidity_pool import *
+from .pool_discovery import *
 from . import clmm
 from . import amm_v4
@@ -1,12 +1,13 @@
+import asyncio
 import logging
 import struct
-from dataclasses import dataclass, field
-from typing import Tuple, List, Optional
+from dataclasses import dataclass, field, fields
+from typing import Callable, Dict, Tuple, List, Optional
 
 from solders.pubkey import Pubkey
 from solders.instruction import AccountMeta, Instruction
 
-from sol_arbitrage_bot.constants import SOL_MINT, TOKEN_PROGRAM_ID
+from sol_arbitrage_bot.constants import SOL_MINT, TOKEN_PROGRAM_ID, TOKEN_ACCOUNT_AMOUNT_OFFSET
 from sol_arbitrage_bot.solana_client import SolanaClient
 from sol_arbitrage_bot.accounts import *
 
@@ -22,6 +23,26 @@ from .constants import (
 )
 
 
+# The API reports the swap fee as a fraction; the program keeps it over
+# a denominator of 10000.
+API_SWAP_FEE_DENOMINATOR = 10000
+
+
+def swap_base_in_amount_out(
+    amount_in: int,
+    reserve_in: int,
+    reserve_out: int,
+    swap_fee_numerator: int,
+    swap_fee_denominator: int,
+) -> int:
+    """
+    Raw amount out of a swap_base_in, using the program's integer rounding.
+    """
+    swap_fee = -(-amount_in * swap_fee_numerator // swap_fee_denominator)
+    amount_in_after_fee = amount_in - swap_fee
+    return reserve_out * amount_in_after_fee // (reserve_in + amount_in_after_fee)
+
+
 def bytes_of(value):
     if not (0 <= value < 2**64):
         raise ValueError("Value must be in the range of a u64 (0 to 2^64 - 1).")
@@ -141,6 +162,35 @@ class AmmV4PoolKeys:
             padding=parsed["padding"],
         )
 
+    @classmethod
+    def from_api(cls, keys: dict, info: dict) -> "AmmV4PoolKeys":
+        """
+        From the Raydium API v3 pool keys and info objects. Only the
+        accounts, mints and swap fee are known; the pool's counters and
+        limits are left at zero.
+        """
+        unknown = {f.name: 0 for f in fields(cls) if f.name != "padding"}
+        return cls(**dict(
+            unknown,
+            base_decimals=keys["mintA"]["decimals"],
+            quote_decimals=keys["mintB"]["decimals"],
+            swap_fee_numerator=round(float(info["feeRate"]) * API_SWAP_FEE_DENOMINATOR),
+            swap_fee_denominator=API_SWAP_FEE_DENOMINATOR,
+            pool_open_time=int(keys.get("openTime") or 0),
+            base_vault=Pubkey.from_string(keys["vault"]["A"]),
+            quote_vault=Pubkey.from_string(keys["vault"]["B"]),
+            base_mint=Pubkey.from_string(keys["mintA"]["address"]),
+            quote_mint=Pubkey.from_string(keys["mintB"]["address"]),
+            lp_mint=Pubkey.from_string(keys["mintLp"]["address"]),
+            open_orders=Pubkey.from_string(keys["openOrders"]),
+            market_id=Pubkey.from_string(keys["marketId"]),
+            market_program_id=Pubkey.from_string(keys["marketProgramId"]),
+            target_orders=Pubkey.from_string(keys["targetOrders"]),
+            withdraw_queue=Pubkey.default(),
+            lp_vault=Pubkey.default(),
+            owner=Pubkey.default(),
+        ))
+
 
 @dataclass
 class MarketStateV3:
@@ -198,17 +248,121 @@ class MarketStateV3:
             referrer_rebate_accrued=decoded["referrer_rebate_accrued"],
         )
 
+    @classmethod
+    def from_api(cls, keys: dict) -> "MarketStateV3":
+        """
+        The accounts a swap passes, from the Raydium API v3 pool keys.
+        The nonce is unknown, so the pool takes keys["marketAuthority"].
+        """
+        return cls(
+            account_flags={
+                "initialized": True,
+                "market": True,
+                "open_orders": False,
+                "request_queue": False,
+                "event_queue": False,
+                "bids": False,
+                "asks": False,
+            },
+            own_address=Pubkey.from_string(keys["marketId"]),
+            vault_signer_nonce=0,
+            base_mint=Pubkey.from_string(keys["mintA"]["address"]),
+            quote_mint=Pubkey.from_string(keys["mintB"]["address"]),
+            base_vault=Pubkey.from_string(keys["marketBaseVault"]),
+            base_deposits_total=0,
+            base_fees_accrued=0,
+            quote_vault=Pubkey.from_string(keys["marketQuoteVault"]),
+            quote_deposits_total=0,
+            quote_fees_accrued=0,
+            quote_dust_threshold=0,
+            request_queue=Pubkey.default(),
+            event_queue=Pubkey.from_string(keys["marketEventQueue"]),
+            bids=Pubkey.from_string(keys["marketBids"]),
+            asks=Pubkey.from_string(keys["marketAsks"]),
+            base_lot_size=0,
+            quote_lot_size=0,
+            fee_rate_bps=0,
+            referrer_rebate_accrued=0,
+        )
+
 
 class AmmV4Pool(LiquidityPool):
-    def __init__(self, pair_address: Pubkey, pool_keys: AmmV4PoolKeys, market_state: MarketStateV3):
+    def __init__(
+        self,
+        pair_address: Pubkey,
+        pool_keys: AmmV4PoolKeys,
+        market_state: MarketStateV3,
+        authority: Optional[Pubkey] = None,
+    ):
         self.pair_address = pair_address
         self.pool_keys = pool_keys
         self.market_state = market_state
-        self.authority = Pubkey.create_program_address(
-            seeds=[bytes(self.pool_keys.market_id),
-                   bytes_of(self.market_state.vault_signer_nonce)],
-            program_id=OPEN_BOOK_PROGRAM_ID
-        )
+        if authority is None:
+            authority = Pubkey.create_program_address(
+                seeds=[bytes(self.pool_keys.market_id),
+                       bytes_of(self.market_state.vault_signer_nonce)],
+                program_id=OPEN_BOOK_PROGRAM_ID
+            )
+        self.authority = authority
+        self.vault_balances: Dict[Pubkey, int] = {}
+
+    def get_mints(self) -> Tuple[Pubkey, Pubkey]:
+        return self.pool_keys.base_mint, self.pool_keys.quote_mint
+
+    def get_fee_rate(self) -> float:
+        return self.pool_keys.swap_fee_numerator / self.pool_keys.swap_fee_denominator
+
+    def get_state_accounts(self) -> List[Pubkey]:
+        return [self.pool_keys.base_vault, self.pool_keys.quote_vault]
+
+    def get_lookup_table_accounts(self) -> List[Pubkey]:
+        return [
+            TOKEN_PROGRAM_ID,
+            AMM_V4_PROGRAM_ID,
+            self.pair_address,
+            RAY_AUTHORITY_V4,
+            self.pool_keys.open_orders,
+            self.pool_keys.target_orders,
+            self.pool_keys.base_vault,
+            self.pool_keys.quote_vault,
+            OPEN_BOOK_PROGRAM_ID,
+            self.pool_keys.market_id,
+            self.market_state.bids,
+            self.market_state.asks,
+            self.market_state.event_queue,
+            self.market_state.base_vault,
+            self.market_state.quote_vault,
+            self.authority,
+        ]
+
+    def update_state(self, address: Pubkey, data: bytes) -> bool:
+        if address != self.pool_keys.base_vault and address != self.pool_keys.quote_vault:
+            return False
+        if len(data) < TOKEN_ACCOUNT_AMOUNT_OFFSET + 8:
+            logging.error(f"Invalid vault account data {address} for pool {self.pair_address}")
+            return False
+        self.vault_balances[address] = struct.unpack_from('<Q', data, TOKEN_ACCOUNT_AMOUNT_OFFSET)[0]
+        return True
+
+    def get_cached_price(self, base_mint: Pubkey = SOL_MINT) -> Optional[float]:
+        base_vault_balance = self.vault_balances.get(self.pool_keys.base_vault)
+        quote_vault_balance = self.vault_balances.get(self.pool_keys.quote_vault)
+        if base_vault_balance is None or quote_vault_balance is None:
+            return None
+
+        base_amount = base_vault_balance / (10 ** self.pool_keys.base_decimals)
+        quote_amount = quote_vault_balance / (10 ** self.pool_keys.quote_decimals)
+        if self.pool_keys.base_mint == base_mint:
+            base_reserve, quote_reserve = base_amount, quote_amount
+        elif self.pool_keys.quote_mint == base_mint:
+            base_reserve, quote_reserve = quote_amount, base_amount
+        else:
+            logging.error(f"Invalid base mint address {base_mint} for pool {self.pair_address}")
+            return None
+
+        if quote_reserve == 0:
+            return None
+        return base_reserve / quote_reserve
 
     def get_quote_mint(self, base_mint: Pubkey) -> Optional[Pubkey]:
         if self.pool_keys.base_mint == base_mint:
@@ -272,6 +426,51 @@ class AmmV4Pool(LiquidityPool):
             logging.error(f"Error calculating token price: {e}")
             return None
 
+    async def get_reserves(
+        self,
+        solana_client: SolanaClient,
+        base_mint: Pubkey
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Raw (base, quote) vault balances in token base units.
+        """
+        base_vault_balance_resp, quote_vault_balance_resp = await asyncio.gather(
+            solana_client.get_token_account_balance(self.pool_keys.base_vault),
+            solana_client.get_token_account_balance(self.pool_keys.quote_vault),
+        )
+        if base_vault_balance_resp is None or quote_vault_balance_resp is None:
+            logging.error(f"Cannot fetch vault balances for pool {self.pair_address}")
+            return None
+
+        base_vault_balance = int(base_vault_balance_resp.amount)
+        quote_vault_balance = int(quote_vault_balance_resp.amount)
+        if self.pool_keys.base_mint == base_mint:
+            return base_vault_balance, quote_vault_balance
+        elif self.pool_keys.quote_mint == base_mint:
+            return quote_vault_balance, base_vault_balance
+        logging.error(f"Invalid base mint address {base_mint} for pool {self.pair_address}")
+        return None
+
+    async def load_quote_function(
+        self,
+        solana_client: SolanaClient,
+        input_mint: Pubkey,
+    ) -> Optional[Callable[[int], Optional[int]]]:
+        reserves = await self.get_reserves(solana_client, input_mint)
+        if reserves is None:
+            return None
+
+        reserve_in, reserve_out = reserves
+        swap_fee_numerator = self.pool_keys.swap_fee_numerator
+        swap_fee_denominator = self.pool_keys.swap_fee_denominator
+
+        def quote(amount_in: int) -> Optional[int]:
+            return swap_base_in_amount_out(
+                amount_in, reserve_in, reserve_out, swap_fee_numerator, swap_fee_denominator
+            )
+
+        return quote
+
     async def get_token_price(self, solana_client: SolanaClient, base_mint: Pubkey = SOL_MINT) -> Optional[float]:
         reserves = await self.__get_base_quote_reserves(solana_client, base_mint)
         if reserves is None:
@@ -411,3 +610,39 @@ async def fetch_amm_v4_pool(solana_client: SolanaClient, pair_address: Pubkey, p
         logging.error(f"Failed to fetch Market state for {pair_address}")
         return None
     return AmmV4Pool(pair_address, pool_keys, market_state)
+
+
+def build_amm_v4_pool(keys: dict, info: dict) -> Optional[AmmV4Pool]:
+    """
+    Builds the pool from the Raydium API keys and info alone, without
+    reading the pool or its market on chain.
+    """
+    try:
+        pool_keys = AmmV4PoolKeys.from_api(keys, info)
+        market_state = MarketStateV3.from_api(keys)
+        authority = Pubkey.from_string(keys["marketAuthority"])
+        return AmmV4Pool(Pubkey.from_string(keys["id"]), pool_keys, market_state, authority)
+    except (KeyError, TypeError, ValueError) as e:
+        logging.error(f"Error building AMM pool {keys.get('id')} from API keys: {e}")
+        return None
+
+
+def verify_amm_v4_pool(pool: AmmV4Pool, pool_data) -> bool:
+    """
+    Checks a pool built from API keys against its on-chain account.
+    """
+    if pool_data is None or not is_amm_v4_pool(pool_data):
+        logging.error(f"AMM pool {pool.pair_address} not found on chain")
+        return False
+    pool_keys = __decode_amm_v4_pool_keys(pool_data.data)
+    if pool_keys is None:
+        return False
+
+    for name in ("base_vault", "quote_vault", "base_mint", "quote_mint", "open_orders", "target_orders", "market_id"):
+        if getattr(pool_keys, name) != getattr(pool.pool_keys, name):
+            logging.error(f"API keys of AMM pool {pool.pair_address} disagree with chain on {name}")
+            return False
+    if pool_keys.swap_fee_numerator * pool.pool_keys.swap_fee_denominator != pool.pool_keys.swap_fee_numerator * pool_keys.swap_fee_denominator:
+        logging.error(f"API fee of AMM pool {pool.pair_address} disagrees with chain")
+        return False
+    return True
@@ -1,4 +1,6 @@
 from .clmm import *
 from .constants import *
 from .layouts import *
-from .utils import *
\ No newline at end of file
+from .utils import *
+from .fixed_point_math import *
+from .depth_ladder import *
@@ -1,7 +1,7 @@
 import logging
 import struct
 from dataclasses import dataclass, field
-from typing import Tuple, List, Optional
+from typing import Any, Callable, Dict, Tuple, List, Optional
 
 from solders.pubkey import Pubkey
 from solders.instruction import AccountMeta, Instruction
@@ -15,17 +15,25 @@ from .constants import (
     TOKEN_2022_PROGRAM_ID,
     MEMO_PROGRAM_V2
 )
-from .layouts import CLMM_LAYOUT, TICK_ARRAY_BITMAP_EXTENSION
+from .layouts import (
+    AMM_CONFIG_LAYOUT,
+    CLMM_LAYOUT,
+    TICK_ARRAY_BITMAP_EXTENSION,
+    TICK_ARRAY_LAYOUT
+)
+from .fixed_point_math import FEE_RATE_DENOMINATOR_VALUE, sqrt_price_x64_to_price
+from .depth_ladder import DepthLadder
 from .utils import (
     get_pda_tick_array_bitmap_extension,
-    load_current_and_next_tick_arrays
+    load_tick_arrays_for_both_directions
 )
 
 
+MAX_PROFILE_TICK_CROSSINGS = 8
+
+
 def convert_sqrt_price_x64_to_regular(sqrt_price_x64, decimalsA, decimalsB):
-    decimals_adjustment = 10 ** (decimalsA - decimalsB)
-    sqrt_price = sqrt_price_x64 / (2 ** 64)
-    return sqrt_price ** 2 * decimals_adjustment
+    return sqrt_price_x64_to_price(sqrt_price_x64, decimalsA, decimalsB)
 
 
 @dataclass
@@ -139,39 +147,206 @@ class ClmmPoolKeys:
         )
 
 
+@dataclass
+class AmmConfig:
+    bump: int
+    index: int
+    owner: Pubkey
+    protocol_fee_rate: int
+    trade_fee_rate: int
+    tick_spacing: int
+    fund_fee_rate: int
+    fund_owner: Pubkey
+
+    @classmethod
+    def from_decoded(cls, decoded: dict) -> "AmmConfig":
+        return cls(
+            bump=decoded["bump"],
+            index=decoded["index"],
+            owner=Pubkey.from_bytes(decoded["owner"]),
+            protocol_fee_rate=decoded["protocolFeeRate"],
+            trade_fee_rate=decoded["tradeFeeRate"],
+            tick_spacing=decoded["tickSpacing"],
+            fund_fee_rate=decoded["fundFeeRate"],
+            fund_owner=Pubkey.from_bytes(decoded["fundOwner"]),
+        )
+
+    @classmethod
+    def from_api(cls, config: dict) -> "AmmConfig":
+        """
+        From the config object of the Raydium API v3 pool keys. The
+        owners are not reported and are left as the default key.
+        """
+        return cls(
+            bump=0,
+            index=config["index"],
+            owner=Pubkey.default(),
+            protocol_fee_rate=config["protocolFeeRate"],
+            trade_fee_rate=config["tradeFeeRate"],
+            tick_spacing=config["tickSpacing"],
+            fund_fee_rate=config["fundFeeRate"],
+            fund_owner=Pubkey.default(),
+        )
+
+
 @dataclass
 class TickArrayInfo:
     bitmap_extension: Pubkey
-    current_tick_array: Pubkey
-    next_tick_array_a: Pubkey
-    next_tick_array_b: Pubkey
+    zero_for_one_tick_arrays: List[Pubkey]
+    one_for_zero_tick_arrays: List[Pubkey]
+
+    def get_tick_arrays(self, zero_for_one: bool) -> List[Pubkey]:
+        if zero_for_one:
+            return self.zero_for_one_tick_arrays
+        return self.one_for_zero_tick_arrays
 
 
 class ClmmPool(LiquidityPool):
-    def __init__(self, pair_address: Pubkey, pool_keys: ClmmPoolKeys, tick_array_info: TickArrayInfo):
+    def __init__(self, pair_address: Pubkey, pool_keys: ClmmPoolKeys, tick_array_info: TickArrayInfo, amm_config: AmmConfig):
         self.pair_address = pair_address
         self.pool_keys = pool_keys
         self.tick_array_info = tick_array_info
+        self.amm_config = amm_config
+        self.tick_arrays: Dict[Pubkey, Any] = {}
+        self.tick_arrays_version = 0
+        self.depth_ladders: Dict[bool, DepthLadder] = {}
 
-    async def get_token_price(self, solana_client: SolanaClient, base_mint: Pubkey = SOL_MINT) -> Optional[float]:
+    def update_pool_keys(self, pool_keys: ClmmPoolKeys):
+        self.pool_keys = pool_keys
+
+    def update_tick_array(self, address: Pubkey, tick_array_data: bytes) -> bool:
         try:
-            price = convert_sqrt_price_x64_to_regular(
-                self.pool_keys.sqrt_price_x64,
-                self.pool_keys.mint_decimals_a,
-                self.pool_keys.mint_decimals_b,
-            )
+            self.tick_arrays[address] = TICK_ARRAY_LAYOUT.parse(tick_array_data)
+        except Exception as e:
+            logging.error(f"Error parsing CLMM tick array {address}: {e}")
+            return False
+        self.tick_arrays_version += 1
+        return True
+
+    async def refresh_tick_arrays(self, solana_client: SolanaClient) -> bool:
+        """
+        Loads every tick array on both swap routes in a single RPC call.
+        """
+        addresses = list(dict.fromkeys(
+            self.tick_array_info.zero_for_one_tick_arrays + self.tick_array_info.one_for_zero_tick_arrays
+        ))
+        accounts = await solana_client.get_multiple_accounts_json_parsed(addresses)
+        if accounts is None:
+            logging.error(f"Failed to fetch CLMM tick arrays for {self.pair_address}")
+            return False
+
+        for address, account in zip(addresses, accounts):
+            if account is None:
+                continue
+            self.update_tick_array(address, account.data)
+        return True
+
+    def get_depth_ladder(self, zero_for_one: bool) -> Optional[DepthLadder]:
+        if len(self.tick_arrays) == 0:
+            return None
+
+        key = (self.pool_keys.tick_current, self.pool_keys.liquidity, self.tick_arrays_version)
+        ladder = self.depth_ladders.get(zero_for_one)
+        if ladder is not None and ladder.key == key:
+            return ladder
+
+        initialized_ticks = [
+            (tick.tick, tick.liquidity_net)
+            for tick_array in self.tick_arrays.values()
+            for tick in tick_array.ticks
+            if tick.liquidity_gross != 0
+        ]
+        ladder = DepthLadder.build(
+            self.pool_keys.tick_current,
+            self.pool_keys.liquidity,
+            self.amm_config.trade_fee_rate,
+            zero_for_one,
+            initialized_ticks,
+            key=key,
+        )
+        self.depth_ladders[zero_for_one] = ladder
+        return ladder
+
+    def get_amount_out(self, amount_in: int, input_mint: Pubkey) -> Optional[int]:
+        """
+        Amount out (in base units) for amount_in of input_mint, walked over
+        the loaded tick arrays. None if the tick arrays are not loaded or
+        do not cover the swap.
+        """
+        if input_mint == self.pool_keys.mint_a:
+            zero_for_one = True
+        elif input_mint == self.pool_keys.mint_b:
+            zero_for_one = False
+        else:
+            logging.error(f"Invalid token in mint address {input_mint} for pool {self.pair_address}")
+            return None
 
+        ladder = self.get_depth_ladder(zero_for_one)
+        if ladder is None:
+            return None
+        return ladder.get_amount_out(self.pool_keys.sqrt_price_x64, amount_in)
+
+    def get_mints(self) -> Tuple[Pubkey, Pubkey]:
+        return self.pool_keys.mint_a, self.pool_keys.mint_b
+
+    def get_fee_rate(self) -> float:
+        return self.amm_config.trade_fee_rate / FEE_RATE_DENOMINATOR_VALUE
+
+    def get_state_accounts(self) -> List[Pubkey]:
+        return [self.pair_address] + list(self.tick_arrays.keys())
+
+    def get_lookup_table_accounts(self) -> List[Pubkey]:
+        # Tick arrays move with the price and are left out.
+        return [
+            CLMM_PROGRAM_ID,
+            self.pool_keys.amm_config,
+            self.pair_address,
+            self.pool_keys.vault_a,
+            self.pool_keys.vault_b,
+            self.pool_keys.observation_id,
+            TOKEN_PROGRAM_ID,
+            TOKEN_2022_PROGRAM_ID,
+            MEMO_PROGRAM_V2,
+            self.pool_keys.mint_a,
+            self.pool_keys.mint_b,
+            self.tick_array_info.bitmap_extension,
+        ]
+
+    def update_state(self, address: Pubkey, data: bytes) -> bool:
+        if address == self.pair_address:
+            try:
+                self.update_pool_keys(ClmmPoolKeys.from_decoded(CLMM_LAYOUT.parse(data)))
+            except Exception as e:
+                logging.error(f"Error parsing CLMM data for {self.pair_address}: {e}")
+                return False
+            return True
+        if address in self.tick_arrays:
+            return self.update_tick_array(address, data)
+        return False
+
+    def get_cached_price(self, base_mint: Pubkey = SOL_MINT) -> Optional[float]:
+        try:
             if self.pool_keys.mint_a == base_mint:
-                return 1 / price
+                invert = True
             elif self.pool_keys.mint_b == base_mint:
-                return price
+                invert = False
             else:
                 logging.error(f"Invalid base mint address {base_mint} for pool {self.pair_address}")
                 return None
+
+            return sqrt_price_x64_to_price(
+                self.pool_keys.sqrt_price_x64,
+                self.pool_keys.mint_decimals_a,
+                self.pool_keys.mint_decimals_b,
+                invert=invert,
+            )
         except Exception as e:
             logging.error(f"Error calculating token price: {e}")
             return None
 
+    async def get_token_price(self, solana_client: SolanaClient, base_mint: Pubkey = SOL_MINT) -> Optional[float]:
+        return self.get_cached_price(base_mint)
+
     def get_quote_mint(self, base_mint: Pubkey) -> Optional[Pubkey]:
         if self.pool_keys.mint_a == base_mint:
             return self.pool_keys.mint_b
@@ -192,12 +367,30 @@ class ClmmPool(LiquidityPool):
             return None
         return base_decimals, quote_decimals
 
+    async def load_quote_function(
+        self,
+        solana_client: SolanaClient,
+        input_mint: Pubkey,
+    ) -> Optional[Callable[[int], Optional[int]]]:
+        if len(self.tick_arrays) == 0:
+            if not await self.refresh_tick_arrays(solana_client):
+                return None
+
+        def quote(amount_in: int) -> Optional[int]:
+            return self.get_amount_out(amount_in, input_mint)
+
+        return quote
+
     async def calculate_received_quote_tokens(
         self,
         solana_client: SolanaClient,
         base_in: float,
         base_mint: Pubkey,
     ) -> Optional[float]:
+        if len(self.tick_arrays) > 0:
+            return self.__calculate_received_tokens(base_in, base_mint, self.get_quote_mint(base_mint))
+
+        # Without tick arrays there is no depth to walk; quote at spot.
         token_price = await self.get_token_price(solana_client, base_mint)
         if token_price is None:
             return None
@@ -209,11 +402,46 @@ class ClmmPool(LiquidityPool):
         quote_in: float,
         base_mint: Pubkey,
     ) -> Optional[float]:
+        if len(self.tick_arrays) > 0:
+            return self.__calculate_received_tokens(quote_in, self.get_quote_mint(base_mint), base_mint)
+
+        # Without tick arrays there is no depth to walk; quote at spot.
         token_price = await self.get_token_price(solana_client, base_mint)
         if token_price is None:
             return None
         return round(quote_in * token_price, 9)
 
+    def __calculate_received_tokens(self, amount_in: float, input_mint: Pubkey, output_mint: Pubkey) -> Optional[float]:
+        """
+        None if the loaded tick arrays cannot fill amount_in.
+        """
+        if input_mint is None:
+            return None
+
+        if input_mint == self.pool_keys.mint_a:
+            decimals_in, decimals_out = self.pool_keys.mint_decimals_a, self.pool_keys.mint_decimals_b
+        else:
+            decimals_in, decimals_out = self.pool_keys.mint_decimals_b, self.pool_keys.mint_decimals_a
+
+        amount_out = self.get_amount_out(int(amount_in * (10 ** decimals_in)), input_mint)
+        if amount_out is None:
+            logging.warning(f"Loaded tick arrays of CLMM pool {self.pair_address} cannot fill {amount_in}")
+            return None
+        return round(amount_out / (10 ** decimals_out), 9)
+
+    def get_compute_profile_key(self, amount_in: int, input_mint: Pubkey) -> tuple:
+        # Crossing an initialized tick is the dominant variable cost.
+        zero_for_one = input_mint == self.pool_keys.mint_a
+        ladder = self.get_depth_ladder(zero_for_one)
+        crossings = 0
+        if ladder is not None:
+            crossings = ladder.count_crossings(self.pool_keys.sqrt_price_x64, amount_in)
+        return (type(self).__name__, zero_for_one, min(crossings, MAX_PROFILE_TICK_CROSSINGS))
+
+    def get_swap_route_key(self, input_mint: Pubkey) -> tuple:
+        zero_for_one = input_mint == self.pool_keys.mint_a
+        return (self.tick_array_info.bitmap_extension, *self.tick_array_info.get_tick_arrays(zero_for_one)[:3])
+
     def make_swap_instruction(
         self,
         amount_in: int,
@@ -228,14 +456,21 @@ class ClmmPool(LiquidityPool):
                 input_vault = self.pool_keys.vault_a
                 output_vault = self.pool_keys.vault_b
                 output_mint = self.pool_keys.mint_b
+                zero_for_one = True
             elif input_mint == self.pool_keys.mint_b:
                 input_vault = self.pool_keys.vault_b
                 output_vault = self.pool_keys.vault_a
                 output_mint = self.pool_keys.mint_a
+                zero_for_one = False
             else:
                 logging.error(f"Invalid token in mint address {input_mint} for pool {self.pair_address}")
                 return None
 
+            tick_arrays = self.tick_array_info.get_tick_arrays(zero_for_one)
+            if len(tick_arrays) == 0:
+                logging.error(f"No initialized tick arrays for pool {self.pair_address} (zero_for_one={zero_for_one})")
+                return None
+
             keys = [
                 AccountMeta(pubkey=owner, is_signer=True, is_writable=True),
                 AccountMeta(pubkey=self.pool_keys.amm_config, is_signer=False, is_writable=False),
@@ -250,16 +485,16 @@ class ClmmPool(LiquidityPool):
                 AccountMeta(pubkey=MEMO_PROGRAM_V2, is_signer=False, is_writable=False),
                 AccountMeta(pubkey=input_mint, is_signer=False, is_writable=False),
                 AccountMeta(pubkey=output_mint, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=self.tick_array_info.current_tick_array, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=tick_arrays[0], is_signer=False, is_writable=True),
                 AccountMeta(pubkey=self.tick_array_info.bitmap_extension, is_signer=False, is_writable=True),
-                AccountMeta(pubkey=self.tick_array_info.next_tick_array_a, is_signer=False, is_writable=True),
-                AccountMeta(pubkey=self.tick_array_info.next_tick_array_b, is_signer=False, is_writable=True)
             ]
+            for next_tick_array in tick_arrays[1:3]:
+                keys.append(AccountMeta(pubkey=next_tick_array, is_signer=False, is_writable=True))
 
             data = bytearray()
             data.extend(bytes.fromhex("2b04ed0b1ac91e62")) #SWAP V2
             data.extend(struct.pack('<Q', amount_in))
-            data.extend(struct.pack('<Q', 0))
+            data.extend(struct.pack('<Q', minimum_amount_out))
             data.extend((0).to_bytes(16, byteorder='little'))
             data.extend(struct.pack('<?', True))
             swap_instruction = Instruction(Pubkey.from_string("CAMMCzo5YL8w4VFF8KVHrK22GGUsp5VTaW7grrKgrWqK"), bytes(data), keys)
@@ -284,18 +519,12 @@ def __decode_clmm_pool_keys(clmm_data: bytes) -> Optional[ClmmPoolKeys]:
         return None
 
 
-async def __fetch_tick_array_info(solana_client: SolanaClient, pair_address: Pubkey, pool_keys: ClmmPoolKeys) -> Optional[TickArrayInfo]:
+def __decode_tick_array_info(pair_address: Pubkey, pool_keys: ClmmPoolKeys, bitmap_extension: Pubkey, bitmap_ext_data: bytes) -> Optional[TickArrayInfo]:
     tick_current = int(pool_keys.tick_current)
     tick_spacing = int(pool_keys.tick_spacing)
 
-    bitmap_extension = get_pda_tick_array_bitmap_extension(pair_address)
-    bitmap_ext_data = await solana_client.get_account_info_json_parsed(bitmap_extension)
-    if bitmap_ext_data is None:
-        logging.error(f"Failed to fetch CLMM bitmap extension for {pair_address}")
-        return None
-
     try:
-        parsed_bitmap_ext_data = TICK_ARRAY_BITMAP_EXTENSION.parse(bitmap_ext_data.data)
+        parsed_bitmap_ext_data = TICK_ARRAY_BITMAP_EXTENSION.parse(bitmap_ext_data)
     except Exception  as e:
         logging.error(f"Error parsing CLMM bitmap extension: {e}")
         return None
@@ -304,18 +533,21 @@ async def __fetch_tick_array_info(solana_client: SolanaClient, pair_address: Pub
     negative_tick_array_bitmap = [list(container) for container in parsed_bitmap_ext_data.negative_tick_array_bitmap]
     tick_array_bitmap = list(pool_keys.tick_array_bitmap)
     tickarray_bitmap_extension = [positive_tick_array_bitmap, negative_tick_array_bitmap]
-    tick_array_keys = load_current_and_next_tick_arrays(pair_address, tick_current, tick_spacing, tick_array_bitmap, tickarray_bitmap_extension, zero_for_one=True)
-    if tick_array_keys is None:
+    zero_for_one_keys, one_for_zero_keys = load_tick_arrays_for_both_directions(
+        pair_address, tick_current, tick_spacing, tick_array_bitmap, tickarray_bitmap_extension
+    )
+    if len(zero_for_one_keys) == 0 and len(one_for_zero_keys) == 0:
         logging.error(f"Failed to fetch CLMM tick arrays for {pair_address}")
         return None
+    return TickArrayInfo(bitmap_extension, zero_for_one_keys, one_for_zero_keys)
 
-    if len(tick_array_keys) < 3:
-        logging.error(f"Failed to fetch CLMM tick arrays for {pair_address}")
+
+def __decode_amm_config(amm_config_data: bytes) -> Optional[AmmConfig]:
+    try:
+        return AmmConfig.from_decoded(AMM_CONFIG_LAYOUT.parse(amm_config_data))
+    except Exception as e:
+        logging.error(f"Error parsing CLMM amm config: {e}")
         return None
-    current_tick_array = tick_array_keys[0]
-    next_tick_array_1 = tick_array_keys[1]
-    next_tick_array_2 = tick_array_keys[2]
-    return TickArrayInfo(bitmap_extension, current_tick_array, next_tick_array_1, next_tick_array_2)
 
 
 def is_clmm_pool(pool_data) -> bool:
@@ -328,9 +560,77 @@ async def fetch_clmm_pool(solana_client: SolanaClient, pair_address: Pubkey, poo
         logging.error(f"Failed to fetch CLMM pool keys for {pair_address}")
         return None
 
-    tick_array_info = await __fetch_tick_array_info(solana_client, pair_address, pool_keys)
+    bitmap_extension = get_pda_tick_array_bitmap_extension(pair_address)
+    accounts = await solana_client.get_multiple_accounts_json_parsed([bitmap_extension, pool_keys.amm_config])
+    if accounts is None or len(accounts) != 2:
+        logging.error(f"Failed to fetch CLMM accounts for {pair_address}")
+        return None
+
+    bitmap_ext_data, amm_config_data = accounts
+    if bitmap_ext_data is None:
+        logging.error(f"Failed to fetch CLMM bitmap extension for {pair_address}")
+        return None
+    if amm_config_data is None:
+        logging.error(f"Failed to fetch CLMM amm config for {pair_address}")
+        return None
+
+    tick_array_info = __decode_tick_array_info(pair_address, pool_keys, bitmap_extension, bitmap_ext_data.data)
     if tick_array_info is None:
         logging.error(f"Failed to fetch CLMM tick array info for {pair_address}")
         return None
-    return ClmmPool(pair_address, pool_keys, tick_array_info)
 
+    amm_config = __decode_amm_config(amm_config_data.data)
+    if amm_config is None:
+        logging.error(f"Failed to fetch CLMM amm config for {pair_address}")
+        return None
+    return ClmmPool(pair_address, pool_keys, tick_array_info, amm_config)
+
+
+
+def get_api_bitmap_extension(keys: dict) -> Pubkey:
+    """
+    Bitmap extension of a pool from its Raydium API keys, derived if the
+    API left it out.
+    """
+    if keys.get("exBitmapAccount"):
+        return Pubkey.from_string(keys["exBitmapAccount"])
+    return get_pda_tick_array_bitmap_extension(Pubkey.from_string(keys["id"]))
+
+
+def build_clmm_pool(keys: dict, pool_data, bitmap_ext_data) -> Optional[ClmmPool]:
+    """
+    Builds the pool from its Raydium API keys plus the pool and bitmap
+    extension accounts, which hold the price and initialized tick arrays
+    the API cannot. The amm config comes from the API, and the pool
+    account is checked against the API keys.
+    """
+    try:
+        pair_address = Pubkey.from_string(keys["id"])
+        bitmap_extension = get_api_bitmap_extension(keys)
+        amm_config_address = Pubkey.from_string(keys["config"]["id"])
+        vaults = (Pubkey.from_string(keys["vault"]["A"]), Pubkey.from_string(keys["vault"]["B"]))
+        amm_config = AmmConfig.from_api(keys["config"])
+    except (KeyError, TypeError, ValueError) as e:
+        logging.error(f"Error building CLMM pool {keys.get('id')} from API keys: {e}")
+        return None
+
+    if pool_data is None or not is_clmm_pool(pool_data):
+        logging.error(f"CLMM pool {pair_address} not found on chain")
+        return None
+    if bitmap_ext_data is None:
+        logging.error(f"Failed to fetch CLMM bitmap extension for {pair_address}")
+        return None
+
+    pool_keys = __decode_clmm_pool_keys(pool_data.data)
+    if pool_keys is None:
+        logging.error(f"Failed to fetch CLMM pool keys for {pair_address}")
+        return None
+    if pool_keys.amm_config != amm_config_address or (pool_keys.vault_a, pool_keys.vault_b) != vaults:
+        logging.error(f"API keys of CLMM pool {pair_address} disagree with chain")
+        return None
+
+    tick_array_info = __decode_tick_array_info(pair_address, pool_keys, bitmap_extension, bitmap_ext_data.data)
+    if tick_array_info is None:
+        logging.error(f"Failed to fetch CLMM tick array info for {pair_address}")
+        return None
+    return ClmmPool(pair_address, pool_keys, tick_array_info, amm_config)
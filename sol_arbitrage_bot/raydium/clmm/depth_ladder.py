@@ -0,0 +1,172 @@
+import bisect
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from .fixed_point_math import (
+    FEE_RATE_DENOMINATOR_VALUE,
+    compute_swap_step,
+    get_amount_0_delta,
+    get_amount_1_delta,
+    get_sqrt_price_at_tick,
+    mul_div_ceil,
+)
+
+
+def _segment_amounts(
+    sqrt_price_from_x64: int,
+    sqrt_price_to_x64: int,
+    liquidity: int,
+    fee_rate: int,
+    zero_for_one: bool,
+) -> Tuple[int, int]:
+    """
+    Gross amount in (fee included) and amount out needed to move the price
+    across one constant-liquidity segment.
+    """
+    if liquidity == 0 or sqrt_price_from_x64 == sqrt_price_to_x64:
+        return 0, 0
+    if zero_for_one:
+        amount_in = get_amount_0_delta(sqrt_price_to_x64, sqrt_price_from_x64, liquidity, True)
+        amount_out = get_amount_1_delta(sqrt_price_to_x64, sqrt_price_from_x64, liquidity, False)
+    else:
+        amount_in = get_amount_1_delta(sqrt_price_from_x64, sqrt_price_to_x64, liquidity, True)
+        amount_out = get_amount_0_delta(sqrt_price_from_x64, sqrt_price_to_x64, liquidity, False)
+    fee_amount = mul_div_ceil(amount_in, fee_rate, FEE_RATE_DENOMINATOR_VALUE - fee_rate)
+    return amount_in + fee_amount, amount_out
+
+
+@dataclass
+class DepthLadder:
+    """
+    Cumulative swap amounts at every initialized tick boundary in one
+    direction, starting from the first boundary the current price will hit.
+
+    Only the segment between the live sqrt price and the first boundary is
+    computed per query, so the ladder stays valid while the price moves
+    inside the current tick range. It has to be rebuilt when tick_current,
+    liquidity or a tick array changes; `key` records the state it was built
+    from.
+    """
+    zero_for_one: bool
+    fee_rate: int
+    liquidity: int
+    key: tuple
+    boundary_sqrt_prices_x64: List[int] = field(default_factory=list)
+    # Liquidity active between boundary i and boundary i + 1.
+    liquidities: List[int] = field(default_factory=list)
+    # Amounts needed to go from boundary 0 to boundary i.
+    cumulative_in: List[int] = field(default_factory=list)
+    cumulative_out: List[int] = field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls,
+        tick_current: int,
+        liquidity: int,
+        fee_rate: int,
+        zero_for_one: bool,
+        initialized_ticks: Iterable[Tuple[int, int]],
+        key: tuple = (),
+    ) -> "DepthLadder":
+        """
+        initialized_ticks is an iterable of (tick, liquidity_net) pairs for
+        every initialized tick in the loaded tick arrays.
+        """
+        if zero_for_one:
+            ticks = sorted((t for t in initialized_ticks if t[0] <= tick_current), reverse=True)
+        else:
+            ticks = sorted(t for t in initialized_ticks if t[0] > tick_current)
+
+        ladder = cls(zero_for_one=zero_for_one, fee_rate=fee_rate, liquidity=liquidity, key=key)
+
+        active_liquidity = liquidity
+        total_in = 0
+        total_out = 0
+        previous_sqrt_price_x64 = None
+        for tick, liquidity_net in ticks:
+            sqrt_price_x64 = get_sqrt_price_at_tick(tick)
+            if previous_sqrt_price_x64 is not None:
+                amount_in, amount_out = _segment_amounts(
+                    previous_sqrt_price_x64, sqrt_price_x64, active_liquidity, fee_rate, zero_for_one
+                )
+                total_in += amount_in
+                total_out += amount_out
+
+            # Crossing a tick leftwards removes its net liquidity, rightwards adds it.
+            if zero_for_one:
+                active_liquidity -= liquidity_net
+            else:
+                active_liquidity += liquidity_net
+
+            ladder.boundary_sqrt_prices_x64.append(sqrt_price_x64)
+            ladder.liquidities.append(active_liquidity)
+            ladder.cumulative_in.append(total_in)
+            ladder.cumulative_out.append(total_out)
+            previous_sqrt_price_x64 = sqrt_price_x64
+
+        return ladder
+
+    def max_amount_in(self, sqrt_price_x64: int) -> int:
+        """
+        Largest input the loaded tick arrays can absorb from sqrt_price_x64.
+        """
+        if len(self.boundary_sqrt_prices_x64) == 0:
+            return 0
+        head_in, _ = _segment_amounts(
+            sqrt_price_x64, self.boundary_sqrt_prices_x64[0], self.liquidity, self.fee_rate, self.zero_for_one
+        )
+        return head_in + self.cumulative_in[-1]
+
+    def get_amount_out(self, sqrt_price_x64: int, amount_in: int) -> Optional[int]:
+        """
+        Amount out for amount_in (fee included) starting at sqrt_price_x64.
+        Returns None if the swap runs past the last loaded boundary.
+        """
+        if len(self.boundary_sqrt_prices_x64) == 0:
+            return None
+
+        first_boundary = self.boundary_sqrt_prices_x64[0]
+        head_in, head_out = _segment_amounts(
+            sqrt_price_x64, first_boundary, self.liquidity, self.fee_rate, self.zero_for_one
+        )
+        if amount_in <= head_in:
+            step = compute_swap_step(
+                sqrt_price_x64, first_boundary, self.liquidity, amount_in, self.fee_rate, True, self.zero_for_one
+            )
+            return step.amount_out
+
+        remaining = amount_in - head_in
+        if remaining > self.cumulative_in[-1]:
+            return None
+
+        index = bisect.bisect_right(self.cumulative_in, remaining) - 1
+        amount_out = head_out + self.cumulative_out[index]
+        remaining -= self.cumulative_in[index]
+        if remaining == 0 or index + 1 == len(self.boundary_sqrt_prices_x64):
+            return amount_out
+
+        step = compute_swap_step(
+            self.boundary_sqrt_prices_x64[index],
+            self.boundary_sqrt_prices_x64[index + 1],
+            self.liquidities[index],
+            remaining,
+            self.fee_rate,
+            True,
+            self.zero_for_one,
+        )
+        return amount_out + step.amount_out
+
+    def count_crossings(self, sqrt_price_x64: int, amount_in: int) -> int:
+        """
+        Number of initialized ticks a swap of amount_in crosses, capped at
+        the number of loaded boundaries.
+        """
+        if len(self.boundary_sqrt_prices_x64) == 0:
+            return 0
+
+        head_in, _ = _segment_amounts(
+            sqrt_price_x64, self.boundary_sqrt_prices_x64[0], self.liquidity, self.fee_rate, self.zero_for_one
+        )
+        if amount_in < head_in:
+            return 0
+        return bisect.bisect_right(self.cumulative_in, amount_in - head_in)
@@ -0,0 +1,307 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from .utils import MIN_TICK, MAX_TICK
+
+
+# Mirrors the integer math of the Raydium CLMM program (tick_math.rs,
+# sqrt_price_math.rs, swap_math.rs). Python ints stand in for the U128/U256
+# types, so overflow checks are done explicitly against the on-chain limits.
+
+Q64 = 1 << 64
+U64_MAX = (1 << 64) - 1
+U128_MAX = (1 << 128) - 1
+
+MIN_SQRT_PRICE_X64 = 4295048016
+MAX_SQRT_PRICE_X64 = 79226673521066979257578248091
+
+FEE_RATE_DENOMINATOR_VALUE = 1_000_000
+
+BIT_PRECISION = 16
+
+# 2^64 / sqrt(1.0001)^(2^i) for i in 0..18, as hard-coded in tick_math.rs.
+SQRT_PRICE_TICK_RATIOS_X64 = (
+    0xfffcb933bd6fb800,
+    0xfff97272373d4000,
+    0xfff2e50f5f657000,
+    0xffe5caca7e10f000,
+    0xffcb9843d60f7000,
+    0xff973b41fa98e800,
+    0xff2ea16466c9b000,
+    0xfe5dee046a9a3800,
+    0xfcbe86c7900bb000,
+    0xf987a7253ac65800,
+    0xf3392b0822bb6000,
+    0xe7159475a2caf000,
+    0xd097f3bdfd2f2000,
+    0xa9f746462d9f8000,
+    0x70d869a156f31c00,
+    0x31be135f97ed3200,
+    0x9aa508b5b85a500,
+    0x5d6af8dedc582c,
+    0x2216e584f5fa,
+)
+
+
+def mul_div_floor(a: int, b: int, denominator: int) -> int:
+    return (a * b) // denominator
+
+
+def mul_div_ceil(a: int, b: int, denominator: int) -> int:
+    return -((-a * b) // denominator)
+
+
+def div_rounding_up(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+@lru_cache(maxsize=4096)
+def get_sqrt_price_at_tick(tick: int) -> int:
+    """
+    Calculates 1.0001^(tick/2) as a Q64.64 number.
+    """
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"Tick {tick} is out of range")
+
+    ratio = SQRT_PRICE_TICK_RATIOS_X64[0] if abs_tick & 0x1 else Q64
+    bit = 1
+    while (1 << bit) <= abs_tick:
+        if abs_tick & (1 << bit):
+            ratio = (ratio * SQRT_PRICE_TICK_RATIOS_X64[bit]) >> 64
+        bit += 1
+
+    if tick > 0:
+        ratio = U128_MAX // ratio
+    return ratio
+
+
+def get_tick_at_sqrt_price(sqrt_price_x64: int) -> int:
+    """
+    Calculates the greatest tick whose sqrt price is less than or equal
+    to sqrt_price_x64.
+    """
+    if not (MIN_SQRT_PRICE_X64 <= sqrt_price_x64 < MAX_SQRT_PRICE_X64):
+        raise ValueError(f"Sqrt price {sqrt_price_x64} is out of range")
+
+    msb = sqrt_price_x64.bit_length() - 1
+    log2p_integer_x32 = (msb - 64) << 32
+
+    bit = 0x8000_0000_0000_0000
+    precision = 0
+    log2p_fraction_x64 = 0
+    if msb >= 64:
+        r = sqrt_price_x64 >> (msb - 63)
+    else:
+        r = sqrt_price_x64 << (63 - msb)
+
+    while bit > 0 and precision < BIT_PRECISION:
+        r *= r
+        is_r_more_than_two = r >> 127
+        r >>= 63 + is_r_more_than_two
+        log2p_fraction_x64 += bit * is_r_more_than_two
+        bit >>= 1
+        precision += 1
+
+    log2p_fraction_x32 = log2p_fraction_x64 >> 32
+    log2p_x32 = log2p_integer_x32 + log2p_fraction_x32
+
+    # Change of base: multiply by 2^16 / log2(sqrt(1.0001)).
+    log_sqrt_10001_x64 = log2p_x32 * 59543866431248
+    tick_low = (log_sqrt_10001_x64 - 184467440737095516) >> 64
+    tick_high = (log_sqrt_10001_x64 + 15793534762490258745) >> 64
+
+    if tick_low == tick_high:
+        return tick_low
+    if get_sqrt_price_at_tick(tick_high) <= sqrt_price_x64:
+        return tick_high
+    return tick_low
+
+
+def get_amount_0_delta(sqrt_ratio_a_x64: int, sqrt_ratio_b_x64: int, liquidity: int, round_up: bool) -> int:
+    """
+    Amount of token 0 between two sqrt prices: L * (sqrt_b - sqrt_a) / (sqrt_a * sqrt_b).
+    """
+    if sqrt_ratio_a_x64 > sqrt_ratio_b_x64:
+        sqrt_ratio_a_x64, sqrt_ratio_b_x64 = sqrt_ratio_b_x64, sqrt_ratio_a_x64
+    if sqrt_ratio_a_x64 <= 0:
+        raise ValueError("Sqrt price must be positive")
+
+    numerator_1 = liquidity << 64
+    numerator_2 = sqrt_ratio_b_x64 - sqrt_ratio_a_x64
+    if round_up:
+        result = div_rounding_up(mul_div_ceil(numerator_1, numerator_2, sqrt_ratio_b_x64), sqrt_ratio_a_x64)
+    else:
+        result = mul_div_floor(numerator_1, numerator_2, sqrt_ratio_b_x64) // sqrt_ratio_a_x64
+
+    if result > U64_MAX:
+        raise OverflowError("Token 0 amount exceeds u64")
+    return result
+
+
+def get_amount_1_delta(sqrt_ratio_a_x64: int, sqrt_ratio_b_x64: int, liquidity: int, round_up: bool) -> int:
+    """
+    Amount of token 1 between two sqrt prices: L * (sqrt_b - sqrt_a).
+    """
+    if sqrt_ratio_a_x64 > sqrt_ratio_b_x64:
+        sqrt_ratio_a_x64, sqrt_ratio_b_x64 = sqrt_ratio_b_x64, sqrt_ratio_a_x64
+
+    if round_up:
+        result = mul_div_ceil(liquidity, sqrt_ratio_b_x64 - sqrt_ratio_a_x64, Q64)
+    else:
+        result = mul_div_floor(liquidity, sqrt_ratio_b_x64 - sqrt_ratio_a_x64, Q64)
+
+    if result > U64_MAX:
+        raise OverflowError("Token 1 amount exceeds u64")
+    return result
+
+
+def get_next_sqrt_price_from_amount_0_rounding_up(sqrt_price_x64: int, liquidity: int, amount: int, add: bool) -> int:
+    if amount == 0:
+        return sqrt_price_x64
+    numerator_1 = liquidity << 64
+    product = amount * sqrt_price_x64
+    if add:
+        return mul_div_ceil(numerator_1, sqrt_price_x64, numerator_1 + product)
+    if numerator_1 <= product:
+        raise ValueError("Not enough liquidity for the requested amount")
+    return mul_div_ceil(numerator_1, sqrt_price_x64, numerator_1 - product)
+
+
+def get_next_sqrt_price_from_amount_1_rounding_down(sqrt_price_x64: int, liquidity: int, amount: int, add: bool) -> int:
+    if add:
+        return sqrt_price_x64 + (amount << 64) // liquidity
+    quotient = div_rounding_up(amount << 64, liquidity)
+    if sqrt_price_x64 <= quotient:
+        raise ValueError("Not enough liquidity for the requested amount")
+    return sqrt_price_x64 - quotient
+
+
+def get_next_sqrt_price_from_input(sqrt_price_x64: int, liquidity: int, amount_in: int, zero_for_one: bool) -> int:
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount_0_rounding_up(sqrt_price_x64, liquidity, amount_in, True)
+    return get_next_sqrt_price_from_amount_1_rounding_down(sqrt_price_x64, liquidity, amount_in, True)
+
+
+def get_next_sqrt_price_from_output(sqrt_price_x64: int, liquidity: int, amount_out: int, zero_for_one: bool) -> int:
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount_1_rounding_down(sqrt_price_x64, liquidity, amount_out, False)
+    return get_next_sqrt_price_from_amount_0_rounding_up(sqrt_price_x64, liquidity, amount_out, False)
+
+
+@dataclass
+class SwapStep:
+    sqrt_price_next_x64: int = 0
+    amount_in: int = 0
+    amount_out: int = 0
+    fee_amount: int = 0
+
+
+def _amount_in_range(
+    sqrt_price_current_x64: int,
+    sqrt_price_target_x64: int,
+    liquidity: int,
+    zero_for_one: bool,
+    is_base_input: bool,
+) -> Optional[int]:
+    try:
+        if is_base_input:
+            if zero_for_one:
+                return get_amount_0_delta(sqrt_price_target_x64, sqrt_price_current_x64, liquidity, True)
+            return get_amount_1_delta(sqrt_price_current_x64, sqrt_price_target_x64, liquidity, True)
+        if zero_for_one:
+            return get_amount_1_delta(sqrt_price_target_x64, sqrt_price_current_x64, liquidity, False)
+        return get_amount_0_delta(sqrt_price_current_x64, sqrt_price_target_x64, liquidity, False)
+    except OverflowError:
+        # The on-chain code treats an overflowing range as "cannot be reached".
+        return None
+
+
+def compute_swap_step(
+    sqrt_price_current_x64: int,
+    sqrt_price_target_x64: int,
+    liquidity: int,
+    amount_remaining: int,
+    fee_rate: int,
+    is_base_input: bool,
+    zero_for_one: bool,
+) -> SwapStep:
+    """
+    Computes a single swap step within one liquidity range, exactly as
+    swap_math::compute_swap_step does on-chain.
+    """
+    swap_step = SwapStep()
+
+    if is_base_input:
+        amount_remaining_less_fee = mul_div_floor(
+            amount_remaining,
+            FEE_RATE_DENOMINATOR_VALUE - fee_rate,
+            FEE_RATE_DENOMINATOR_VALUE,
+        )
+        amount_in = _amount_in_range(sqrt_price_current_x64, sqrt_price_target_x64, liquidity, zero_for_one, True)
+        if amount_in is not None:
+            swap_step.amount_in = amount_in
+        if amount_in is not None and amount_remaining_less_fee >= swap_step.amount_in:
+            swap_step.sqrt_price_next_x64 = sqrt_price_target_x64
+        else:
+            swap_step.sqrt_price_next_x64 = get_next_sqrt_price_from_input(
+                sqrt_price_current_x64, liquidity, amount_remaining_less_fee, zero_for_one
+            )
+    else:
+        amount_out = _amount_in_range(sqrt_price_current_x64, sqrt_price_target_x64, liquidity, zero_for_one, False)
+        if amount_out is not None:
+            swap_step.amount_out = amount_out
+        if amount_out is not None and amount_remaining >= swap_step.amount_out:
+            swap_step.sqrt_price_next_x64 = sqrt_price_target_x64
+        else:
+            swap_step.sqrt_price_next_x64 = get_next_sqrt_price_from_output(
+                sqrt_price_current_x64, liquidity, amount_remaining, zero_for_one
+            )
+
+    is_max = sqrt_price_target_x64 == swap_step.sqrt_price_next_x64
+    if zero_for_one:
+        if not (is_max and is_base_input):
+            swap_step.amount_in = get_amount_0_delta(
+                swap_step.sqrt_price_next_x64, sqrt_price_current_x64, liquidity, True
+            )
+        if not (is_max and not is_base_input):
+            swap_step.amount_out = get_amount_1_delta(
+                swap_step.sqrt_price_next_x64, sqrt_price_current_x64, liquidity, False
+            )
+    else:
+        if not (is_max and is_base_input):
+            swap_step.amount_in = get_amount_1_delta(
+                sqrt_price_current_x64, swap_step.sqrt_price_next_x64, liquidity, True
+            )
+        if not (is_max and not is_base_input):
+            swap_step.amount_out = get_amount_0_delta(
+                sqrt_price_current_x64, swap_step.sqrt_price_next_x64, liquidity, False
+            )
+
+    if not is_base_input and swap_step.amount_out > amount_remaining:
+        swap_step.amount_out = amount_remaining
+
+    if is_base_input and swap_step.sqrt_price_next_x64 != sqrt_price_target_x64:
+        swap_step.fee_amount = amount_remaining - swap_step.amount_in
+    else:
+        swap_step.fee_amount = mul_div_ceil(swap_step.amount_in, fee_rate, FEE_RATE_DENOMINATOR_VALUE - fee_rate)
+
+    return swap_step
+
+
+def sqrt_price_x64_to_price(sqrt_price_x64: int, decimals_a: int, decimals_b: int, invert: bool = False) -> float:
+    """
+    Price of token A in units of token B (or of B in A when invert is set),
+    adjusted for mint decimals. The ratio is kept in integers and rounded
+    to a float only once.
+    """
+    numerator = sqrt_price_x64 * sqrt_price_x64
+    denominator = 1 << 128
+    if decimals_a >= decimals_b:
+        numerator *= 10 ** (decimals_a - decimals_b)
+    else:
+        denominator *= 10 ** (decimals_b - decimals_a)
+    if invert:
+        return denominator / numerator
+    return numerator / denominator
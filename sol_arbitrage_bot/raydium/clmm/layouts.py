@@ -68,3 +68,38 @@ TICK_ARRAY_BITMAP_EXTENSION = Struct(
         Array(8, Int64ul)
     )
 )
+
+
+AMM_CONFIG_LAYOUT = cStruct(
+    Padding(8),
+    "bump" / Int8ul,
+    "index" / Int16ul,
+    "owner" / Bytes(32),
+    "protocolFeeRate" / Int32ul,
+    "tradeFeeRate" / Int32ul,
+    "tickSpacing" / Int16ul,
+    "fundFeeRate" / Int32ul,
+    "paddingU32" / Int32ul,
+    "fundOwner" / Bytes(32),
+    "padding" / Array(3, Int64ul)
+)
+
+TICK_STATE_LAYOUT = cStruct(
+    "tick" / Int32sl,
+    "liquidity_net" / BytesInteger(16, signed=True, swapped=True),
+    "liquidity_gross" / BytesInteger(16, signed=False, swapped=True),
+    "fee_growth_outside_0_x64" / BytesInteger(16, signed=False, swapped=True),
+    "fee_growth_outside_1_x64" / BytesInteger(16, signed=False, swapped=True),
+    "reward_growths_outside_x64" / Array(3, BytesInteger(16, signed=False, swapped=True)),
+    Padding(52)
+)
+
+TICK_ARRAY_LAYOUT = cStruct(
+    Padding(8),
+    "pool_id" / Bytes(32),
+    "start_tick_index" / Int32sl,
+    "ticks" / Array(60, TICK_STATE_LAYOUT),
+    "initialized_tick_count" / Int8ul,
+    "recent_epoch" / Int64ul,
+    Padding(107)
+)
@@ -1,3 +1,4 @@
+import bisect
 import logging
 import struct
 from solders.pubkey import Pubkey
@@ -12,31 +13,63 @@ TICK_ARRAY_BITMAP_SIZE = 512
 TOTAL_BITS = 1024
 U1024_MASK = (1 << TOTAL_BITS) - 1
 
-def load_current_and_next_tick_arrays(pool_id, tick_current, tick_spacing, tick_array_bitmap, tickarray_bitmap_extension, zero_for_one):
-    _, current_valid_tick_array_start_index = get_first_initialized_tick_array(
-        tick_current, tick_spacing, tick_array_bitmap, tickarray_bitmap_extension, zero_for_one
-    )
-    if current_valid_tick_array_start_index is None:
-        logging.error("could not get current_valid_tick_array_start_index")
-        return
-
-    tick_array_keys = []
-    initial_tick_array_key = get_pda_tick_array_address(pool_id, current_valid_tick_array_start_index)
-    tick_array_keys.append(initial_tick_array_key)
-
-    for _ in range(5):
-        next_tick_array_index = next_initialized_tick_array_start_index(
-            tick_array_bitmap, tickarray_bitmap_extension, current_valid_tick_array_start_index, tick_spacing, zero_for_one
-        )
+def load_tick_arrays_for_both_directions(pool_id, tick_current, tick_spacing, tick_array_bitmap, tickarray_bitmap_extension, max_tick_arrays=6):
+    """
+    Resolves the current and next tick arrays for both swap directions
+    from a single decode of the default bitmap and its extension.
+    Returns (zero_for_one_keys, one_for_zero_keys).
+    """
+    start_indexes = get_initialized_tick_array_start_indexes(tick_spacing, tick_array_bitmap, tickarray_bitmap_extension)
+    current_start_index = get_array_start_index(tick_current, tick_spacing)
+
+    # start_indexes is sorted, so the split point separates the two directions.
+    split = bisect.bisect_right(start_indexes, current_start_index)
+    zero_for_one_indexes = start_indexes[max(0, split - max_tick_arrays):split][::-1]
+    lower_split = split - 1 if split > 0 and start_indexes[split - 1] == current_start_index else split
+    one_for_zero_indexes = start_indexes[lower_split:lower_split + max_tick_arrays]
+
+    zero_for_one_keys = [get_pda_tick_array_address(pool_id, i) for i in zero_for_one_indexes]
+    one_for_zero_keys = [get_pda_tick_array_address(pool_id, i) for i in one_for_zero_indexes]
+    return zero_for_one_keys, one_for_zero_keys
+
+def get_initialized_tick_array_start_indexes(tick_spacing, tick_array_bitmap, tickarray_bitmap_extension):
+    """
+    Returns the sorted start indexes of every initialized tick array
+    recorded in the default bitmap and the bitmap extension.
+    """
+    multiplier = tick_count(tick_spacing)
+    ticks_in_one_bitmap = max_tick_in_tickarray_bitmap(tick_spacing)
+    min_start_index = get_array_start_index(MIN_TICK, tick_spacing)
+    max_start_index = get_array_start_index(MAX_TICK, tick_spacing)
 
-        if next_tick_array_index is None:
-            break
+    start_indexes = []
+    for bit_pos in _set_bits(u1024_from_list(tick_array_bitmap)):
+        start_indexes.append((bit_pos - 512) * multiplier)
 
-        current_valid_tick_array_start_index = next_tick_array_index
-        next_tick_array_key = get_pda_tick_array_address(pool_id, current_valid_tick_array_start_index)
-        tick_array_keys.append(next_tick_array_key)
+    positive_bitmap = tickarray_bitmap_extension[0]
+    negative_bitmap = tickarray_bitmap_extension[1]
+    for offset, bitmap in enumerate(positive_bitmap):
+        base = (offset + 1) * ticks_in_one_bitmap
+        for bit_pos in _set_bits(u512_from_list(bitmap)):
+            start_indexes.append(base + bit_pos * multiplier)
+    for offset, bitmap in enumerate(negative_bitmap):
+        base = -(offset + 2) * ticks_in_one_bitmap
+        for bit_pos in _set_bits(u512_from_list(bitmap)):
+            start_indexes.append(base + bit_pos * multiplier)
+
+    return sorted(i for i in start_indexes if min_start_index <= i <= max_start_index)
+
+def u512_from_list(words):
+    value = 0
+    for i, word in enumerate(words):
+        value |= word << (64 * i)
+    return value
 
-    return tick_array_keys
+def _set_bits(x):
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
 
 def get_pda_tick_array_address(pool_id: Pubkey, start_index: int):
     tick_array, _ = Pubkey.find_program_address(
@@ -390,7 +423,6 @@ def tick_count(tick_spacing):
 
 def get_array_start_index(tick_index, tick_spacing):
     ticks_in_array = tick_count(tick_spacing)
+    # Python floor division already rounds negative ticks down to the array start.
     start = tick_index // ticks_in_array
-    if tick_index < 0 and tick_index % ticks_in_array != 0:
-        start -= 1
     return start * ticks_in_array
@@ -0,0 +1,204 @@
+import base64
+import struct
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from solders.pubkey import Pubkey
+
+from sol_arbitrage_bot.constants import SOL_MINT, TOKEN_ACCOUNT_AMOUNT_OFFSET
+from sol_arbitrage_bot.solana_client import SolanaClient
+from sol_arbitrage_bot.tracing import traced
+
+from .amm_v4 import AMM_V4_LAYOUT, AMM_V4_PROGRAM_ID
+from .clmm import CLMM_LAYOUT, CLMM_PROGRAM_ID
+
+
+def get_field_offset(layout, name: str) -> int:
+    """
+    Byte offset of a top-level field of a fixed-size construct Struct.
+    """
+    offset = 0
+    for subcon in layout.subcons:
+        if subcon.name == name:
+            return offset
+        offset += subcon.sizeof()
+    raise KeyError(name)
+
+
+AMM_V4_ACCOUNT_SIZE = AMM_V4_LAYOUT.sizeof()
+AMM_V4_BASE_MINT_OFFSET = get_field_offset(AMM_V4_LAYOUT, "baseMint")
+AMM_V4_QUOTE_MINT_OFFSET = get_field_offset(AMM_V4_LAYOUT, "quoteMint")
+AMM_V4_BASE_VAULT_OFFSET = get_field_offset(AMM_V4_LAYOUT, "baseVault")
+AMM_V4_QUOTE_VAULT_OFFSET = get_field_offset(AMM_V4_LAYOUT, "quoteVault")
+CLMM_ACCOUNT_SIZE = CLMM_LAYOUT.sizeof()
+CLMM_MINT_A_OFFSET = get_field_offset(CLMM_LAYOUT, "mintA")
+CLMM_MINT_B_OFFSET = get_field_offset(CLMM_LAYOUT, "mintB")
+CLMM_VAULT_A_OFFSET = get_field_offset(CLMM_LAYOUT, "vaultA")
+CLMM_VAULT_B_OFFSET = get_field_offset(CLMM_LAYOUT, "vaultB")
+
+
+@dataclass
+class DiscoveredPool:
+    pair_address: Pubkey
+    program_id: Pubkey
+    mint_a: Pubkey
+    mint_b: Pubkey
+    vault_a: Pubkey
+    vault_b: Pubkey
+
+    def get_vault(self, mint: Pubkey) -> Optional[Pubkey]:
+        if mint == self.mint_a:
+            return self.vault_a
+        if mint == self.mint_b:
+            return self.vault_b
+        return None
+
+
+@dataclass
+class PoolQuery:
+    """
+    One getProgramAccounts call: accounts of the program's pool size
+    holding mint_a and mint_b at their offsets. Only the span covering
+    the mint and vault fields, which are adjacent in both layouts, is
+    returned.
+    """
+    program_id: Pubkey
+    account_size: int
+    mint_a_offset: int
+    mint_b_offset: int
+    vault_a_offset: int
+    vault_b_offset: int
+    mint_a: Pubkey
+    mint_b: Pubkey
+
+    def get_filters(self) -> List[dict]:
+        return [
+            {"dataSize": self.account_size},
+            {"memcmp": {"offset": self.mint_a_offset, "bytes": str(self.mint_a)}},
+            {"memcmp": {"offset": self.mint_b_offset, "bytes": str(self.mint_b)}},
+        ]
+
+    def __get_offsets(self) -> Tuple[int, int, int, int]:
+        return self.mint_a_offset, self.mint_b_offset, self.vault_a_offset, self.vault_b_offset
+
+    def get_data_slice(self) -> Tuple[int, int]:
+        start = min(self.__get_offsets())
+        return start, max(self.__get_offsets()) + 32 - start
+
+    def decode(self, result: List[dict]) -> Iterator[DiscoveredPool]:
+        start, _ = self.get_data_slice()
+        for entry in result:
+            try:
+                data = base64.b64decode(entry["account"]["data"][0])
+                mint_a, mint_b, vault_a, vault_b = [
+                    Pubkey.from_bytes(data[offset - start:offset - start + 32]) for offset in self.__get_offsets()
+                ]
+                yield DiscoveredPool(
+                    pair_address=Pubkey.from_string(entry["pubkey"]),
+                    program_id=self.program_id,
+                    mint_a=mint_a,
+                    mint_b=mint_b,
+                    vault_a=vault_a,
+                    vault_b=vault_b,
+                )
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping malformed program account {entry.get('pubkey')}: {e}")
+
+
+def get_pool_queries(token_mint: Pubkey, base_mint: Pubkey = SOL_MINT) -> List[PoolQuery]:
+    """
+    AMM v4 pools may hold either mint as base, so both orders are
+    queried. CLMM pools always store the smaller mint as mint A.
+    """
+    amm_v4_offsets = (AMM_V4_BASE_MINT_OFFSET, AMM_V4_QUOTE_MINT_OFFSET, AMM_V4_BASE_VAULT_OFFSET, AMM_V4_QUOTE_VAULT_OFFSET)
+    clmm_offsets = (CLMM_MINT_A_OFFSET, CLMM_MINT_B_OFFSET, CLMM_VAULT_A_OFFSET, CLMM_VAULT_B_OFFSET)
+    clmm_mint_a, clmm_mint_b = sorted([token_mint, base_mint], key=bytes)
+    return [
+        PoolQuery(AMM_V4_PROGRAM_ID, AMM_V4_ACCOUNT_SIZE, *amm_v4_offsets, token_mint, base_mint),
+        PoolQuery(AMM_V4_PROGRAM_ID, AMM_V4_ACCOUNT_SIZE, *amm_v4_offsets, base_mint, token_mint),
+        PoolQuery(CLMM_PROGRAM_ID, CLMM_ACCOUNT_SIZE, *clmm_offsets, clmm_mint_a, clmm_mint_b),
+    ]
+
+
+async def discover_pools_for_mint(
+    solana_client: SolanaClient,
+    token_mint: Pubkey,
+    base_mint: Pubkey = SOL_MINT,
+) -> AsyncIterator[DiscoveredPool]:
+    """
+    Finds every AMM v4 and CLMM pool of the pair on chain, without the
+    Raydium API. The queries run concurrently and each one's accounts are
+    decoded and yielded as soon as it returns.
+    """
+    queries = get_pool_queries(token_mint, base_mint)
+
+    async def run(query: PoolQuery) -> Tuple[PoolQuery, Optional[List[dict]]]:
+        result = await solana_client.get_program_accounts(
+            query.program_id, query.get_filters(), query.get_data_slice()
+        )
+        return query, result
+
+    tasks = [asyncio.create_task(run(query)) for query in queries]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            query, result = await next_done
+            if result is None:
+                logging.error(f"getProgramAccounts failed for {query.program_id} {query.mint_a}/{query.mint_b}")
+                continue
+            for discovered_pool in query.decode(result):
+                yield discovered_pool
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def rank_discovered_pools(
+    solana_client: SolanaClient,
+    discovered_pools: List[DiscoveredPool],
+    base_mint: Pubkey = SOL_MINT,
+    limit: Optional[int] = None,
+) -> List[DiscoveredPool]:
+    """
+    Orders pools by the balance of their base mint vault, read in one
+    batched call, highest first. Empty pools and pools whose vault
+    cannot be read are dropped.
+    """
+    vaults = [pool.get_vault(base_mint) for pool in discovered_pools]
+    accounts = await solana_client.get_multiple_accounts([vault for vault in vaults if vault is not None])
+    if accounts is None:
+        logging.error(f"Failed to fetch vaults of {len(discovered_pools)} discovered pools")
+        return []
+
+    accounts = iter(accounts)
+    ranked = []
+    for pool, vault in zip(discovered_pools, vaults):
+        account = next(accounts) if vault is not None else None
+        if account is None or len(account.data) < TOKEN_ACCOUNT_AMOUNT_OFFSET + 8:
+            continue
+        balance, = struct.unpack_from('<Q', account.data, TOKEN_ACCOUNT_AMOUNT_OFFSET)
+        if balance > 0:
+            ranked.append((balance, pool))
+
+    ranked.sort(key=lambda r: r[0], reverse=True)
+    return [pool for _, pool in ranked[:limit]]
+
+
+@traced("pool_discovery")
+async def fetch_pool_addresses_for_mint(
+    solana_client: SolanaClient,
+    token_mint: Pubkey,
+    base_mint: Pubkey = SOL_MINT,
+    limit: Optional[int] = None,
+) -> List[Pubkey]:
+    """
+    Addresses of the pair's pools with liquidity, deepest first, at most
+    limit of them.
+    """
+    discovered_pools = [pool async for pool in discover_pools_for_mint(solana_client, token_mint, base_mint)]
+    if len(discovered_pools) == 0:
+        return []
+    ranked = await rank_discovered_pools(solana_client, discovered_pools, base_mint, limit)
+    return [pool.pair_address for pool in ranked]
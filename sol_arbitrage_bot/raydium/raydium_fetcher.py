@@ -1,30 +1,135 @@
+import asyncio
 import aiohttp
 import logging
-from typing import Dict, List, Any, Optional
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Any, Optional
 
 from sol_arbitrage_bot.constants import SOL_MINT
+from sol_arbitrage_bot.pool_index import PoolIndex
+from sol_arbitrage_bot.tracing import traced
 
 
 RAYDIUM_API_URL =  "https://api-v3.raydium.io"
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+POOL_INDEX_CONCURRENCY_LIMIT = 4
+STREAM_PAGE_SIZE = 100
+STREAM_PREFETCH_PAGES = 3
+# Pool ids per request to the multi-id endpoints, keeping URLs short.
+MAX_IDS_PER_REQUEST = 100
 
 
 class RaydiumFetcher:
     """
     A class responsible for handling interactions with the Raydium API.
+
+    With a pool_index, pool lists are served from the index whenever it
+    holds them and stale pairs are refreshed in the background, so only
+    mints never seen before wait on the API.
     """
 
-    def __init__(self, raydium_api_url: str = RAYDIUM_API_URL):
+    def __init__(
+        self,
+        raydium_api_url: str = RAYDIUM_API_URL,
+        pool_index: Optional[PoolIndex] = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+    ):
         self.raydium_api_url = raydium_api_url
+        self.pool_index = pool_index
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
         self.session: Optional[aiohttp.ClientSession] = None
+        self.refresh_tasks: Dict[str, asyncio.Task] = {}
 
     async def __aenter__(self) -> "RaydiumFetcher":
         self.session = aiohttp.ClientSession()
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
+        # Background index refreshes are finished rather than dropped, so
+        # a short run still leaves a fresh index for the next one.
+        refresh_tasks = list(self.refresh_tasks.values())
+        if exc_type is not None:
+            for task in refresh_tasks:
+                task.cancel()
+        await asyncio.gather(*refresh_tasks, return_exceptions=True)
         if self.session:
             await self.session.close()
 
+    async def __get(self, path: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        GET with retries on rate limits, server errors and connection
+        errors.
+        """
+        if self.session is None:
+            logging.error("RaydiumFetcher or session is not initialized.")
+            return None
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with self.session.get(f"{self.raydium_api_url}{path}", params=params) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status != 429 and response.status < 500:
+                        logging.warning(f"Raydium API returned status {response.status} for {path} {params}")
+                        return None
+                    logging.warning(f"Raydium API returned status {response.status} (attempt {attempt}/{self.max_retries})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"HTTP error fetching {path} (attempt {attempt}/{self.max_retries}): {e}")
+            except Exception as e:
+                logging.error(f"Unexpected error fetching {path}: {e}")
+                return None
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+
+        logging.error(f"Max retries exceeded for Raydium API {path}")
+        return None
+
+    async def __fetch_pools_page(self, token_mint: str, page_size: int, page: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        One page of the mint's SOL pools by liquidity. An empty list if
+        there are none, None on error.
+        """
+        data = await self.__get("/pools/info/mint", {
+            "mint1": str(token_mint),
+            "mint2": str(SOL_MINT),
+            "poolType": "all",
+            "poolSortField": "liquidity",
+            "sortType": "desc",
+            "pageSize": page_size,
+            "page": page,
+        })
+        if data is None:
+            return None
+        return (data.get('data') or {}).get('data') or []
+
+    async def __fetch_by_ids(self, path: str, ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Objects of many pools from a multi-id endpoint, requested in
+        concurrent chunks. Ids the API does not know are left out.
+        """
+        chunks = [ids[i:i + MAX_IDS_PER_REQUEST] for i in range(0, len(ids), MAX_IDS_PER_REQUEST)]
+        responses = await asyncio.gather(*[self.__get(path, {"ids": ",".join(chunk)}) for chunk in chunks])
+        if any(data is None for data in responses):
+            return None
+        return [entry for data in responses for entry in data.get("data") or [] if entry]
+
+    @traced("pool_keys")
+    async def fetch_pool_keys(self, pool_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Accounts of each pool needed to swap through it, in bulk.
+        """
+        return await self.__fetch_by_ids("/pools/key/ids", [str(pool_id) for pool_id in pool_ids])
+
+    @traced("pool_keys")
+    async def fetch_pool_infos(self, pool_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Info objects (mints, fee rate, liquidity) of each pool, in bulk.
+        """
+        return await self.__fetch_by_ids("/pools/info/ids", [str(pool_id) for pool_id in pool_ids])
+
+    @traced("pool_discovery")
     async def fetch_top_lp_for_mint(
         self,
         token_mint: str,
@@ -35,43 +140,102 @@ class RaydiumFetcher:
         Fetches Raydium LP pools for a given token mint address
         paired with SOL. Returns None if not found.
         """
-        pool_type = "all"
-        pool_sort_field = "liquidity"
-        sort_type = "desc"
+        if self.pool_index is not None and page == 1 and self.pool_index.covers(token_mint, SOL_MINT, page_size):
+            if self.pool_index.is_stale(token_mint, SOL_MINT):
+                self.__schedule_refresh(token_mint, page_size)
+            records = self.pool_index.get_pools(token_mint, SOL_MINT, page_size)
+            if len(records) == 0:
+                logging.info(f"No Raydium pools indexed for token mint: {token_mint}")
+                return None
+            return [record.info for record in records]
 
-        url = (
-            f"{RAYDIUM_API_URL}/pools/info/mint?"
-            f"mint1={token_mint}&mint2={SOL_MINT}"
-            f"&poolType={pool_type}"
-            f"&poolSortField={pool_sort_field}"
-            f"&sortType={sort_type}"
-            f"&pageSize={page_size}"
-            f"&page={page}"
-        )
-
-        if self.session is None:
-            logging.error("RaydiumFetcher or session is not initialized.")
-            return None
-
-        try:
-            async with self.session.get(url) as response:
-                if response.status != 200:
-                    logging.warning(
-                        f"Raydium API returned status {response.status} "
-                        f"for mint {token_mint}"
-                    )
-                    return None
-                data = await response.json()
-        except aiohttp.ClientError as e:
-            logging.error(f"HTTP error fetching Raydium LP info: {e}")
-            return None
-        except Exception as e:
-            logging.error(f"Unexpected error fetching Raydium LP info: {e}")
+        pools = await self.__fetch_pools_page(token_mint, page_size, page)
+        if pools is None:
             return None
+        if self.pool_index is not None and page == 1:
+            self.pool_index.update(token_mint, SOL_MINT, pools, page_size)
 
-        pools = data.get('data', {}).get('data', [])
         if not pools:
             logging.info(f"No Raydium pools found for token mint: {token_mint}")
             return None
 
         return pools
+
+    async def stream_pools_for_mint(
+        self,
+        token_mint: str,
+        page_size: int = STREAM_PAGE_SIZE,
+        prefetch: int = STREAM_PREFETCH_PAGES,
+        min_liquidity: float = 0.0,
+        max_pages: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields every SOL pool of the mint, highest liquidity first, across
+        all pages. Once the first page comes back full, up to prefetch
+        pages are requested ahead of the one being consumed. Stops at the
+        first pool below min_liquidity (TVL in USD) or at a short page.
+        """
+        pages: Deque[asyncio.Task] = deque()
+        next_page = 1
+
+        def schedule(depth: int):
+            nonlocal next_page
+            while len(pages) < depth and (max_pages is None or next_page <= max_pages):
+                pages.append(asyncio.create_task(self.__fetch_pools_page(token_mint, page_size, next_page)))
+                next_page += 1
+
+        schedule(1)
+        try:
+            while len(pages) > 0:
+                pools = await pages.popleft()
+                if pools is None:
+                    logging.error(f"Stopping pool discovery for {token_mint} at page {next_page - len(pages) - 1}")
+                    return
+                for pool in pools:
+                    if float(pool.get("tvl") or 0.0) < min_liquidity:
+                        return
+                    yield pool
+                if len(pools) < page_size:
+                    return
+                schedule(prefetch)
+        finally:
+            for task in pages:
+                task.cancel()
+            await asyncio.gather(*pages, return_exceptions=True)
+
+    async def refresh_pool_index(self, token_mint: str, page_size: int) -> bool:
+        pools = await self.__fetch_pools_page(token_mint, page_size, 1)
+        if pools is None:
+            return False
+        self.pool_index.update(token_mint, SOL_MINT, pools, page_size)
+        return True
+
+    def __schedule_refresh(self, token_mint: str, page_size: int):
+        if token_mint in self.refresh_tasks:
+            return
+        task = asyncio.create_task(self.refresh_pool_index(token_mint, page_size))
+        self.refresh_tasks[token_mint] = task
+        task.add_done_callback(lambda _: self.refresh_tasks.pop(token_mint, None))
+
+    async def run_pool_index_refresh(
+        self,
+        token_mints: List[str],
+        page_size: int,
+        concurrency_limit: int = POOL_INDEX_CONCURRENCY_LIMIT,
+    ):
+        """
+        Keeps the index entries of a watchlist fresh, refreshing the stale
+        ones a few at a time so a large watchlist stays under the API's
+        rate limits, and prunes pools no refresh has seen in a long time.
+        """
+        semaphore = asyncio.Semaphore(concurrency_limit)
+
+        async def refresh(token_mint: str):
+            async with semaphore:
+                await self.refresh_pool_index(token_mint, page_size)
+
+        while True:
+            stale = [mint for mint in token_mints if self.pool_index.is_stale(mint, SOL_MINT)]
+            await asyncio.gather(*[refresh(mint) for mint in stale])
+            self.pool_index.prune()
+            await asyncio.sleep(self.pool_index.ttl / 4)
@@ -1,13 +1,16 @@
+import asyncio
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 from solders.pubkey import Pubkey
 
 from sol_arbitrage_bot.solana_client import SolanaClient
 from sol_arbitrage_bot.pool_base import LiquidityPool
+from sol_arbitrage_bot.tracing import traced
 
 from sol_arbitrage_bot.raydium.amm_v4 import amm_v4
 from sol_arbitrage_bot.raydium.clmm import clmm
+from sol_arbitrage_bot.raydium.raydium_fetcher import RaydiumFetcher
 
 
 def is_raydium_pool(pool_data) -> bool:
@@ -26,3 +29,72 @@ async def fetch_liquidity_pool(solana_client: SolanaClient, pair_address: Pubkey
         logging.error(f"Unknown pool type {pool_data.owner}")
         return None
     return pool
+
+
+
+@traced("pool_load")
+async def fetch_liquidity_pools_from_api(
+    solana_client: SolanaClient,
+    raydium_fetcher: RaydiumFetcher,
+    pool_ids: List[str],
+    verify: bool = True,
+) -> List[LiquidityPool]:
+    """
+    Loads many pools from the Raydium API's multi-id endpoints. AMM v4
+    pools are built from the API alone; their accounts are read on chain
+    only when verify is set, to drop pools the API got wrong. CLMM pools
+    still need their pool and bitmap extension accounts for the price and
+    tick arrays. All on-chain reads share one batched call. Pools are
+    returned in pool_ids order, leaving out those that fail to load.
+    """
+    pool_ids = [str(pool_id) for pool_id in pool_ids]
+    keys_list, infos = await asyncio.gather(
+        raydium_fetcher.fetch_pool_keys(pool_ids),
+        raydium_fetcher.fetch_pool_infos(pool_ids),
+    )
+    if keys_list is None or infos is None:
+        logging.error(f"Failed to fetch API keys for {len(pool_ids)} pools")
+        return []
+    info_by_id: Dict[str, dict] = {info.get("id"): info for info in infos}
+
+    pools: Dict[str, LiquidityPool] = {}
+    clmm_pools: List[Tuple[dict, Pubkey, Pubkey]] = []
+    for keys in keys_list:
+        program_id = keys.get("programId")
+        if program_id == str(amm_v4.AMM_V4_PROGRAM_ID):
+            info = info_by_id.get(keys.get("id"))
+            if info is None:
+                logging.error(f"Missing API info for AMM pool {keys.get('id')}")
+                continue
+            pool = amm_v4.build_amm_v4_pool(keys, info)
+            if pool is not None:
+                pools[keys["id"]] = pool
+        elif program_id == str(clmm.CLMM_PROGRAM_ID):
+            try:
+                clmm_pools.append((keys, Pubkey.from_string(keys["id"]), clmm.get_api_bitmap_extension(keys)))
+            except (KeyError, TypeError, ValueError) as e:
+                logging.error(f"Error reading API keys of CLMM pool {keys.get('id')}: {e}")
+        else:
+            logging.warning(f"Skipping pool {keys.get('id')} of unsupported program {program_id}")
+
+    amm_pools = list(pools.values()) if verify else []
+    addresses = [pool.pair_address for pool in amm_pools]
+    for _, pair_address, bitmap_extension in clmm_pools:
+        addresses += [pair_address, bitmap_extension]
+
+    if len(addresses) > 0:
+        accounts = await solana_client.get_multiple_accounts(addresses)
+        if accounts is None:
+            logging.error(f"Failed to fetch {len(addresses)} pool accounts")
+            return []
+
+        for pool, pool_data in zip(amm_pools, accounts):
+            if not amm_v4.verify_amm_v4_pool(pool, pool_data):
+                pools.pop(str(pool.pair_address))
+        clmm_accounts = accounts[len(amm_pools):]
+        for i, (keys, _, _) in enumerate(clmm_pools):
+            pool = clmm.build_clmm_pool(keys, clmm_accounts[2 * i], clmm_accounts[2 * i + 1])
+            if pool is not None:
+                pools[keys["id"]] = pool
+
+    return [pools[pool_id] for pool_id in pool_ids if pool_id in pools]
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from solders.pubkey import Pubkey
+
+from .solana_client import SolanaClient
+from .constants import SOL_MINT
+from .pool_base import LiquidityPool
+from .liquidity_pool import fetch_liquidity_pool
+from .raydium.raydium_fetcher import RaydiumFetcher
+from .raydium.raydium_liquidity_pool import fetch_liquidity_pools_from_api
+from .tracing import traced, tracer
+
+
+SCANNER_CONCURRENCY_LIMIT = 8
+POOLS_PER_MINT = 5
+SCAN_INTERVAL = 1.0
+
+
+@dataclass
+class Opportunity:
+    token_mint: str
+    buy_pool: LiquidityPool
+    sell_pool: LiquidityPool
+    buy_price: float
+    sell_price: float
+
+    @property
+    def spread(self) -> float:
+        return self.sell_price / self.buy_price - 1
+
+
+class Scanner:
+    """
+    Discovers and loads the pools of a watchlist of mints concurrently,
+    then prices all of them from one batched account snapshot per cycle.
+    """
+
+    def __init__(
+        self,
+        solana_client: SolanaClient,
+        raydium_fetcher: RaydiumFetcher,
+        base_mint: Pubkey = SOL_MINT,
+        pools_per_mint: int = POOLS_PER_MINT,
+        concurrency_limit: int = SCANNER_CONCURRENCY_LIMIT,
+    ):
+        self.solana_client = solana_client
+        self.raydium_fetcher = raydium_fetcher
+        self.base_mint = base_mint
+        self.pools_per_mint = pools_per_mint
+        self.semaphore = asyncio.Semaphore(concurrency_limit)
+
+        self.pools_by_mint: Dict[str, List[LiquidityPool]] = {}
+        self.account_index: Dict[Pubkey, List[LiquidityPool]] = {}
+
+    async def __load_pool(self, pair_address: Pubkey) -> Optional[LiquidityPool]:
+        async with self.semaphore:
+            liquidity_pool = await fetch_liquidity_pool(self.solana_client, pair_address)
+        if liquidity_pool is None:
+            logging.warning(f"could not fetch liquidity pool {pair_address}")
+        return liquidity_pool
+
+    async def __fetch_mint_pool_ids(self, token_mint: str) -> List[str]:
+        async with self.semaphore:
+            pools = await self.raydium_fetcher.fetch_top_lp_for_mint(token_mint, self.pools_per_mint, 1)
+        return [pool["id"] for pool in pools or []]
+
+    async def load_pools(self, token_mints: List[str]):
+        """
+        Loads the whole watchlist in one bulk request to the Raydium API
+        keys endpoints. Pools the API could not provide are loaded from
+        chain one by one.
+        """
+        mint_pool_ids = await asyncio.gather(*[self.__fetch_mint_pool_ids(mint) for mint in token_mints])
+        pool_ids = [pool_id for pool_ids in mint_pool_ids for pool_id in pool_ids]
+        loaded = await fetch_liquidity_pools_from_api(self.solana_client, self.raydium_fetcher, pool_ids)
+        pools_by_id: Dict[str, LiquidityPool] = {str(pool.pair_address): pool for pool in loaded}
+
+        missing = [pool_id for pool_id in pool_ids if pool_id not in pools_by_id]
+        fallback = await asyncio.gather(*[self.__load_pool(Pubkey.from_string(pool_id)) for pool_id in missing])
+        for pool_id, liquidity_pool in zip(missing, fallback):
+            if liquidity_pool is not None:
+                pools_by_id[pool_id] = liquidity_pool
+
+        for token_mint, pool_ids in zip(token_mints, mint_pool_ids):
+            self.pools_by_mint[token_mint] = [pools_by_id[pool_id] for pool_id in pool_ids if pool_id in pools_by_id]
+        self.rebuild_account_index()
+
+    def rebuild_account_index(self):
+        self.account_index = {}
+        for liquidity_pools in self.pools_by_mint.values():
+            for liquidity_pool in liquidity_pools:
+                for address in liquidity_pool.get_state_accounts():
+                    self.account_index.setdefault(address, []).append(liquidity_pool)
+
+    @traced("snapshot")
+    async def refresh_snapshot(self) -> bool:
+        """
+        Fetches every state account of every loaded pool in batched
+        getMultipleAccounts calls and applies the data to the pools.
+        """
+        addresses = list(self.account_index.keys())
+        if len(addresses) == 0:
+            return False
+
+        accounts = await self.solana_client.get_multiple_accounts(addresses)
+        if accounts is None:
+            logging.error("could not fetch scanner snapshot")
+            return False
+
+        for address, account in zip(addresses, accounts):
+            if account is None:
+                continue
+            for liquidity_pool in self.account_index[address]:
+                liquidity_pool.update_state(address, account.data)
+        return True
+
+    def find_opportunities(self, min_spread: float = 0.0) -> List[Opportunity]:
+        with tracer.span("pricing"):
+            return self.__find_opportunities(min_spread)
+
+    def __find_opportunities(self, min_spread: float) -> List[Opportunity]:
+        opportunities = []
+        for token_mint, liquidity_pools in self.pools_by_mint.items():
+            priced = []
+            for liquidity_pool in liquidity_pools:
+                price = liquidity_pool.get_cached_price(self.base_mint)
+                if price is not None and price > 0:
+                    priced.append((price, liquidity_pool))
+            if len(priced) <= 1:
+                continue
+
+            buy_price, buy_pool = min(priced, key=lambda p: p[0])
+            sell_price, sell_pool = max(priced, key=lambda p: p[0])
+            opportunity = Opportunity(token_mint, buy_pool, sell_pool, buy_price, sell_price)
+            if opportunity.spread > min_spread:
+                opportunities.append(opportunity)
+
+        opportunities.sort(key=lambda o: o.spread, reverse=True)
+        return opportunities
+
+    async def run(
+        self,
+        token_mints: List[str],
+        interval: float = SCAN_INTERVAL,
+        min_spread: float = 0.0,
+    ) -> AsyncIterator[List[Opportunity]]:
+        """
+        Loads the watchlist once, then yields ranked opportunities after
+        every snapshot.
+        """
+        await self.load_pools(token_mints)
+        while True:
+            if await self.refresh_snapshot():
+                yield self.find_opportunities(min_spread)
+            await asyncio.sleep(interval)
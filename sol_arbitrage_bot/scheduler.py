@@ -0,0 +1,219 @@
+import heapq
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from solders.pubkey import Pubkey
+
+from .solana_client import SolanaClient
+from .pool_base import LiquidityPool
+from .graph import Cycle
+from .tracing import tracer
+
+
+SCHEDULER_WORKERS = 4
+# About 60 slots pass before a blockhash fetched now stops being accepted,
+# but prices go stale far sooner.
+OPPORTUNITY_TTL_SLOTS = 4
+SLOT_POLL_INTERVAL = 0.2
+
+
+@dataclass
+class ScheduledOpportunity:
+    opportunity: Any
+    expected_profit: float
+    expiry_slot: int
+    route_key: tuple
+    writable_accounts: FrozenSet[Pubkey] = field(default_factory=frozenset)
+
+
+def get_route_writable_accounts(liquidity_pools: Iterable[LiquidityPool]) -> FrozenSet[Pubkey]:
+    """
+    Pool accounts a route's swaps write. Wallet accounts are shared by
+    every route and left out, otherwise nothing could run concurrently.
+    """
+    accounts = set()
+    for liquidity_pool in liquidity_pools:
+        accounts.add(liquidity_pool.pair_address)
+        accounts.update(liquidity_pool.get_state_accounts())
+    return frozenset(accounts)
+
+
+def schedule_cycle(
+    cycle: Cycle,
+    amount_in: int,
+    current_slot: int,
+    ttl_slots: int = OPPORTUNITY_TTL_SLOTS,
+) -> ScheduledOpportunity:
+    return ScheduledOpportunity(
+        opportunity=cycle,
+        expected_profit=amount_in * (cycle.rate - 1),
+        expiry_slot=current_slot + ttl_slots,
+        route_key=tuple(liquidity_pool.pair_address for liquidity_pool in cycle.pools),
+        writable_accounts=get_route_writable_accounts(cycle.pools),
+    )
+
+
+class ExecutionScheduler:
+    """
+    Priority queue of opportunities ordered by expected profit, drained by
+    a bounded set of workers.
+
+    An opportunity is dropped when its expiry slot has passed, when the
+    same route is already queued with at least its profit or in flight,
+    or when it writes an account held by an in-flight route. A route holds
+    its accounts until its confirmation callback returns; confirmations run
+    as separate tasks so workers move on as soon as a trade is sent.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[Any], Awaitable[Any]],
+        confirm: Optional[Callable[[Any, Any], Awaitable[Any]]] = None,
+        workers: int = SCHEDULER_WORKERS,
+    ):
+        self.execute = execute
+        self.confirm = confirm
+        self.workers = workers
+
+        self.current_slot = 0
+        self.heap: List[tuple] = []
+        self.counter = itertools.count()
+        self.queued: Dict[tuple, ScheduledOpportunity] = {}
+        self.in_flight: Dict[tuple, ScheduledOpportunity] = {}
+        self.locked_accounts: Set[Pubkey] = set()
+        self.condition = asyncio.Condition()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+        self.worker_tasks: List[asyncio.Task] = []
+        self.confirm_tasks: Set[asyncio.Task] = set()
+        self.slot_task: Optional[asyncio.Task] = None
+        self.stats = {"executed": 0, "expired": 0, "duplicate": 0, "conflict": 0, "failed": 0}
+
+    async def submit(self, scheduled: ScheduledOpportunity) -> bool:
+        route_key = scheduled.route_key
+        if scheduled.expiry_slot < self.current_slot:
+            self.stats["expired"] += 1
+            return False
+        queued = self.queued.get(route_key)
+        if route_key in self.in_flight or (queued is not None and queued.expected_profit >= scheduled.expected_profit):
+            self.stats["duplicate"] += 1
+            return False
+
+        # A replaced entry stays in the heap and is skipped when popped.
+        self.queued[route_key] = scheduled
+        heapq.heappush(self.heap, (-scheduled.expected_profit, next(self.counter), scheduled))
+        self.idle.clear()
+        async with self.condition:
+            self.condition.notify()
+        return True
+
+    def set_slot(self, slot: int):
+        if slot > self.current_slot:
+            self.current_slot = slot
+        tracer.set_slot(slot)
+
+    async def track_slot(self, solana_client: SolanaClient, interval: float = SLOT_POLL_INTERVAL):
+        while True:
+            slot = await solana_client.get_slot()
+            if slot is not None:
+                self.set_slot(slot)
+            await asyncio.sleep(interval)
+
+    def __pop_runnable(self) -> Optional[ScheduledOpportunity]:
+        while len(self.heap) > 0:
+            _, _, scheduled = heapq.heappop(self.heap)
+            if self.queued.get(scheduled.route_key) is not scheduled:
+                continue
+            del self.queued[scheduled.route_key]
+
+            if scheduled.expiry_slot < self.current_slot:
+                self.stats["expired"] += 1
+                continue
+            if not self.locked_accounts.isdisjoint(scheduled.writable_accounts):
+                self.stats["conflict"] += 1
+                continue
+
+            self.in_flight[scheduled.route_key] = scheduled
+            self.locked_accounts.update(scheduled.writable_accounts)
+            return scheduled
+        self.__update_idle()
+        return None
+
+    def __update_idle(self):
+        if len(self.queued) == 0 and len(self.in_flight) == 0:
+            self.idle.set()
+
+    async def __release(self, scheduled: ScheduledOpportunity):
+        self.in_flight.pop(scheduled.route_key, None)
+        self.locked_accounts.difference_update(scheduled.writable_accounts)
+        self.__update_idle()
+        async with self.condition:
+            self.condition.notify_all()
+
+    async def __confirm(self, scheduled: ScheduledOpportunity, result: Any):
+        try:
+            await self.confirm(scheduled, result)
+        except Exception as e:
+            logging.error(f"Confirmation of route {scheduled.route_key} failed: {e}")
+        finally:
+            await self.__release(scheduled)
+
+    async def __worker(self):
+        while True:
+            async with self.condition:
+                scheduled = self.__pop_runnable()
+                while scheduled is None:
+                    await self.condition.wait()
+                    scheduled = self.__pop_runnable()
+
+            # The confirmation task is created inside the span, so its
+            # spans (e.g. the bundle landing) nest under this execution.
+            with tracer.span("execute", expiry_slot=scheduled.expiry_slot):
+                try:
+                    result = await self.execute(scheduled.opportunity)
+                except Exception as e:
+                    logging.error(f"Execution of route {scheduled.route_key} failed: {e}")
+                    result = None
+
+                if result is None:
+                    self.stats["failed"] += 1
+                    await self.__release(scheduled)
+                    continue
+
+                self.stats["executed"] += 1
+                if self.confirm is None:
+                    await self.__release(scheduled)
+                    continue
+                task = asyncio.create_task(self.__confirm(scheduled, result))
+                self.confirm_tasks.add(task)
+                task.add_done_callback(self.confirm_tasks.discard)
+
+    def start(self, solana_client: Optional[SolanaClient] = None):
+        """
+        Starts the workers and, given a client, the slot tracker used for
+        expiry.
+        """
+        for _ in range(self.workers - len(self.worker_tasks)):
+            self.worker_tasks.append(asyncio.create_task(self.__worker()))
+        if solana_client is not None and self.slot_task is None:
+            self.slot_task = asyncio.create_task(self.track_slot(solana_client))
+
+    async def drain(self):
+        """
+        Waits until nothing is queued, executing or awaiting confirmation.
+        """
+        await self.idle.wait()
+
+    async def stop(self):
+        tasks = self.worker_tasks + list(self.confirm_tasks)
+        if self.slot_task is not None:
+            tasks.append(self.slot_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.worker_tasks = []
+        self.slot_task = None
@@ -0,0 +1,230 @@
+import math
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from solders.pubkey import Pubkey
+
+from .solana_client import SolanaClient
+from .constants import (
+    SOL_MINT,
+    UNIT_BUDGET,
+    UNIT_PRICE,
+    LAMPORTS_PER_SIGNATURE,
+)
+from .pool_base import LiquidityPool
+from .tracing import traced
+from .raydium.amm_v4.amm_v4 import AmmV4Pool, swap_base_in_amount_out
+
+
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+SEARCH_MAX_ITERATIONS = 64
+
+
+@dataclass
+class TradeSize:
+    amount_in: int
+    quote_amount: int
+    amount_out: int
+    expected_profit: int
+    costs: int
+
+    @property
+    def net_profit(self) -> int:
+        return self.expected_profit - self.costs
+
+    @property
+    def is_profitable(self) -> bool:
+        return self.amount_in > 0 and self.net_profit > 0
+
+    def get_minimum_amount_out(self, tip_amount: int = 0) -> int:
+        """
+        Least base the sell leg may return: the input back plus the fees
+        and tip, so a leg that would lose money fails instead. costs never
+        includes the tip, it is only added here.
+        """
+        return self.amount_in + self.costs + tip_amount
+
+
+def estimate_transaction_costs(
+    num_transactions: int = 2,
+    unit_budget: int = UNIT_BUDGET,
+    unit_price: int = UNIT_PRICE,
+    lamports_per_signature: int = LAMPORTS_PER_SIGNATURE,
+) -> int:
+    """
+    Lamports spent on signatures and priority fees. The Jito tip is not
+    included. unit_price is in micro-lamports per compute unit.
+    """
+    priority_fee = -(-unit_budget * unit_price // 1_000_000)
+    return num_transactions * (lamports_per_signature + priority_fee)
+
+
+def optimal_amm_v4_amount_in(
+    buy_reserve_base: int,
+    buy_reserve_quote: int,
+    sell_reserve_base: int,
+    sell_reserve_quote: int,
+    buy_fee: float,
+    sell_fee: float,
+) -> float:
+    """
+    Profit-maximising base input for base -> quote on the buy pool and
+    quote -> base on the sell pool, both constant product.
+
+    The round trip is f(x) = a x / (b + c x), so f'(x) = 1 at
+    x = (sqrt(a b) - b) / c. Returns 0 when there is no profitable size.
+    """
+    gamma_buy = 1 - buy_fee
+    gamma_sell = 1 - sell_fee
+    a = gamma_buy * gamma_sell * buy_reserve_quote * sell_reserve_base
+    b = buy_reserve_base * sell_reserve_quote
+    c = gamma_buy * (sell_reserve_quote + gamma_sell * buy_reserve_quote)
+    if a <= b or c <= 0:
+        return 0.0
+    return (math.sqrt(a * b) - b) / c
+
+
+def _or_minus_infinity(value: Optional[int]) -> float:
+    return -math.inf if value is None else value
+
+
+def golden_section_search(
+    profit: Callable[[int], Optional[int]],
+    low: int,
+    high: int,
+    tolerance: int = 1,
+    max_iterations: int = SEARCH_MAX_ITERATIONS,
+) -> int:
+    """
+    Maximises a unimodal integer profit function on [low, high]. A None
+    profit (the quote failed, e.g. not enough depth) counts as -infinity.
+    """
+    def _profit(x: int) -> float:
+        return _or_minus_infinity(profit(x))
+
+    x1 = int(high - GOLDEN_RATIO * (high - low))
+    x2 = int(low + GOLDEN_RATIO * (high - low))
+    f1 = _profit(x1)
+    f2 = _profit(x2)
+    for _ in range(max_iterations):
+        if high - low <= tolerance:
+            break
+        if f1 < f2:
+            low = x1
+            x1, f1 = x2, f2
+            x2 = int(low + GOLDEN_RATIO * (high - low))
+            f2 = _profit(x2)
+        else:
+            high = x2
+            x2, f2 = x1, f1
+            x1 = int(high - GOLDEN_RATIO * (high - low))
+            f1 = _profit(x1)
+
+    return max((low, x1, x2, high), key=_profit)
+
+
+def size_round_trip(
+    buy_quote: Callable[[int], Optional[int]],
+    sell_quote: Callable[[int], Optional[int]],
+    max_amount_in: int,
+    costs: int,
+    initial_guess: Optional[float] = None,
+) -> TradeSize:
+    """
+    Finds the best base input for buy_quote followed by sell_quote. With
+    an initial_guess (the closed-form AMM optimum) only its integer
+    neighbourhood is checked, otherwise a golden-section search runs.
+    """
+    def round_trip(amount_in: int) -> Optional[int]:
+        quote_out = buy_quote(amount_in)
+        if quote_out is None:
+            return None
+        return sell_quote(quote_out)
+
+    def profit(amount_in: int) -> Optional[int]:
+        base_out = round_trip(amount_in)
+        if base_out is None:
+            return None
+        return base_out - amount_in
+
+    if initial_guess is not None:
+        guess = min(max(int(initial_guess), 0), max_amount_in)
+        candidates = {max(guess - 1, 0), guess, min(guess + 1, max_amount_in)}
+        amount_in = max(candidates, key=lambda x: _or_minus_infinity(profit(x)))
+    else:
+        amount_in = golden_section_search(profit, 0, max_amount_in)
+
+    quote_out = buy_quote(amount_in) or 0
+    base_out = sell_quote(quote_out) or 0
+    return TradeSize(
+        amount_in=amount_in,
+        quote_amount=quote_out,
+        amount_out=base_out,
+        expected_profit=base_out - amount_in,
+        costs=costs,
+    )
+
+
+@traced("sizing")
+async def find_optimal_trade_size(
+    solana_client: SolanaClient,
+    buy_liquidity_pool: LiquidityPool,
+    sell_liquidity_pool: LiquidityPool,
+    max_base_in: float,
+    base_mint: Pubkey = SOL_MINT,
+    num_transactions: int = 2,
+    lamports_per_signature: int = LAMPORTS_PER_SIGNATURE,
+) -> Optional[TradeSize]:
+    """
+    Sizes a base -> quote -> base round trip over two pools. Uses the
+    closed form when both legs are AMM v4 pools and a bounded numeric
+    search otherwise.
+    """
+    quote_mint = buy_liquidity_pool.get_quote_mint(base_mint)
+    base_quote_decimals = buy_liquidity_pool.get_base_quote_decimals(base_mint)
+    if quote_mint is None or base_quote_decimals is None:
+        logging.error("invalid base mint")
+        return None
+
+    base_decimals, _ = base_quote_decimals
+    max_amount_in = int(max_base_in * (10 ** base_decimals))
+    costs = estimate_transaction_costs(
+        num_transactions, lamports_per_signature=lamports_per_signature
+    )
+
+    initial_guess = None
+    if isinstance(buy_liquidity_pool, AmmV4Pool) and isinstance(sell_liquidity_pool, AmmV4Pool):
+        buy_reserves = await buy_liquidity_pool.get_reserves(solana_client, base_mint)
+        sell_reserves = await sell_liquidity_pool.get_reserves(solana_client, base_mint)
+        if buy_reserves is None or sell_reserves is None:
+            return None
+
+        buy_keys = buy_liquidity_pool.pool_keys
+        sell_keys = sell_liquidity_pool.pool_keys
+        initial_guess = optimal_amm_v4_amount_in(
+            *buy_reserves,
+            *sell_reserves,
+            buy_keys.swap_fee_numerator / buy_keys.swap_fee_denominator,
+            sell_keys.swap_fee_numerator / sell_keys.swap_fee_denominator,
+        )
+
+        def buy_quote(amount_in: int) -> Optional[int]:
+            return swap_base_in_amount_out(
+                amount_in, buy_reserves[0], buy_reserves[1],
+                buy_keys.swap_fee_numerator, buy_keys.swap_fee_denominator,
+            )
+
+        def sell_quote(amount_in: int) -> Optional[int]:
+            return swap_base_in_amount_out(
+                amount_in, sell_reserves[1], sell_reserves[0],
+                sell_keys.swap_fee_numerator, sell_keys.swap_fee_denominator,
+            )
+    else:
+        buy_quote = await buy_liquidity_pool.load_quote_function(solana_client, base_mint)
+        sell_quote = await sell_liquidity_pool.load_quote_function(solana_client, quote_mint)
+        if buy_quote is None or sell_quote is None:
+            logging.error("could not load quote functions for trade sizing")
+            return None
+
+    return size_round_trip(buy_quote, sell_quote, max_amount_in, costs, initial_guess)
@@ -1,12 +1,15 @@
 import asyncio
 import aiohttp
 import logging
-from typing import List, Any, Optional, Union
+from typing import List, Any, Optional, Tuple, Union
 
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.types import TokenAccountOpts, TxOpts
-from solana.rpc.commitment import Processed
+from solana.rpc.commitment import Commitment, Processed
 from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+from solders.message import MessageV0
 from solders.transaction import Transaction, VersionedTransaction
 
 from .constants import SOL_RPC_URL
@@ -16,6 +19,8 @@ MAX_RETRIES = 5
 BACKOFF_FACTOR = 1.0
 RPC_TIMEOUT = 10
 RPC_CONCURRENCY_LIMIT = 5
+MAX_MULTIPLE_ACCOUNTS = 100
+CONFIRM_POLL_INTERVAL = 0.5
 
 
 class SolanaClient:
@@ -41,12 +46,30 @@ class SolanaClient:
             self.rpc_url,
             timeout=rpc_timeout
         )
+        self.rpc_timeout = rpc_timeout
+        self.session: Optional[aiohttp.ClientSession] = None
 
     async def __aenter__(self) -> "SolanaClient":
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.client.close()
+        if self.session is not None:
+            await self.session.close()
+
+    async def __post(self, method: str, params: list) -> Any:
+        """
+        Raw JSON-RPC request for methods solana-py does not wrap.
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.rpc_timeout))
+        body = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        async with self.session.post(self.rpc_url, json=body) as response:
+            response.raise_for_status()
+            payload = await response.json()
+        if "error" in payload:
+            raise RuntimeError(f"{method}: {payload['error']}")
+        return payload["result"]
 
     async def _rpc_call(self, func, *args, **kwargs) -> Any:
         for attempt in range(1, self.max_retries + 1):
@@ -72,6 +95,29 @@ class SolanaClient:
         logging.error(f"Max retries exceeded for RPC call: {func.__name__}")
         return None
 
+    async def get_multiple_accounts(
+        self,
+        pubkeys: List[Pubkey]
+    ) -> Optional[List[Any]]:
+        """
+        Fetches raw account data, splitting the request into concurrent
+        batches of at most MAX_MULTIPLE_ACCOUNTS keys.
+        """
+        batches = [
+            pubkeys[i:i + MAX_MULTIPLE_ACCOUNTS]
+            for i in range(0, len(pubkeys), MAX_MULTIPLE_ACCOUNTS)
+        ]
+        responses = await asyncio.gather(*[
+            self._rpc_call(self.client.get_multiple_accounts, batch, Processed)
+            for batch in batches
+        ])
+        accounts = []
+        for response in responses:
+            if response is None:
+                return None
+            accounts.extend(response.value)
+        return accounts
+
     async def get_multiple_accounts_json_parsed(
         self,
         pubkeys: List[Pubkey]
@@ -106,6 +152,17 @@ class SolanaClient:
             return response.value
         return None
 
+    async def get_token_accounts_by_program(self, owner: Pubkey, program_id: Pubkey) -> Optional[Any]:
+        response = await self._rpc_call(
+            self.client.get_token_accounts_by_owner,
+            owner,
+            TokenAccountOpts(program_id=program_id),
+            Processed,
+        )
+        if response is not None:
+            return response.value
+        return None
+
     async def get_token_account_balance(self, address: Pubkey) -> Optional[Any]:
         response = await self._rpc_call(
             self.client.get_token_account_balance,
@@ -115,6 +172,54 @@ class SolanaClient:
             return response.value
         return None
 
+    async def get_slot(self, commitment: Commitment = Processed) -> Optional[int]:
+        response = await self._rpc_call(
+            self.client.get_slot,
+            commitment,
+        )
+        if response is not None:
+            return response.value
+        return None
+
+    async def get_block_height(self) -> Optional[int]:
+        response = await self._rpc_call(
+            self.client.get_block_height,
+            Processed,
+        )
+        if response is not None:
+            return response.value
+        return None
+
+    async def get_signature_status(self, signature: Signature) -> Optional[Any]:
+        response = await self._rpc_call(
+            self.client.get_signature_statuses,
+            [signature],
+        )
+        if response is not None:
+            return response.value[0]
+        return None
+
+    async def confirm_transaction(
+        self,
+        signature: Signature,
+        last_valid_block_height: int,
+        poll_interval: float = CONFIRM_POLL_INTERVAL,
+    ) -> bool:
+        """
+        Waits until the transaction is confirmed or its blockhash expires.
+        True only if it was confirmed without an error.
+        """
+        while True:
+            status = await self.get_signature_status(signature)
+            if status is not None and status.confirmation_status in (
+                TransactionConfirmationStatus.Confirmed, TransactionConfirmationStatus.Finalized
+            ):
+                return status.err is None
+            block_height = await self.get_block_height()
+            if block_height is not None and block_height > last_valid_block_height:
+                return False
+            await asyncio.sleep(poll_interval)
+
     async def get_latest_blockhash(self) -> Optional[Any]:
         response = await self._rpc_call(
             self.client.get_latest_blockhash,
@@ -123,6 +228,57 @@ class SolanaClient:
             return response.value
         return None
 
+    async def get_fee_for_message(self, message: MessageV0) -> Optional[int]:
+        response = await self._rpc_call(
+            self.client.get_fee_for_message,
+            message,
+        )
+        if response is not None:
+            return response.value
+        return None
+
+    async def simulate_transaction(self, txn: VersionedTransaction) -> Optional[Any]:
+        response = await self._rpc_call(
+            self.client.simulate_transaction,
+            txn,
+            False,
+            Processed,
+        )
+        if response is not None:
+            return response.value
+        return None
+
+    async def get_recent_prioritization_fees(self, addresses: List[Pubkey]) -> Optional[List[dict]]:
+        """
+        Prioritization fees of recent slots paid by transactions locking
+        any of addresses as writable (at most 128 addresses).
+        """
+        return await self._rpc_call(
+            self.__post,
+            "getRecentPrioritizationFees",
+            [[str(address) for address in addresses]],
+        )
+
+    async def get_program_accounts(
+        self,
+        program_id: Pubkey,
+        filters: List[dict],
+        data_slice: Optional[Tuple[int, int]] = None,
+    ) -> Optional[List[dict]]:
+        """
+        Raw getProgramAccounts result with base64 data. Entries are left
+        undecoded so callers can decode them as they consume them.
+        data_slice is (offset, length).
+        """
+        config = {"encoding": "base64", "commitment": "processed", "filters": filters}
+        if data_slice is not None:
+            config["dataSlice"] = {"offset": data_slice[0], "length": data_slice[1]}
+        return await self._rpc_call(
+            self.__post,
+            "getProgramAccounts",
+            [str(program_id), config],
+        )
+
     async def send_transaction(self, txn: Union[VersionedTransaction, Transaction], opts: Optional[TxOpts] = None):
         response = await self._rpc_call(
             self.client.send_transaction,
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from solders.rent import Rent
+from solders.epoch_schedule import EpochSchedule
+from solders.pubkey import Pubkey
+from solders.message import MessageV0
+from solders.system_program import transfer, TransferParams
+from solders.sysvar import RENT, EPOCH_SCHEDULE
+
+from .solana_client import SolanaClient
+from .constants import ACCOUNT_LAYOUT_LEN, LAMPORTS_PER_SIGNATURE
+
+
+SYSVAR_REFRESH_INTERVAL = 3600.0
+
+
+class SysvarCache:
+    """
+    Values derived from sysvars that change at most once per epoch: rent
+    exempt minimums per account size, the epoch schedule and the fee per
+    signature. Filled once at startup and refreshed rarely, so instruction
+    builders can read them without an RPC call.
+    """
+
+    def __init__(self, refresh_interval: float = SYSVAR_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.rent: Optional[Rent] = None
+        self.epoch_schedule: Optional[EpochSchedule] = None
+        self.lamports_per_signature = LAMPORTS_PER_SIGNATURE
+        self.rent_exempt_minimums: Dict[int, int] = {}
+        self.updated_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.rent is not None
+
+    def is_stale(self) -> bool:
+        return self.updated_at is None or time.monotonic() - self.updated_at > self.refresh_interval
+
+    async def refresh(self, solana_client: SolanaClient) -> bool:
+        accounts = await solana_client.get_multiple_accounts([RENT, EPOCH_SCHEDULE])
+        if accounts is None or any(account is None for account in accounts):
+            logging.error("Could not fetch rent and epoch schedule sysvars")
+            return False
+
+        try:
+            rent = Rent.from_bytes(accounts[0].data)
+            epoch_schedule = EpochSchedule.from_bytes(accounts[1].data)
+        except Exception as e:
+            logging.error(f"Error parsing sysvars: {e}")
+            return False
+
+        lamports_per_signature = await self.__fetch_lamports_per_signature(solana_client)
+        if lamports_per_signature is not None:
+            self.lamports_per_signature = lamports_per_signature
+
+        self.rent = rent
+        self.epoch_schedule = epoch_schedule
+        self.rent_exempt_minimums = {}
+        self.updated_at = time.monotonic()
+        return True
+
+    async def __fetch_lamports_per_signature(self, solana_client: SolanaClient) -> Optional[int]:
+        latest_blockhash = await solana_client.get_latest_blockhash()
+        if latest_blockhash is None:
+            return None
+
+        # Any single-signature message without priority fees costs exactly
+        # one signature fee.
+        payer = Pubkey.default()
+        message = MessageV0.try_compile(
+            payer,
+            [transfer(TransferParams(from_pubkey=payer, to_pubkey=payer, lamports=0))],
+            [],
+            latest_blockhash.blockhash,
+        )
+        fee = await solana_client.get_fee_for_message(message)
+        if fee is None:
+            logging.warning("Could not fetch fee per signature, keeping the previous value")
+        return fee
+
+    async def refresh_if_stale(self, solana_client: SolanaClient) -> bool:
+        if not self.is_stale():
+            return True
+        return await self.refresh(solana_client)
+
+    async def run(self, solana_client: SolanaClient):
+        while True:
+            await self.refresh_if_stale(solana_client)
+            await asyncio.sleep(self.refresh_interval)
+
+    def get_rent_exempt_minimum(self, data_length: int = ACCOUNT_LAYOUT_LEN) -> Optional[int]:
+        if self.rent is None:
+            return None
+        minimum = self.rent_exempt_minimums.get(data_length)
+        if minimum is None:
+            minimum = self.rent.minimum_balance(data_length)
+            self.rent_exempt_minimums[data_length] = minimum
+        return minimum
@@ -0,0 +1,366 @@
+import os
+import struct
+import base58
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from solana.rpc.types import TxOpts
+
+from solders.hash import Hash
+from solders.pubkey import Pubkey
+from solders.keypair import Keypair
+from solders.instruction import Instruction
+from solders.message import MessageV0, to_bytes_versioned
+from solders.transaction import VersionedTransaction
+
+from jito_async import JitoJsonRpcSDK
+
+from .solana_client import SolanaClient
+from .constants import SOL_MINT, TOKEN_PROGRAM_ID
+from .accounts import (
+    get_or_create_token_account,
+    get_token_account_rent,
+    make_wsol_account_instructions,
+    make_wsol_seed,
+    close_account_instruction,
+)
+from .pool_base import LiquidityPool
+from .token_accounts import TokenAccountRegistry
+from .sysvar_cache import SysvarCache
+from .tips import TipAccountCache
+from .sizing import TradeSize
+from .tracing import traced, tracer
+from .arbitrage import make_transaction_fee_instructions, create_tip_instruction
+
+
+def _placeholder_u64() -> int:
+    return int.from_bytes(os.urandom(8), "little")
+
+
+def _u64(value: int) -> bytes:
+    return struct.pack('<Q', value)
+
+
+@dataclass
+class MessageTemplate:
+    """
+    A compiled v0 message plus the byte offsets of every placeholder value
+    in it. Placeholders are random, so they only match where they were
+    written by the instruction builders.
+    """
+    message: bytes
+    fields: Dict[str, Tuple[int, ...]]
+
+    @classmethod
+    def compile(
+        cls,
+        payer: Pubkey,
+        instructions: List[Instruction],
+        placeholders: Dict[str, bytes],
+    ) -> Optional["MessageTemplate"]:
+        blockhash = placeholders["blockhash"]
+        compiled_message = MessageV0.try_compile(payer, instructions, [], Hash(blockhash))
+        message = to_bytes_versioned(compiled_message)
+        if compiled_message.header.num_required_signatures != 1:
+            logging.error("transaction templates only support a single signer")
+            return None
+
+        fields = {}
+        for name, placeholder in placeholders.items():
+            offsets = []
+            offset = message.find(placeholder)
+            while offset != -1:
+                offsets.append(offset)
+                offset = message.find(placeholder, offset + 1)
+            fields[name] = tuple(offsets)
+        return cls(message, fields)
+
+    def render(self, values: Dict[str, bytes]) -> bytes:
+        message = bytearray(self.message)
+        for name, value in values.items():
+            for offset in self.fields.get(name, ()):
+                message[offset:offset + len(value)] = value
+        return bytes(message)
+
+
+def sign_message(payer_keypair: Keypair, message: bytes) -> bytes:
+    """
+    Serialized single-signer transaction for versioned message bytes.
+    """
+    return b"\x01" + bytes(payer_keypair.sign_message(message)) + message
+
+
+@dataclass
+class ArbitrageTemplate:
+    buy_message: MessageTemplate
+    sell_message: MessageTemplate
+    quote_token_account: Pubkey
+    wsol_rent: int
+    buy_route_key: tuple
+    sell_route_key: tuple
+
+    def build_transactions(
+        self,
+        payer_keypair: Keypair,
+        amount_in: int,
+        minimum_quote_out: int,
+        quote_in: int,
+        minimum_base_out: int,
+        blockhash: Hash,
+        tip_amount: int = 0,
+    ) -> Tuple[Pubkey, List[bytes]]:
+        """
+        Patches amounts, a fresh WSOL account and the blockhash into both
+        messages and signs them. Returns the WSOL account and the
+        serialized buy and sell transactions.
+        """
+        seed = make_wsol_seed()
+        wsol_token_account = Pubkey.create_with_seed(payer_keypair.pubkey(), seed, TOKEN_PROGRAM_ID)
+        blockhash_bytes = bytes(blockhash)
+        wsol_bytes = bytes(wsol_token_account)
+
+        buy_message = self.buy_message.render({
+            "blockhash": blockhash_bytes,
+            "wsol_account": wsol_bytes,
+            "wsol_seed": seed.encode("utf-8"),
+            "wsol_lamports": _u64(self.wsol_rent + amount_in),
+            "amount_in": _u64(amount_in),
+            "minimum_amount_out": _u64(minimum_quote_out),
+        })
+        sell_message = self.sell_message.render({
+            "blockhash": blockhash_bytes,
+            "wsol_account": wsol_bytes,
+            "amount_in": _u64(quote_in),
+            "minimum_amount_out": _u64(minimum_base_out),
+            "tip_amount": _u64(tip_amount),
+        })
+        return wsol_token_account, [
+            sign_message(payer_keypair, buy_message),
+            sign_message(payer_keypair, sell_message),
+        ]
+
+
+async def build_arbitrage_template(
+    solana_client: SolanaClient,
+    jito_client: JitoJsonRpcSDK,
+    buy_liquidity_pool: LiquidityPool,
+    sell_liquidity_pool: LiquidityPool,
+    payer_keypair: Keypair,
+    base_mint: Pubkey = SOL_MINT,
+    bundle: bool = False,
+    token_account_registry: Optional[TokenAccountRegistry] = None,
+    sysvar_cache: Optional[SysvarCache] = None,
+    tip_account_cache: Optional[TipAccountCache] = None,
+) -> Optional[ArbitrageTemplate]:
+    payer = payer_keypair.pubkey()
+    quote_mint = buy_liquidity_pool.get_quote_mint(base_mint)
+    if quote_mint is None:
+        logging.error("invalid base mint")
+        return None
+
+    quote_token_account, create_token_account_instruction = await get_or_create_token_account(
+        solana_client, payer_keypair, quote_mint, token_account_registry
+    )
+    if create_token_account_instruction is not None:
+        logging.error(f"Token account for {quote_mint} has to be created before building a template")
+        return None
+
+    wsol_rent = await get_token_account_rent(solana_client, sysvar_cache)
+    if wsol_rent is None:
+        logging.error("Could not get get_min_balance_rent_for_exempt_for_account")
+        return None
+
+    wsol_seed = make_wsol_seed()
+    wsol_lamports = _placeholder_u64()
+    wsol_token_account, wsol_instructions = make_wsol_account_instructions(payer, wsol_seed, wsol_lamports)
+
+    buy_amount_in = _placeholder_u64()
+    buy_minimum_amount_out = _placeholder_u64()
+    buy_placeholders = {
+        "blockhash": os.urandom(32),
+        "wsol_account": bytes(wsol_token_account),
+        "wsol_seed": wsol_seed.encode("utf-8"),
+        "wsol_lamports": _u64(wsol_lamports),
+        "amount_in": _u64(buy_amount_in),
+        "minimum_amount_out": _u64(buy_minimum_amount_out),
+    }
+    buy_swap_instruction = buy_liquidity_pool.make_swap_instruction(
+        amount_in=buy_amount_in,
+        minimum_amount_out=buy_minimum_amount_out,
+        token_account_in=wsol_token_account,
+        token_account_out=quote_token_account,
+        owner=payer,
+        input_mint=base_mint,
+    )
+    if buy_swap_instruction is None:
+        logging.error("could not create buy instruction")
+        return None
+
+    sell_amount_in = _placeholder_u64()
+    sell_minimum_amount_out = _placeholder_u64()
+    tip_amount = _placeholder_u64()
+    sell_placeholders = {
+        "blockhash": os.urandom(32),
+        "wsol_account": bytes(wsol_token_account),
+        "amount_in": _u64(sell_amount_in),
+        "minimum_amount_out": _u64(sell_minimum_amount_out),
+        "tip_amount": _u64(tip_amount),
+    }
+    sell_swap_instruction = sell_liquidity_pool.make_swap_instruction(
+        amount_in=sell_amount_in,
+        minimum_amount_out=sell_minimum_amount_out,
+        token_account_in=quote_token_account,
+        token_account_out=wsol_token_account,
+        owner=payer,
+        input_mint=quote_mint,
+    )
+    if sell_swap_instruction is None:
+        logging.error("could not create sell instruction")
+        return None
+
+    buy_instructions = make_transaction_fee_instructions() + wsol_instructions + [buy_swap_instruction]
+    sell_instructions = make_transaction_fee_instructions() + [
+        sell_swap_instruction,
+        close_account_instruction(wsol_token_account, payer_keypair),
+    ]
+    if bundle:
+        tip_instruction = await create_tip_instruction(jito_client, payer_keypair, tip_amount, tip_account_cache)
+        if tip_instruction is None:
+            return None
+        sell_instructions.append(tip_instruction)
+
+    buy_message = MessageTemplate.compile(payer, buy_instructions, buy_placeholders)
+    sell_message = MessageTemplate.compile(payer, sell_instructions, sell_placeholders)
+    if buy_message is None or sell_message is None:
+        return None
+
+    return ArbitrageTemplate(
+        buy_message=buy_message,
+        sell_message=sell_message,
+        quote_token_account=quote_token_account,
+        wsol_rent=wsol_rent,
+        buy_route_key=buy_liquidity_pool.get_swap_route_key(base_mint),
+        sell_route_key=sell_liquidity_pool.get_swap_route_key(quote_mint),
+    )
+
+
+class TransactionTemplateCache:
+    """
+    Arbitrage templates keyed by buy pool, sell pool, base mint, wallet
+    and whether a tip is included. A template is rebuilt when either
+    pool's swap route (e.g. CLMM tick arrays) has changed.
+    """
+
+    def __init__(
+        self,
+        token_account_registry: Optional[TokenAccountRegistry] = None,
+        sysvar_cache: Optional[SysvarCache] = None,
+        tip_account_cache: Optional[TipAccountCache] = None,
+    ):
+        self.token_account_registry = token_account_registry
+        self.sysvar_cache = sysvar_cache
+        self.tip_account_cache = tip_account_cache
+        self.templates: Dict[tuple, ArbitrageTemplate] = {}
+
+    async def get_template(
+        self,
+        solana_client: SolanaClient,
+        jito_client: JitoJsonRpcSDK,
+        buy_liquidity_pool: LiquidityPool,
+        sell_liquidity_pool: LiquidityPool,
+        payer_keypair: Keypair,
+        base_mint: Pubkey = SOL_MINT,
+        bundle: bool = False,
+    ) -> Optional[ArbitrageTemplate]:
+        key = (
+            buy_liquidity_pool.pair_address,
+            sell_liquidity_pool.pair_address,
+            base_mint,
+            payer_keypair.pubkey(),
+            bundle,
+        )
+        template = self.templates.get(key)
+        if template is not None:
+            quote_mint = buy_liquidity_pool.get_quote_mint(base_mint)
+            if (
+                template.buy_route_key == buy_liquidity_pool.get_swap_route_key(base_mint)
+                and template.sell_route_key == sell_liquidity_pool.get_swap_route_key(quote_mint)
+            ):
+                return template
+
+        template = await build_arbitrage_template(
+            solana_client,
+            jito_client,
+            buy_liquidity_pool,
+            sell_liquidity_pool,
+            payer_keypair,
+            base_mint,
+            bundle,
+            self.token_account_registry,
+            self.sysvar_cache,
+            self.tip_account_cache,
+        )
+        if template is not None:
+            self.templates[key] = template
+        return template
+
+    def invalidate_pool(self, pair_address: Pubkey):
+        self.templates = {
+            key: template for key, template in self.templates.items()
+            if pair_address not in key[:2]
+        }
+
+
+@traced("arbitrage")
+async def template_arbitrage(
+    solana_client: SolanaClient,
+    jito_client: JitoJsonRpcSDK,
+    template_cache: TransactionTemplateCache,
+    buy_liquidity_pool: LiquidityPool,
+    sell_liquidity_pool: LiquidityPool,
+    payer_keypair: Keypair,
+    trade_size: TradeSize,
+    base_mint: Pubkey = SOL_MINT,
+    bundle: bool = False,
+    tip_amount: int = 1000,
+):
+    """
+    Same trade as arbitrage(), but the transactions are rendered from a
+    cached template instead of being rebuilt and compiled.
+    """
+    template = await template_cache.get_template(
+        solana_client, jito_client, buy_liquidity_pool, sell_liquidity_pool, payer_keypair, base_mint, bundle
+    )
+    if template is None:
+        logging.error("could not build transaction template")
+        return
+
+    latest_blockhash = await solana_client.get_latest_blockhash()
+    if latest_blockhash is None:
+        logging.error("error. no latest blockhash")
+        return
+
+    with tracer.span("sign"):
+        _, arb_txns = template.build_transactions(
+            payer_keypair,
+            amount_in=trade_size.amount_in,
+            minimum_quote_out=trade_size.quote_amount,
+            quote_in=trade_size.quote_amount,
+            minimum_base_out=trade_size.get_minimum_amount_out(tip_amount if bundle else 0),
+            blockhash=latest_blockhash.blockhash,
+            tip_amount=tip_amount if bundle else 0,
+        )
+
+    with tracer.span("send", bundle=bundle):
+        if bundle:
+            encoded_txns = [base58.b58encode(arb_txn).decode("ascii") for arb_txn in arb_txns]
+            bundle_id = await jito_client.send_bundle(encoded_txns)
+            return bundle_id
+
+        for txn in arb_txns:
+            txn_sig = await solana_client.send_transaction(
+                VersionedTransaction.from_bytes(txn),
+                TxOpts(skip_preflight=True)
+            )
+            print(txn_sig)
@@ -0,0 +1,94 @@
+import time
+import random
+import asyncio
+import logging
+from typing import List, Optional
+
+from solders.pubkey import Pubkey
+
+from jito_async import JitoJsonRpcSDK, JitoError
+
+
+TIP_ACCOUNTS_REFRESH_INTERVAL = 3600.0
+TIP_PROFIT_SHARE = 0.5
+MIN_TIP_AMOUNT = 1000
+MAX_TIP_AMOUNT = 10_000_000
+
+
+class TipAccountCache:
+    """
+    Jito tip accounts, fetched once and refreshed rarely. The set is fixed
+    in practice, so a tip instruction picks one locally instead of calling
+    getTipAccounts for every bundle.
+    """
+
+    def __init__(self, refresh_interval: float = TIP_ACCOUNTS_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.tip_accounts: List[Pubkey] = []
+        self.updated_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return len(self.tip_accounts) > 0
+
+    def is_stale(self) -> bool:
+        return self.updated_at is None or time.monotonic() - self.updated_at > self.refresh_interval
+
+    async def refresh(self, jito_client: JitoJsonRpcSDK) -> bool:
+        try:
+            response = await jito_client.get_tip_accounts()
+            tip_accounts = [Pubkey.from_string(account) for account in response["data"]["result"]]
+        except (JitoError, KeyError, TypeError, ValueError) as e:
+            logging.error(f"Could not fetch tip accounts: {e}")
+            return False
+
+        if len(tip_accounts) == 0:
+            logging.error("Block engine returned no tip accounts")
+            return False
+
+        self.tip_accounts = tip_accounts
+        self.updated_at = time.monotonic()
+        return True
+
+    async def refresh_if_stale(self, jito_client: JitoJsonRpcSDK) -> bool:
+        if not self.is_stale():
+            return True
+        return await self.refresh(jito_client)
+
+    async def run(self, jito_client: JitoJsonRpcSDK):
+        while True:
+            await self.refresh_if_stale(jito_client)
+            await asyncio.sleep(self.refresh_interval)
+
+    def get_random_tip_account(self) -> Optional[Pubkey]:
+        if not self.loaded:
+            return None
+        return random.choice(self.tip_accounts)
+
+
+class TipPolicy:
+    """
+    Sizes the tip as a share of the profit left after the other costs,
+    between a floor and a cap. A tip that does not leave any profit is not
+    worth paying, so get_tip returns None then.
+    """
+
+    def __init__(
+        self,
+        profit_share: float = TIP_PROFIT_SHARE,
+        min_tip: int = MIN_TIP_AMOUNT,
+        max_tip: int = MAX_TIP_AMOUNT,
+    ):
+        self.profit_share = profit_share
+        self.min_tip = min_tip
+        self.max_tip = max_tip
+
+    def get_tip(self, net_profit: int) -> Optional[int]:
+        """
+        net_profit is the expected profit in lamports after every cost
+        except the tip.
+        """
+        tip = min(max(int(net_profit * self.profit_share), self.min_tip), self.max_tip)
+        if tip >= net_profit:
+            return None
+        return tip
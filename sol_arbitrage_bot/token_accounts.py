@@ -0,0 +1,148 @@
+import asyncio
+import struct
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from spl.token.instructions import (
+    create_associated_token_account,
+    get_associated_token_address,
+)
+
+from solders.pubkey import Pubkey
+from solders.instruction import Instruction
+
+from .solana_client import SolanaClient
+from .constants import (
+    TOKEN_PROGRAM_ID,
+    TOKEN_2022_PROGRAM_ID,
+    TOKEN_ACCOUNT_MINT_OFFSET,
+    TOKEN_ACCOUNT_AMOUNT_OFFSET,
+)
+
+
+@dataclass
+class TokenAccount:
+    address: Pubkey
+    mint: Pubkey
+    amount: int
+    program_id: Pubkey
+
+    @classmethod
+    def from_data(cls, address: Pubkey, data: bytes, program_id: Pubkey) -> "TokenAccount":
+        mint = Pubkey.from_bytes(data[TOKEN_ACCOUNT_MINT_OFFSET:TOKEN_ACCOUNT_MINT_OFFSET + 32])
+        amount, = struct.unpack_from('<Q', data, TOKEN_ACCOUNT_AMOUNT_OFFSET)
+        return cls(address, mint, amount, program_id)
+
+
+class TokenAccountRegistry:
+    """
+    Every token account owned by a wallet, indexed by mint. Loaded with one
+    getTokenAccountsByOwner call per token program and then kept current
+    from account updates and our own transactions, so looking up the token
+    account for a mint needs no RPC call.
+    """
+
+    def __init__(self, owner: Pubkey, program_ids: Tuple[Pubkey, ...] = (TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID)):
+        self.owner = owner
+        self.program_ids = program_ids
+        self.accounts: Dict[Pubkey, TokenAccount] = {}
+        self.accounts_by_mint: Dict[Pubkey, List[TokenAccount]] = {}
+        self.associated_addresses: Dict[Pubkey, Pubkey] = {}
+        self.loaded = False
+
+    async def load(self, solana_client: SolanaClient) -> bool:
+        responses = await asyncio.gather(*[
+            solana_client.get_token_accounts_by_program(self.owner, program_id)
+            for program_id in self.program_ids
+        ])
+        if any(response is None for response in responses):
+            logging.error(f"Could not load token accounts of {self.owner}")
+            return False
+
+        self.accounts = {}
+        self.accounts_by_mint = {}
+        for program_id, keyed_accounts in zip(self.program_ids, responses):
+            for keyed_account in keyed_accounts:
+                self.__add(TokenAccount.from_data(keyed_account.pubkey, keyed_account.account.data, program_id))
+        self.loaded = True
+        return True
+
+    def __add(self, token_account: TokenAccount):
+        self.accounts[token_account.address] = token_account
+        self.accounts_by_mint.setdefault(token_account.mint, []).append(token_account)
+
+    def derive_associated_addresses(self, mints: Iterable[Pubkey], program_id: Pubkey = TOKEN_PROGRAM_ID):
+        for mint in mints:
+            if mint not in self.associated_addresses:
+                self.associated_addresses[mint] = get_associated_token_address(self.owner, mint, program_id)
+
+    def get_associated_address(self, mint: Pubkey, program_id: Pubkey = TOKEN_PROGRAM_ID) -> Pubkey:
+        address = self.associated_addresses.get(mint)
+        if address is None:
+            address = get_associated_token_address(self.owner, mint, program_id)
+            self.associated_addresses[mint] = address
+        return address
+
+    def get_token_account(self, mint: Pubkey) -> Optional[Pubkey]:
+        """
+        The wallet's token account for mint, preferring the associated one.
+        """
+        token_accounts = self.accounts_by_mint.get(mint)
+        if not token_accounts:
+            return None
+        associated_address = self.associated_addresses.get(mint)
+        for token_account in token_accounts:
+            if token_account.address == associated_address:
+                return associated_address
+        return token_accounts[0].address
+
+    def get_or_create_token_account(
+        self,
+        payer: Pubkey,
+        mint: Pubkey,
+        program_id: Pubkey = TOKEN_PROGRAM_ID,
+    ) -> Tuple[Pubkey, Optional[Instruction]]:
+        token_account = self.get_token_account(mint)
+        if token_account is not None:
+            return token_account, None
+        token_account = self.get_associated_address(mint, program_id)
+        return token_account, create_associated_token_account(payer, self.owner, mint, program_id)
+
+    def update_account(self, address: Pubkey, data: bytes, program_id: Pubkey = TOKEN_PROGRAM_ID) -> bool:
+        """
+        Applies fresh account data, e.g. from a subscription or after one of
+        our transactions landed. Empty data means the account was closed.
+        """
+        if len(data) == 0:
+            self.remove_account(address)
+            return True
+        try:
+            token_account = TokenAccount.from_data(address, data, program_id)
+        except Exception as e:
+            logging.error(f"Error parsing token account {address}: {e}")
+            return False
+
+        existing = self.accounts.get(address)
+        if existing is not None and existing.mint == token_account.mint:
+            existing.amount = token_account.amount
+            return True
+        self.remove_account(address)
+        self.__add(token_account)
+        return True
+
+    def record_created(self, address: Pubkey, mint: Pubkey, program_id: Pubkey = TOKEN_PROGRAM_ID):
+        """
+        Registers an account created by one of our own transactions.
+        """
+        if address not in self.accounts:
+            self.__add(TokenAccount(address, mint, 0, program_id))
+
+    def remove_account(self, address: Pubkey):
+        token_account = self.accounts.pop(address, None)
+        if token_account is None:
+            return
+        token_accounts = self.accounts_by_mint.get(token_account.mint, [])
+        self.accounts_by_mint[token_account.mint] = [
+            account for account in token_accounts if account.address != address
+        ]
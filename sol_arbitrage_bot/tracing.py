@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+
+TRACE_BUFFER_SIZE = 4096
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    start_slot: int
+    end_ns: Optional[int] = None
+    end_slot: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self, monotonic_offset_ns: int = 0) -> Dict[str, Any]:
+        """
+        Field names follow the OTLP JSON span encoding; timestamps are
+        the monotonic clock shifted to Unix time by monotonic_offset_ns.
+        """
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns + monotonic_offset_ns,
+            "endTimeUnixNano": None if self.end_ns is None else self.end_ns + monotonic_offset_ns,
+            "attributes": {**self.attributes, "slot.start": self.start_slot, "slot.end": self.end_slot},
+        }
+
+
+class JsonlExporter:
+    """
+    Appends every finished span to a file, one OTLP-style JSON object per
+    line.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span, monotonic_offset_ns: int):
+        self.file.write(json.dumps(span.to_dict(monotonic_offset_ns), default=str) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Nested spans over the monotonic clock, each stamped with the slot
+    known when it started and ended. Finished spans go to a ring buffer
+    and to the exporters. The parent span is carried in a context
+    variable, so spans opened in tasks created inside a span nest under
+    it.
+    """
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE, enabled: bool = True):
+        self.enabled = enabled
+        self.spans: Deque[Span] = deque(maxlen=capacity)
+        self.exporters: List[JsonlExporter] = []
+        self.current_slot = 0
+        self.monotonic_offset_ns = time.time_ns() - time.monotonic_ns()
+
+    def set_slot(self, slot: int):
+        if slot > self.current_slot:
+            self.current_slot = slot
+
+    def add_exporter(self, exporter: JsonlExporter):
+        self.exporters.append(exporter)
+
+    def start_span(self, name: str, **attributes) -> Optional[Span]:
+        """
+        Starts a span without making it current, for stages that end in
+        another task, e.g. a bundle landing.
+        """
+        if not self.enabled:
+            return None
+        parent = _current_span.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.monotonic_ns(),
+            start_slot=self.current_slot,
+            attributes=attributes,
+        )
+
+    def finish_span(self, span: Optional[Span], **attributes):
+        """
+        Ends and exports the span. A span that already ended is left as is.
+        """
+        if span is None or span.end_ns is not None:
+            return
+        span.end_ns = time.monotonic_ns()
+        span.end_slot = self.current_slot
+        span.attributes.update(attributes)
+        self.spans.append(span)
+        for exporter in self.exporters:
+            exporter.export(span, self.monotonic_offset_ns)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish_span(span)
+
+    def get_spans(self, name: Optional[str] = None) -> List[Span]:
+        return [span for span in self.spans if name is None or span.name == name]
+
+    def summarize(self) -> Dict[str, Dict[str, float]]:
+        """
+        Count, mean and max duration in milliseconds plus the largest slot
+        drift per span name.
+        """
+        summary: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            stats = summary.setdefault(span.name, {"count": 0, "mean_ms": 0.0, "max_ms": 0.0, "max_slots": 0})
+            stats["count"] += 1
+            stats["mean_ms"] += (span.duration_ms - stats["mean_ms"]) / stats["count"]
+            stats["max_ms"] = max(stats["max_ms"], span.duration_ms)
+            stats["max_slots"] = max(stats["max_slots"], span.end_slot - span.start_slot)
+        return summary
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush()
+
+
+tracer = Tracer()
+
+
+def traced(name: str):
+    """
+    Wraps a coroutine function in a span of the module tracer.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
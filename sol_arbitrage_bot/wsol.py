@@ -0,0 +1,122 @@
+import struct
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from spl.token.instructions import SyncNativeParams, sync_native
+
+from solders.pubkey import Pubkey
+from solders.instruction import Instruction
+from solders.system_program import transfer, TransferParams
+
+from .solana_client import SolanaClient
+from .constants import TOKEN_PROGRAM_ID, TOKEN_ACCOUNT_AMOUNT_OFFSET
+from .accounts import make_wsol_account_instructions
+from .sysvar_cache import SysvarCache
+
+
+WSOL_SEED_PREFIX = "arbwsol"
+WSOL_POOL_SIZE = 2
+
+
+def make_wsol_top_up_instructions(payer: Pubkey, wsol_token_account: Pubkey, lamports: int) -> List[Instruction]:
+    return [
+        transfer(TransferParams(from_pubkey=payer, to_pubkey=wsol_token_account, lamports=lamports)),
+        sync_native(SyncNativeParams(program_id=TOKEN_PROGRAM_ID, account=wsol_token_account)),
+    ]
+
+
+class WsolAccountPool:
+    """
+    A few long-lived WSOL accounts per wallet, reused across trades instead
+    of creating and closing a fresh account every time. Each account is
+    derived from a fixed seed, topped up with transfer + sync_native when
+    its balance is short, and its balance is tracked locally between
+    reconciliations.
+
+    One account is handed out per in-flight trade, so the pool size bounds
+    how many trades can run concurrently.
+    """
+
+    def __init__(self, payer: Pubkey, size: int = WSOL_POOL_SIZE):
+        self.payer = payer
+        self.seeds = [f"{WSOL_SEED_PREFIX}{index}" for index in range(size)]
+        self.addresses = [Pubkey.create_with_seed(payer, seed, TOKEN_PROGRAM_ID) for seed in self.seeds]
+        # None means the account does not exist on chain yet.
+        self.balances: Dict[Pubkey, Optional[int]] = {address: None for address in self.addresses}
+        self.in_use: Set[Pubkey] = set()
+
+    async def load(self, solana_client: SolanaClient) -> bool:
+        accounts = await solana_client.get_multiple_accounts(self.addresses)
+        if accounts is None:
+            logging.error("Could not fetch WSOL accounts")
+            return False
+        for address, account in zip(self.addresses, accounts):
+            self.update_account(address, b"" if account is None else account.data)
+        return True
+
+    def update_account(self, address: Pubkey, data: bytes) -> bool:
+        """
+        Reconciles the local balance with account data from the chain.
+        """
+        if address not in self.balances:
+            return False
+        if len(data) == 0:
+            self.balances[address] = None
+            return True
+        self.balances[address], = struct.unpack_from('<Q', data, TOKEN_ACCOUNT_AMOUNT_OFFSET)
+        return True
+
+    def make_create_instructions(self, sysvar_cache: SysvarCache) -> Optional[List[Instruction]]:
+        """
+        Instructions creating every pool account that does not exist yet.
+        """
+        rent = sysvar_cache.get_rent_exempt_minimum()
+        if rent is None:
+            logging.error("Sysvar cache is not loaded")
+            return None
+
+        instructions = []
+        for seed, address in zip(self.seeds, self.addresses):
+            if self.balances[address] is not None:
+                continue
+            _, create_instructions = make_wsol_account_instructions(self.payer, seed, rent)
+            instructions.extend(create_instructions)
+        return instructions
+
+    def record_created(self):
+        for address in self.addresses:
+            if self.balances[address] is None:
+                self.balances[address] = 0
+
+    def acquire(self, amount_in: int) -> Optional[Tuple[Pubkey, List[Instruction]]]:
+        """
+        Picks a free account, preferring one that already holds amount_in,
+        and returns it with the instructions topping it up if needed.
+        """
+        free = [
+            address for address in self.addresses
+            if address not in self.in_use and self.balances[address] is not None
+        ]
+        if len(free) == 0:
+            logging.error("No free WSOL account")
+            return None
+
+        address = max(free, key=lambda a: self.balances[a])
+        self.in_use.add(address)
+
+        shortfall = amount_in - self.balances[address]
+        if shortfall <= 0:
+            return address, []
+        return address, make_wsol_top_up_instructions(self.payer, address, shortfall)
+
+    def release(self, address: Pubkey, amount_in: int, amount_out: int = 0):
+        """
+        Frees the account once its trade is sent or abandoned. The proceeds
+        are not known until the trade settles, so by default only amount_in
+        is debited and load() or update_account() reconcile the rest. An
+        abandoned trade passes amount_in=0, since nothing was spent.
+        """
+        self.in_use.discard(address)
+        balance = self.balances.get(address)
+        if balance is not None:
+            self.balances[address] = max(balance, amount_in) - amount_in + amount_out